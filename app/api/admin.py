@@ -0,0 +1,152 @@
+import asyncio
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+from app.monitoring.memory import MEMORY_TRACEMALLOC_FRAMES, accounting, snapshots
+from app.monitoring.profiling import (
+    PROFILE_INTERVAL_MS, PROFILE_MAX_SECONDS, PROFILE_MODES, PROFILING_ENABLED,
+    ProfilerBusy, list_profiles, request_trigger, resolve_profile, sample_process,
+)
+
+# Admin endpoints are refused unless ADMIN_TOKEN is set and sent as `X-Admin-Token`.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+router = APIRouter(prefix="/admin", include_in_schema=False)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Reject callers without the admin token."""
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+def require_profiling() -> None:
+    """Hide the profiling endpoints unless PROFILING_ENABLED=1."""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+profiling = [Depends(require_profiling), Depends(require_admin)]
+
+
+@router.post("/profile/process", dependencies=profiling)
+async def profile_process(
+    seconds: float = Query(10.0, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(PROFILE_INTERVAL_MS, gt=0),
+):
+    """
+    Sample the stacks of every thread in this worker for `seconds` and save them as collapsed stacks.
+
+    Returns:
+        Dict: The profile file name, the number of samples and distinct stacks.
+
+    Raises:
+        HTTPException: 409 if another profile is running.
+    """
+    try:
+        return await asyncio.to_thread(sample_process, seconds, interval_ms)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/profile/requests", dependencies=profiling)
+async def profile_requests(mode: str = "sample", count: int = Query(1, ge=1, le=100)):
+    """
+    Profile the next `count` requests this worker serves, with cProfile or the stack sampler.
+
+    Each profiled response names its profile in the `X-Profile-File` header.
+
+    Raises:
+        HTTPException: 400 for an unknown mode.
+    """
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown mode '{mode}'; choose from {PROFILE_MODES}.")
+    request_trigger.arm(mode, count)
+    return {"mode": mode, "armed": count}
+
+
+@router.get("/profiles", dependencies=profiling)
+async def get_profiles():
+    """List the saved profiles, newest first."""
+    return list_profiles()
+
+
+@router.get("/profiles/{name}", dependencies=profiling)
+async def get_profile(name: str):
+    """
+    Download a saved profile: pstats for cProfile, collapsed stacks (for flamegraph.pl or speedscope) otherwise.
+
+    Raises:
+        HTTPException: 404 if there is no such profile.
+    """
+    path = resolve_profile(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=name)
+
+
+@router.get("/memory", dependencies=[Depends(require_admin)])
+async def memory_report():
+    """
+    Report RSS broken down by component (embedding model, KB embeddings and docs, FAISS index,
+    CRM data, intent classifier, sessions), re-measuring everything dynamic.
+    """
+    return await asyncio.to_thread(accounting.report, 0)
+
+
+@router.post("/memory/tracemalloc", dependencies=[Depends(require_admin)])
+async def start_tracemalloc(frames: int = Query(MEMORY_TRACEMALLOC_FRAMES, ge=1, le=64)):
+    """Start tracing allocations (a no-op if already tracing). Snapshots only see allocations made from now on."""
+    snapshots.start(frames)
+    return {"tracing": True}
+
+
+@router.delete("/memory/tracemalloc", dependencies=[Depends(require_admin)])
+async def stop_tracemalloc():
+    """Stop tracing allocations and drop all snapshots."""
+    snapshots.stop()
+    return {"tracing": False}
+
+
+@router.post("/memory/snapshots", dependencies=[Depends(require_admin)])
+async def take_snapshot(label: str = ""):
+    """
+    Take a tracemalloc snapshot to diff against later.
+
+    Raises:
+        HTTPException: 409 if tracemalloc is not running.
+    """
+    try:
+        return await asyncio.to_thread(snapshots.take, label)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/memory/snapshots", dependencies=[Depends(require_admin)])
+async def get_snapshots():
+    """List the kept snapshots, oldest first."""
+    return snapshots.list()
+
+
+@router.get("/memory/snapshots/{snapshot_id}/diff", dependencies=[Depends(require_admin)])
+async def diff_snapshot(
+    snapshot_id: str,
+    against: Optional[str] = None,
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    top: int = Query(20, ge=1, le=500),
+):
+    """
+    Show where memory grew between a snapshot and a later one (`against`), or the present.
+
+    Raises:
+        HTTPException: 404 for an unknown snapshot, 409 if comparing to the present while tracemalloc is not running.
+    """
+    try:
+        diff = await asyncio.to_thread(snapshots.diff, snapshot_id, against, group_by, top)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return diff
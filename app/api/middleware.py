@@ -0,0 +1,124 @@
+import hmac
+import os
+import time
+from typing import Optional
+
+from app.monitoring.metrics import counter, gauge, histogram
+from app.monitoring.profiling import PROFILE_MODES, ProfilerBusy, RequestProfile, profile_path, request_trigger
+from app.monitoring.tracing import span
+
+http_requests_in_flight = gauge("http_requests_in_flight", "HTTP requests currently being handled.")
+http_request_duration_seconds = histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response is fully sent, per route and status code.",
+    ("method", "route", "status"),
+)
+http_request_errors_total = counter(
+    "http_request_errors_total",
+    "HTTP requests that failed with a 5xx status or an unhandled exception, per route.",
+    ("method", "route", "status"),
+)
+
+
+class TracingMiddleware:
+    def __init__(self, app):
+        """
+        ASGI middleware that opens the root "request" span of every HTTP request.
+
+        An incoming W3C `traceparent` header continues the caller's trace; the response carries
+        a `traceparent` header for this request's span so callers can correlate logs. Request
+        latency, in-flight requests and errors are recorded per route template (not per raw
+        path, which would explode the metric cardinality).
+
+        Written as plain ASGI rather than `BaseHTTPMiddleware` so streaming responses pass
+        through untouched and the span's context reaches the route handler.
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        status = 500
+        start = time.perf_counter()
+        http_requests_in_flight.inc()
+        try:
+            with span("request", traceparent) as request_span:
+                async def send_with_trace(message):
+                    nonlocal status
+                    if message["type"] == "http.response.start":
+                        status = message["status"]
+                        headers = list(message.get("headers", []))
+                        headers.append((b"traceparent", request_span.traceparent().encode("latin-1")))
+                        message = dict(message, headers=headers)
+                    await send(message)
+
+                await self.app(scope, receive, send_with_trace)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            labels = {"method": scope["method"], "route": getattr(route, "path", "unmatched"), "status": str(status)}
+            http_request_duration_seconds.observe(time.perf_counter() - start, **labels)
+            if status >= 500:
+                http_request_errors_total.inc(**labels)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, admin_token: Optional[str] = None):
+        """
+        ASGI middleware that profiles individual requests on demand.
+
+        A request is profiled when it carries `X-Profile: cprofile|sample` together with a valid
+        `X-Admin-Token`, or when profiles were armed through `POST /admin/profile/requests`. The
+        response then carries `X-Profile-File` with the name of the profile, downloadable from
+        `/admin/profiles/{name}` once the response is complete. Only one profile runs at a time;
+        a request that asks while another is running gets `X-Profile: busy` and runs unprofiled.
+
+        Only installed when PROFILING_ENABLED=1, so it adds nothing to requests otherwise.
+        """
+        self.app = app
+        self.admin_token = admin_token
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = token = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                mode = value.decode("latin-1").lower()
+            elif name == b"x-admin-token":
+                token = value.decode("latin-1")
+        if mode not in PROFILE_MODES or not self.admin_token or not hmac.compare_digest(token or "", self.admin_token):
+            mode = request_trigger.take()
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        path = profile_path(mode)
+        try:
+            profile = RequestProfile(mode, path).start()
+        except ProfilerBusy:
+            await self.app(scope, receive, _with_header(send, b"x-profile", b"busy"))
+            return
+        try:
+            await self.app(scope, receive, _with_header(send, b"x-profile-file", os.path.basename(path).encode("latin-1")))
+        finally:
+            profile.stop()
+
+
+def _with_header(send, name: bytes, value: bytes):
+    async def send_with_header(message):
+        if message["type"] == "http.response.start":
+            message = dict(message, headers=list(message.get("headers", [])) + [(name, value)])
+        await send(message)
+
+    return send_with_header
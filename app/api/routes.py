@@ -1,12 +1,42 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import ProcessMessageRequest, ProcessMessageResponse
-from app.core.llm_orchestrator import process_message_pipeline
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from app.models.schemas import (
+    ProcessMessageRequest, ProcessMessageResponse, ProcessMessagesRequest,
+    JobSubmitRequest, JobStatusResponse, CreateSessionRequest, SessionMessageRequest, SessionResponse
+)
+from app.core.llm_orchestrator import orchestrator, process_message_pipeline, process_session_message
+from app.core.admission import admission, Overloaded
+from app.core.quotas import quotas, QuotaExceeded, estimate_request_tokens, estimate_tokens, tenant_from_headers
+from app.core.batching import process_batch, BATCH_MAX_CONCURRENCY, BATCH_MAX_ITEMS
+from app.core.jobs import JobQueue, JobWorkerPool
+from app.core.sessions import Session, SessionExists, SessionStore
+from app.api.admin import require_admin
+from app.api.serialization import FastJSONResponse, dumps, model_bytes
+from app.monitoring.metrics import PROMETHEUS_CONTENT_TYPE, render_prometheus
+from app.monitoring.timeseries import TimeSeriesIngester, TimeSeriesStore
+from app.monitoring.memory import accounting, register_app_components
 
 router = APIRouter()
+job_queue = JobQueue()
+job_workers = JobWorkerPool(job_queue, process_message_pipeline, quotas=quotas)
+session_store = SessionStore()
+kpi_store = TimeSeriesStore()
+kpi_ingester = TimeSeriesIngester(kpi_store)
+register_app_components(accounting, orchestrator, session_store)
+
+
+def get_tenant(request: Request) -> str:
+    """Resolve the calling tenant from its API key (see `TenantQuotas.tenant_for`)."""
+    return tenant_from_headers(request.headers)
 
 
 @router.post("/process_message", response_model=ProcessMessageResponse)
-async def process_message(request: ProcessMessageRequest):
+async def process_message(request: ProcessMessageRequest, tenant: str = Depends(get_tenant)):
     """
     Process a message from a prospect.
 
@@ -14,17 +44,324 @@ async def process_message(request: ProcessMessageRequest):
     The request contains the conversation history and current message from the prospect.
     The response contains the suggested response draft, internal next steps, confidence scores, tool usage logs, and reasoning trace.
 
+    Requests pass through the admission controller first: under overload they queue by priority
+    (from the prospect's CRM lead score) and are shed with a fast 503 once the queue-time SLO is exceeded.
+    Before that, the request is charged to the tenant's request and token quotas; over-quota requests
+    get a 429 (or wait for quota, if QUOTA_MODE=queue).
+
+    The response model is serialized directly to JSON bytes, skipping FastAPI's re-validation of a
+    model the orchestrator has just built; `response_model` still documents the schema.
+
     Args:
         request (ProcessMessageRequest): The request containing the conversation history and current message.
+        tenant (str): The calling tenant.
 
     Returns:
         ProcessMessageResponse: The response containing the suggested response draft, internal next steps, confidence scores, tool usage logs, and reasoning trace.
 
     Raises:
-        HTTPException: If there is an internal server error.
+        HTTPException: 429 with Retry-After if the tenant is over quota, 503 with Retry-After if the service is overloaded,
+            or 500 if there is an internal server error.
     """
+    crm_data = orchestrator.tool.fetch_prospect_details(request.prospect_id) if request.prospect_id else None
     try:
-        result = await process_message_pipeline(request)
-        return result
+        async with quotas.limit(tenant, estimate_request_tokens(request)):
+            async with admission.admit(admission.priority_for(crm_data)):
+                result = await process_message_pipeline(request)
+        return FastJSONResponse(result)
+    except QuotaExceeded as e:
+        raise _over_quota(e)
+    except Overloaded as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _overloaded(error: Overloaded) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+
+def _over_quota(error: QuotaExceeded) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(error), headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))})
+
+
+@router.post("/process_messages")
+async def process_messages(request: ProcessMessagesRequest, tenant: str = Depends(get_tenant)):
+    """
+    Process many prospect messages in one call, streaming results as NDJSON.
+
+    Items run through the pipeline with bounded concurrency; CRM lookups are deduplicated and
+    knowledge base queries are embedded in batches across the items. Each output line is either
+    `{"index": i, "result": ProcessMessageResponse}` or `{"index": i, "error": "..."}`, in completion
+    order, so a slow item never holds back the others. The last line is a summary with the batch
+    throughput in items/sec. Each item is charged to the tenant's quotas; items over quota
+    get an error line.
+
+    Args:
+        request (ProcessMessagesRequest): The requests to process and an optional concurrency limit
+            (capped at BATCH_MAX_CONCURRENCY).
+        tenant (str): The calling tenant.
+
+    Returns:
+        StreamingResponse: An `application/x-ndjson` stream of results.
+
+    Raises:
+        HTTPException: If the batch has more than BATCH_MAX_ITEMS items.
+    """
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: at most {BATCH_MAX_ITEMS} items.")
+    concurrency = min(request.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+
+    async def stream():
+        start = time.perf_counter()
+        errors = 0
+        async for index, response, error in process_batch(request.items, concurrency, tenant=tenant):
+            if error:
+                errors += 1
+                yield dumps({"index": index, "error": str(error)}) + b"\n"
+            else:
+                yield b'{"index":%d,"result":%s}\n' % (index, model_bytes(response))
+        elapsed = time.perf_counter() - start
+        yield dumps({"summary": {
+            "items": len(request.items),
+            "errors": errors,
+            "elapsed_s": round(elapsed, 3),
+            "items_per_sec": round(len(request.items) / elapsed, 3) if elapsed else 0.0,
+        }}) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def _job_status(job: Dict) -> JobStatusResponse:
+    return JobStatusResponse(
+        job_id=job["id"],
+        status=job["status"],
+        attempts=job["attempts"],
+        result=job["result"],
+        error=job["error"],
+    )
+
+
+@router.post("/jobs", response_model=JobStatusResponse, status_code=202)
+async def submit_job(
+    submission: JobSubmitRequest,
+    idempotency_key: Optional[str] = Header(None),
+    tenant: str = Depends(get_tenant),
+):
+    """
+    Queue a message for asynchronous processing.
+
+    The job is stored in the durable job queue and processed by the background worker pool.
+    Poll `GET /jobs/{job_id}` for the result, or pass a `callback_url` to receive it by POST.
+    Submitting again with the same idempotency key (body field or `Idempotency-Key` header)
+    returns the tenant's existing job instead of creating a new one. Jobs are charged to the tenant's
+    quotas when they run, waiting for quota rather than being rejected.
+
+    Args:
+        submission (JobSubmitRequest): The request to process, its priority (higher first), and optional idempotency key and callback URL.
+        idempotency_key (Optional[str]): The `Idempotency-Key` header, used when the body has no key.
+        tenant (str): The calling tenant.
+
+    Returns:
+        JobStatusResponse: The queued (or previously submitted) job.
+
+    Raises:
+        HTTPException: 422 if the `callback_url` is not allowed (non-https, or a non-public host).
+    """
+    try:
+        job = await asyncio.to_thread(
+            job_queue.submit,
+            submission.request,
+            submission.priority,
+            submission.idempotency_key or idempotency_key,
+            submission.callback_url,
+            tenant,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    job_workers.notify()
+    return _job_status(job)
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str, tenant: str = Depends(get_tenant)):
+    """
+    Return the status of a queued job, including its response once it has succeeded.
+
+    Jobs are only visible to the tenant that submitted them.
+
+    Raises:
+        HTTPException: If no job with this ID exists for the calling tenant.
+    """
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None or job["tenant"] != tenant:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_status(job)
+
+
+def _session_response(session: Session) -> SessionResponse:
+    return SessionResponse(
+        conversation_id=session.conversation_id,
+        prospect_id=session.prospect_id,
+        message_count=len(session.messages),
+    )
+
+
+@router.post("/sessions", response_model=SessionResponse, status_code=201)
+async def create_session(request: CreateSessionRequest, tenant: str = Depends(get_tenant)):
+    """
+    Start a server-side conversation session.
+
+    The session keeps the conversation history (already formatted for prompts) and the prospect's
+    CRM record, so each turn only sends the new messages to `POST /sessions/{conversation_id}/messages`.
+    The session belongs to the calling tenant; other tenants see it as missing.
+
+    Args:
+        request (CreateSessionRequest): An optional conversation ID (generated if omitted), the prospect ID and any existing history.
+        tenant (str): The calling tenant.
+
+    Returns:
+        SessionResponse: The session's ID and size.
+
+    Raises:
+        HTTPException: 409 if a session with the requested conversation ID already exists.
+    """
+    try:
+        session = await session_store.create_async(
+            request.prospect_id, request.conversation_history, request.conversation_id, tenant
+        )
+    except SessionExists as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _session_response(session)
+
+
+@router.get("/sessions/{conversation_id}", response_model=SessionResponse)
+async def get_session(conversation_id: str, tenant: str = Depends(get_tenant)):
+    """
+    Return a session's ID, prospect and number of messages.
+
+    Raises:
+        HTTPException: If the session does not exist for the calling tenant.
+    """
+    session = await session_store.get_async(conversation_id, tenant)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return _session_response(session)
+
+
+@router.delete("/sessions/{conversation_id}", status_code=204)
+async def delete_session(conversation_id: str, tenant: str = Depends(get_tenant)):
+    """
+    Delete a session.
+
+    Raises:
+        HTTPException: If the session does not exist for the calling tenant.
+    """
+    if not await session_store.delete_async(conversation_id, tenant):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+
+@router.post("/sessions/{conversation_id}/messages", response_model=ProcessMessageResponse)
+async def process_session_turn(conversation_id: str, request: SessionMessageRequest, tenant: str = Depends(get_tenant)):
+    """
+    Process the next prospect message in a session, sending only what changed since the last turn.
+
+    Args:
+        conversation_id (str): The session ID.
+        request (SessionMessageRequest): Messages added since the last turn (e.g. the reply the agent sent)
+            and the current prospect message, which is appended to the session once processed.
+        tenant (str): The calling tenant.
+
+    Returns:
+        ProcessMessageResponse: The same response as `POST /process_message`.
+
+    Raises:
+        HTTPException: If the session does not exist for the tenant, 429 with Retry-After if the tenant is over quota,
+            503 with Retry-After if the service is overloaded, or 500 if there is an internal server error.
+    """
+    async with session_store.use_async(conversation_id, tenant) as session:
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        crm_data = session.get_crm_data(orchestrator.tool.fetch_prospect_details)
+        new_chars = sum(len(m.content) for m in request.new_messages) + len(request.current_prospect_message)
+        try:
+            async with quotas.limit(tenant, estimate_tokens(len(session.history_text), new_chars)):
+                async with admission.admit(admission.priority_for(crm_data)):
+                    result = await process_session_message(session, request)
+            return FastJSONResponse(result)
+        except QuotaExceeded as e:
+            raise _over_quota(e)
+        except Overloaded as e:
+            raise _overloaded(e)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Expose all application metrics in the Prometheus text format.
+
+    Includes per-stage latency histograms and in-flight gauges from request tracing, HTTP
+    latency and error counters, the LLM, queue, admission and quota metrics, and per-component
+    memory gauges (re-measured at most every MEMORY_REFRESH_S).
+    """
+    await asyncio.to_thread(accounting.refresh)
+    return Response(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/kpis", dependencies=[Depends(require_admin)])
+async def kpis(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: str = "auto",
+    group_by: str = "",
+    intent: Optional[str] = None,
+    model: Optional[str] = None,
+    tenant: Optional[str] = None,
+    prompt_version: Optional[str] = None,
+):
+    """
+    Query KPI trends from the rolled-up time-series store.
+
+    Points come from the per-minute, per-hour or per-day rollups (the event log is ingested in the
+    background every KPI_INGEST_INTERVAL_S), so ranges of months are answered without touching raw logs.
+    The KPIs cover every tenant, so the endpoint requires the admin token.
+
+    Args:
+        start (Optional[datetime]): Range start (ISO 8601 or epoch seconds); defaults to 24 hours before `end`.
+        end (Optional[datetime]): Range end; defaults to now.
+        resolution (str): "minute", "hour", "day", or "auto" for the finest with at most ~500 buckets.
+        group_by (str): Comma-separated dimensions to split by (intent, model, tenant, prompt_version).
+        intent, model, tenant, prompt_version (Optional[str]): Only include matching requests.
+
+    Returns:
+        Dict: The resolution used and per-bucket request counts, latency percentiles, confidence,
+        tool error and flag rates, tokens and cost.
+
+    Raises:
+        HTTPException: 400 for an unknown resolution or dimension, 403 without the admin token.
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=1)
+    filters = {
+        name: value
+        for name, value in (("intent", intent), ("model", model), ("tenant", tenant), ("prompt_version", prompt_version))
+        if value is not None
+    }
+    try:
+        return await asyncio.to_thread(
+            kpi_store.query,
+            _epoch(start),
+            _epoch(end),
+            resolution,
+            [d for d in group_by.split(",") if d],
+            filters,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _epoch(value: datetime) -> float:
+    # Naive datetimes are taken as UTC, like the event log timestamps.
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
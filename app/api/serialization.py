@@ -0,0 +1,118 @@
+import argparse
+import json
+import time
+from typing import Any, Dict
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from app.monitoring.tracing import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize plain JSON data (dicts, lists, scalars) to compact UTF-8 bytes.
+
+    Uses orjson when installed and falls back to the standard library encoder.
+    """
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def model_bytes(model: BaseModel) -> bytes:
+    """
+    Serialize a pydantic model straight to JSON bytes with pydantic-core's Rust serializer.
+
+    No intermediate dict is built and the model is not re-validated, so this is only for
+    models the application has just constructed itself. The bytes are identical to FastAPI's
+    default path except for floats below 1e-4, which are written in a different (equally valid)
+    form, e.g. `1e-7` or `0.000025` instead of `1e-07` and `2.5e-05`.
+    """
+    return to_json(model)
+
+
+class FastJSONResponse(Response):
+    """
+    A JSON response that bypasses FastAPI's response_model re-validation and jsonable_encoder.
+
+    Routes keep declaring `response_model` for the OpenAPI schema; returning a Response
+    instance makes FastAPI send it as is. Rendering is traced as the "serialization" stage.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with span("serialization"):
+            if isinstance(content, BaseModel):
+                return model_bytes(content)
+            return dumps(content)
+
+
+def _default_path(model: BaseModel) -> bytes:
+    # Approximates FastAPI's default handling of a response_model route: re-validate the
+    # returned model, convert it with jsonable_encoder, then json.dumps the result.
+    validated = type(model).model_validate(model.model_dump())
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def benchmark(sizes=(1, 10, 100), repeat: int = 2000) -> Dict[int, Dict[str, float]]:
+    """
+    Measure serialization cost per response for the default and the fast path.
+
+    Each size scales the number of tool log entries and next steps and the length of the
+    response draft, to show how the cost grows with response size.
+
+    Args:
+        sizes: The scale factors to measure.
+        repeat (int): Serializations per measurement.
+
+    Returns:
+        Dict[int, Dict[str, float]]: Per size, the payload size and microseconds per response for each path.
+    """
+    from app.models.schemas import ProcessMessageResponse
+
+    results = {}
+    for size in sizes:
+        response = ProcessMessageResponse(
+            detailed_analysis={"intent": "inquiry", "entities": ["pro plan"] * size, "sentiment": "neutral", "confidence": 0.9},
+            suggested_response_draft="Thanks for asking about our plans. " * size,
+            internal_next_steps=[{"action": "SCHEDULE_FOLLOW_UP", "details": {"when": "next Tuesday"}}] * size,
+            tool_usage_log=[{
+                "tool_name": "KnowledgeAugmentationTool",
+                "function": "query_knowledge_base",
+                "input": {"query": "pricing"},
+                "output_summary": "Enterprise plan includes analytics. " * 5,
+            }] * size,
+            confidence_score=0.9,
+            reasoning_trace="Prospect asked about pricing.",
+        )
+        row = {"bytes": len(model_bytes(response))}
+        for name, fn in (("default_us", _default_path), ("fast_us", model_bytes)):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fn(response)
+            row[name] = round((time.perf_counter() - start) / repeat * 1e6, 2)
+        row["speedup"] = round(row["default_us"] / row["fast_us"], 1)
+        results[size] = row
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark ProcessMessageResponse serialization.")
+    parser.add_argument("--repeat", type=int, default=2000, help="Serializations per measurement")
+    args = parser.parse_args()
+
+    print("=== Serialization cost per response ===")
+    for size, row in benchmark(repeat=args.repeat).items():
+        print(
+            f"size x{size} ({row['bytes']} bytes): default {row['default_us']} us, "
+            f"fast {row['fast_us']} us ({row['speedup']}x)"
+        )
@@ -0,0 +1,202 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional
+
+from app.monitoring.metrics import counter, gauge, histogram
+
+PRIORITIES = ("high", "medium", "low")
+
+admission_in_flight = gauge("admission_in_flight", "Requests currently admitted into the pipeline.")
+admission_queue_depth = gauge("admission_queue_depth", "Requests waiting for admission.")
+admission_queue_seconds = histogram(
+    "admission_queue_seconds",
+    "Time admitted requests spent waiting in the admission queue, per priority class.",
+    ("priority",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0),
+)
+admission_shed_total = counter(
+    "admission_shed_total",
+    "Requests rejected with 503 by the admission controller, per priority class and reason.",
+    ("priority", "reason"),
+)
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        """
+        Raised when a request is shed instead of admitted.
+
+        Args:
+            reason (str): Why it was shed: "queue_full", "preempted", "slo" or "queue_timeout".
+            retry_after (int): Suggested seconds before retrying, for the Retry-After header.
+        """
+        super().__init__(f"Service overloaded ({reason}); retry after {retry_after}s.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Waiter:
+    rank: int
+    seq: int
+    priority: str = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int = 32,
+        max_queue: int = 100,
+        max_queue_time_s: float = 2.0,
+        high_lead_score: int = 80,
+        medium_lead_score: int = 50,
+    ):
+        """
+        Bounds the number of requests in the pipeline and sheds load fast when it backs up.
+
+        Up to `max_concurrent` requests run at once; the rest wait in a priority queue served
+        high before medium before low (FIFO within a class). A request is rejected with
+        `Overloaded` instead of waiting when:
+
+        - the queue is full and nobody of lower priority can be preempted ("queue_full"),
+        - a higher-priority request needs its queue slot ("preempted"),
+        - its predicted wait already exceeds the queue-time SLO ("slo"), or
+        - it has waited `max_queue_time_s` without being admitted ("queue_timeout").
+
+        Priority classes come from the prospect's CRM lead score.
+
+        Args:
+            max_concurrent (int): Requests allowed in the pipeline at once.
+            max_queue (int): Requests allowed to wait.
+            max_queue_time_s (float): The queue-time SLO in seconds.
+            high_lead_score (int): Lead scores at or above this are "high" priority.
+            medium_lead_score (int): Lead scores at or above this are "medium"; the rest, and unknown prospects, are "low".
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_time_s = max_queue_time_s
+        self.high_lead_score = high_lead_score
+        self.medium_lead_score = medium_lead_score
+        self._in_flight = 0
+        self._waiters: List[_Waiter] = []
+        self._queued = 0
+        self._seq = itertools.count()
+        # Exponentially weighted average time a request holds its slot, for wait predictions.
+        self._service_time_s: Optional[float] = None
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "32")),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "100")),
+            max_queue_time_s=float(os.getenv("ADMISSION_MAX_QUEUE_TIME_MS", "2000")) / 1000,
+            high_lead_score=int(os.getenv("ADMISSION_HIGH_LEAD_SCORE", "80")),
+            medium_lead_score=int(os.getenv("ADMISSION_MEDIUM_LEAD_SCORE", "50")),
+        )
+
+    def priority_for(self, crm_data: Optional[dict]) -> str:
+        """Map a CRM record to a priority class by its lead score."""
+        lead_score = (crm_data or {}).get("lead_score")
+        if not isinstance(lead_score, (int, float)):
+            return "low"
+        if lead_score >= self.high_lead_score:
+            return "high"
+        if lead_score >= self.medium_lead_score:
+            return "medium"
+        return "low"
+
+    def _retry_after(self) -> int:
+        service = self._service_time_s or self.max_queue_time_s
+        return max(1, math.ceil(service * (self._queued + 1) / self.max_concurrent))
+
+    def _shed(self, priority: str, reason: str) -> Overloaded:
+        admission_shed_total.inc(priority=priority, reason=reason)
+        return Overloaded(reason, self._retry_after())
+
+    def _set_queued(self, delta: int) -> None:
+        self._queued += delta
+        admission_queue_depth.set(self._queued)
+
+    @asynccontextmanager
+    async def admit(self, priority: str = "low") -> AsyncIterator[None]:
+        """
+        Hold a pipeline slot for the duration of the `async with` block.
+
+        Args:
+            priority (str): "high", "medium" or "low".
+
+        Raises:
+            Overloaded: If the request is shed instead of admitted.
+        """
+        enqueued_at = time.perf_counter()
+        if self._in_flight < self.max_concurrent and not self._queued:
+            self._in_flight += 1
+        else:
+            await self._wait(priority)
+        admission_in_flight.set(self._in_flight)
+        started_at = time.perf_counter()
+        admission_queue_seconds.observe(started_at - enqueued_at, priority=priority)
+
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            self._service_time_s = elapsed if self._service_time_s is None else 0.9 * self._service_time_s + 0.1 * elapsed
+            self._release()
+
+    async def _wait(self, priority: str) -> None:
+        rank = PRIORITIES.index(priority)
+
+        if self._service_time_s is not None:
+            predicted_wait = self._service_time_s * (self._queued + 1) / self.max_concurrent
+            if predicted_wait > self.max_queue_time_s:
+                raise self._shed(priority, "slo")
+
+        if self._queued >= self.max_queue:
+            live = [w for w in self._waiters if not w.future.done()]
+            worst = max(live) if live else None
+            if worst is None or worst.rank <= rank:
+                raise self._shed(priority, "queue_full")
+            # Preempt the newest waiter of the lowest priority class in favour of this request.
+            worst.future.set_exception(self._shed(worst.priority, "preempted"))
+            self._set_queued(-1)
+
+        waiter = _Waiter(rank, next(self._seq), priority, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, waiter)
+        self._set_queued(1)
+
+        try:
+            await asyncio.wait_for(waiter.future, self.max_queue_time_s)
+        except asyncio.TimeoutError:
+            self._set_queued(-1)
+            raise self._shed(priority, "queue_timeout")
+        except asyncio.CancelledError:
+            future = waiter.future
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # The slot was handed over just as the caller went away: pass it on.
+                self._release()
+            elif not (future.done() and not future.cancelled()):
+                self._set_queued(-1)
+            raise
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        while self._waiters:
+            waiter = heapq.heappop(self._waiters)
+            if waiter.future.done():
+                continue
+            self._in_flight += 1
+            self._set_queued(-1)
+            waiter.future.set_result(None)
+            break
+        admission_in_flight.set(self._in_flight)
+
+
+admission = AdmissionController.from_env()
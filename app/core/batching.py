@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.admission import admission
+from app.core.llm_orchestrator import orchestrator, process_message_pipeline
+from app.core.quotas import estimate_request_tokens, quotas
+from app.core.tools import KnowledgeAugmentationTool
+from app.models.schemas import ProcessMessageRequest, ProcessMessageResponse
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+# Knowledge base queries arriving within this window are embedded and searched together.
+KB_BATCH_WINDOW_S = float(os.getenv("KB_BATCH_WINDOW_MS", "5")) / 1000
+KB_BATCH_MAX_SIZE = int(os.getenv("KB_BATCH_MAX_SIZE", "64"))
+
+
+class BatchContext:
+    def __init__(self, tool: KnowledgeAugmentationTool, requests: List[ProcessMessageRequest]):
+        """
+        Shared tool access for the items of one batch.
+
+        CRM records are fetched once per distinct prospect ID up front. Knowledge base queries
+        are micro-batched: a query waits at most `KB_BATCH_WINDOW_S` (or until `KB_BATCH_MAX_SIZE`
+        queries are pending) and is then embedded and searched together with the others, so items
+        still flow through the pipeline independently.
+
+        Args:
+            tool (KnowledgeAugmentationTool): The tool used for lookups.
+            requests (List[ProcessMessageRequest]): The batch, used to prefetch CRM records.
+        """
+        self.tool = tool
+        prospect_ids = {r.prospect_id for r in requests if r.prospect_id}
+        self.crm_cache: Dict[str, Dict] = {pid: tool.fetch_prospect_details(pid) for pid in prospect_ids}
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def fetch_prospect_details(self, prospect_id: str) -> Dict:
+        """Return the prefetched CRM record for a prospect, fetching it if it was not prefetched."""
+        if prospect_id not in self.crm_cache:
+            self.crm_cache[prospect_id] = self.tool.fetch_prospect_details(prospect_id)
+        return self.crm_cache[prospect_id]
+
+    async def query_knowledge_base(self, query: str) -> List[Dict]:
+        """Queue a knowledge base query for the next micro-batch and wait for its results."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, future))
+        if len(self._pending) >= KB_BATCH_MAX_SIZE:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(KB_BATCH_WINDOW_S, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        results = self.tool.query_knowledge_base_batch([query for query, _ in pending])
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+
+async def process_batch(
+    requests: List[ProcessMessageRequest],
+    max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    tenant: Optional[str] = None,
+) -> AsyncIterator[Tuple[int, Optional[ProcessMessageResponse], Optional[Exception]]]:
+    """
+    Process many requests with bounded concurrency, yielding results as soon as each finishes.
+
+    Each item goes through the same path as `POST /process_message`: it is charged to the
+    tenant's quotas, waits for an admission slot at its prospect's priority (items shed under
+    overload fail with Overloaded), and joins an identical in-flight request instead of
+    running the pipeline twice.
+
+    Args:
+        requests (List[ProcessMessageRequest]): The requests to process.
+        max_concurrency (int): The maximum number of items in the pipeline at once.
+        tenant (Optional[str]): If given, every item is charged to this tenant's quotas; items
+            over quota fail with QuotaExceeded.
+
+    Yields:
+        Tuple[int, Optional[ProcessMessageResponse], Optional[Exception]]: The item's index in
+        `requests`, and either its response or the exception it failed with, in completion order.
+    """
+    batch = BatchContext(orchestrator.tool, requests)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def admitted(request: ProcessMessageRequest) -> ProcessMessageResponse:
+        crm_data = batch.fetch_prospect_details(request.prospect_id) if request.prospect_id else None
+        async with admission.admit(admission.priority_for(crm_data)):
+            return await process_message_pipeline(request, batch=batch)
+
+    async def run(index: int, request: ProcessMessageRequest):
+        async with semaphore:
+            try:
+                if tenant is None:
+                    return index, await admitted(request), None
+                async with quotas.limit(tenant, estimate_request_tokens(request)):
+                    return index, await admitted(request), None
+            except Exception as e:
+                logger.error(f"Batch item {index} failed: {e}")
+                return index, None, e
+
+    tasks = [asyncio.ensure_future(run(i, r)) for i, r in enumerate(requests)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The client went away or the consumer stopped early: don't keep spending on LLM calls.
+        for task in tasks:
+            task.cancel()
+
+
+async def compare_throughput(requests: List[ProcessMessageRequest], max_concurrency: int = BATCH_MAX_CONCURRENCY) -> Dict[str, float]:
+    """
+    Measure items/sec of the batch path against processing the same requests one by one.
+
+    Returns:
+        Dict[str, float]: Throughput of both paths and the resulting speedup.
+    """
+    start = time.perf_counter()
+    for request in requests:
+        await process_message_pipeline(request)
+    sequential = len(requests) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    async for _ in process_batch(requests, max_concurrency):
+        pass
+    batched = len(requests) / (time.perf_counter() - start)
+
+    return {
+        "items": len(requests),
+        "sequential_items_per_sec": round(sequential, 3),
+        "batch_items_per_sec": round(batched, 3),
+        "speedup": round(batched / sequential, 2),
+    }
+
+
+if __name__ == "__main__":
+    from app.evaluation.golden_dataset import GOLDEN_DATASET
+
+    parser = argparse.ArgumentParser(description="Compare batch vs one-by-one throughput on the golden dataset.")
+    parser.add_argument("--concurrency", type=int, default=BATCH_MAX_CONCURRENCY, help="Batch concurrency")
+    args = parser.parse_args()
+
+    golden_requests = [
+        ProcessMessageRequest(
+            conversation_history=example["conversation_history"],
+            current_prospect_message=example["current_prospect_message"],
+            prospect_id=example["prospect_id"],
+        )
+        for example in GOLDEN_DATASET
+    ]
+    for k, v in asyncio.run(compare_throughput(golden_requests, args.concurrency)).items():
+        print(f"{k}: {v}")
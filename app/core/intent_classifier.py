@@ -0,0 +1,272 @@
+import argparse
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.core.intent_seeds import SEED_EXAMPLES
+from app.evaluation.golden_dataset import GOLDEN_DATASET
+from app.models.enums import Intent, Sentiment
+
+logger = logging.getLogger(__name__)
+
+EVENTS_FILE = "logs/events.jsonl"
+
+# Contact details that must not reach the event log: e-mail addresses, URLs, and phone, card or account numbers.
+_PII_PATTERNS = [
+    (re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"), "<email>"),
+    (re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE), "<url>"),
+    (re.compile(r"\+?\d[\d\s().-]{6,}\d"), "<number>"),
+]
+
+# The golden dataset uses fine-grained intents; map them onto the coarse labels the pipeline routes on.
+# It is only ever used to evaluate the classifier, never to train it.
+GOLDEN_LABELS = {
+    "pricing_comparison": (Intent.INQUIRY, Sentiment.NEUTRAL),
+    "integration_query": (Intent.INQUIRY, Sentiment.NEUTRAL),
+    "competitor_comparison": (Intent.OBJECTION, Sentiment.NEUTRAL),
+    "security_concern": (Intent.OBJECTION, Sentiment.NEGATIVE),
+    "efficiency_inquiry": (Intent.INQUIRY, Sentiment.NEUTRAL),
+    "onboarding_query": (Intent.INQUIRY, Sentiment.NEUTRAL),
+    "follow_up": (Intent.CLARIFICATION, Sentiment.NEUTRAL),
+    "scalability_pricing": (Intent.INQUIRY, Sentiment.NEUTRAL),
+    "trial_request": (Intent.BUYING_SIGNAL, Sentiment.POSITIVE),
+    "feature_inquiry": (Intent.INQUIRY, Sentiment.NEUTRAL),
+    "objection_handling": (Intent.OBJECTION, Sentiment.NEGATIVE),
+    "use_case_validation": (Intent.INQUIRY, Sentiment.NEUTRAL),
+    "renewal_question": (Intent.BUYING_SIGNAL, Sentiment.NEUTRAL),
+    "deployment_help": (Intent.BUYING_SIGNAL, Sentiment.POSITIVE),
+    "technical_issue": (Intent.OTHER, Sentiment.NEGATIVE),
+}
+
+
+@dataclass
+class LabeledExample:
+    text: str
+    intent: str
+    sentiment: str
+
+
+@dataclass
+class IntentPrediction:
+    intent: str
+    sentiment: str
+    confidence: float
+
+
+def seed_examples() -> List[LabeledExample]:
+    """Build the hand-written training examples in `app.core.intent_seeds`."""
+    return [LabeledExample(e["text"], e["intent"], e["sentiment"]) for e in SEED_EXAMPLES]
+
+
+def golden_examples() -> List[LabeledExample]:
+    """
+    Build held-out evaluation examples from the prospect messages in the golden dataset.
+
+    Returns:
+        List[LabeledExample]: One example per golden entry whose intent has a coarse mapping.
+    """
+    examples = []
+    for entry in GOLDEN_DATASET:
+        labels = GOLDEN_LABELS.get(entry["ground_truth"]["intent"])
+        if labels:
+            examples.append(LabeledExample(entry["current_prospect_message"], labels[0].value, labels[1].value))
+    return examples
+
+
+def redact(text: str) -> str:
+    """
+    Replace e-mail addresses, URLs and long digit sequences (phone, card and account numbers).
+
+    Used before a prospect message is written to the event log as a training example. It does
+    not catch names or free-text identifiers, which is why logging messages is opt-in.
+    """
+    for pattern, replacement in _PII_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def logged_examples(path: str = EVENTS_FILE, min_confidence: float = 0.9) -> List[LabeledExample]:
+    """
+    Build labeled examples from LLM analyses recorded in the production event log.
+
+    Only "analysis" events produced by the LLM (not by this classifier) that recorded the
+    message, with a confidence of at least `min_confidence` and intent/sentiment values from
+    `app.models.enums`, are used. Messages from the golden dataset (e.g. replayed by the traffic
+    simulator) are skipped so the evaluation set never leaks into training.
+
+    Args:
+        path (str): The JSON lines event log.
+        min_confidence (float): The minimum LLM confidence for an analysis to be used as a label.
+
+    Returns:
+        List[LabeledExample]: The usable examples, or an empty list if the log does not exist.
+    """
+    if not os.path.exists(path):
+        return []
+
+    intents = {i.value for i in Intent}
+    sentiments = {s.value for s in Sentiment}
+    held_out = {entry["current_prospect_message"] for entry in GOLDEN_DATASET}
+    examples = []
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if (
+                event.get("event") == "analysis"
+                and event.get("source") == "llm"
+                and event.get("confidence", 0) >= min_confidence
+                and event.get("intent") in intents
+                and event.get("sentiment") in sentiments
+                and event.get("message")
+                and event["message"] not in held_out
+            ):
+                examples.append(LabeledExample(event["message"], event["intent"], event["sentiment"]))
+    return examples
+
+
+class IntentClassifier:
+    def __init__(self, model, examples: List[LabeledExample], k: int = 5):
+        """
+        A k-nearest-neighbour intent and sentiment classifier over sentence embeddings.
+
+        The labeled examples are embedded once, normalized, and kept as a dense matrix, so
+        classifying a message costs one encode plus a single matrix-vector product.
+
+        Args:
+            model: A SentenceTransformer (or anything with a compatible `encode` method).
+            examples (List[LabeledExample]): The labeled examples to vote with.
+            k (int): The number of neighbours that vote on each prediction.
+        """
+        self.model = model
+        self.examples = examples
+        self.k = min(k, len(examples))
+        self.intents = np.array([e.intent for e in examples])
+        self.sentiments = np.array([e.sentiment for e in examples])
+        self.embeddings = self._encode([e.text for e in examples]) if examples else np.zeros((0, 0), dtype=np.float32)
+
+    @classmethod
+    def bootstrap(cls, model, log_path: str = EVENTS_FILE, k: int = 5) -> "IntentClassifier":
+        """Build a classifier from the seed examples plus high-confidence production analyses."""
+        examples = seed_examples() + logged_examples(log_path)
+        logger.info(f"Intent classifier bootstrapped with {len(examples)} labeled examples.")
+        return cls(model, examples, k=k)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = np.asarray(self.model.encode(texts, convert_to_tensor=False), dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def classify(self, text: str) -> Optional[IntentPrediction]:
+        """
+        Predict the intent and sentiment of a prospect message.
+
+        Args:
+            text (str): The prospect message.
+
+        Returns:
+            Optional[IntentPrediction]: The prediction, or None if there are no labeled examples.
+        """
+        if not self.k:
+            return None
+        return self._vote(self.embeddings @ self._encode([text])[0])
+
+    def _vote(self, similarities: np.ndarray) -> IntentPrediction:
+        """
+        Similarity-weighted vote among the k nearest examples.
+
+        The confidence is the winning intent's share of the vote scaled by the similarity of
+        its closest example, so messages far from every labeled example get a low confidence
+        even when their neighbours agree.
+        """
+        k = min(self.k, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        weights = np.clip(similarities[top], 0.0, None)
+        total = weights.sum() or 1.0
+
+        intent_votes: Dict[str, float] = {}
+        sentiment_votes: Dict[str, float] = {}
+        for i, w in zip(top, weights):
+            intent_votes[self.intents[i]] = intent_votes.get(self.intents[i], 0.0) + w
+            sentiment_votes[self.sentiments[i]] = sentiment_votes.get(self.sentiments[i], 0.0) + w
+
+        intent = max(intent_votes, key=intent_votes.get)
+        sentiment = max(sentiment_votes, key=sentiment_votes.get)
+        nearest = max(similarities[i] for i in top if self.intents[i] == intent)
+        confidence = float(intent_votes[intent] / total * max(nearest, 0.0))
+        return IntentPrediction(intent=str(intent), sentiment=str(sentiment), confidence=round(confidence, 4))
+
+    def report(
+        self,
+        thresholds: Iterable[float] = (0.5, 0.6, 0.7, 0.8, 0.9),
+        held_out: Optional[List[LabeledExample]] = None,
+    ) -> List[Dict[str, float]]:
+        """
+        Accuracy and coverage of the classifier at several confidence thresholds.
+
+        With `held_out` examples (e.g. `golden_examples()`), each is classified against the
+        training examples; otherwise each training example is classified against all the others
+        (leave-one-out). Coverage is the fraction of examples whose confidence reaches the
+        threshold (i.e. that would skip the LLM call), and accuracy is measured on those covered
+        examples only.
+
+        Args:
+            thresholds (Iterable[float]): The confidence thresholds to report on.
+            held_out (Optional[List[LabeledExample]]): Examples to evaluate on instead of leave-one-out.
+
+        Returns:
+            List[Dict[str, float]]: One row per threshold with coverage, intent and sentiment accuracy.
+        """
+        if held_out is not None:
+            if not held_out or not self.k:
+                return []
+            examples = held_out
+            similarities = self._encode([e.text for e in held_out]) @ self.embeddings.T
+        else:
+            if len(self.examples) < 2:
+                return []
+            examples = self.examples
+            similarities = self.embeddings @ self.embeddings.T
+            np.fill_diagonal(similarities, -np.inf)
+        predictions = [self._vote(similarities[i]) for i in range(len(examples))]
+
+        rows = []
+        for threshold in thresholds:
+            covered = [(p, e) for p, e in zip(predictions, examples) if p.confidence >= threshold]
+            n = len(covered)
+            rows.append({
+                "threshold": threshold,
+                "coverage": n / len(examples),
+                "intent_accuracy": sum(p.intent == e.intent for p, e in covered) / n if n else 0.0,
+                "sentiment_accuracy": sum(p.sentiment == e.sentiment for p, e in covered) / n if n else 0.0,
+            })
+        return rows
+
+
+if __name__ == "__main__":
+    from app.core.tools import KnowledgeAugmentationTool
+
+    parser = argparse.ArgumentParser(description="Offline accuracy/coverage report for the intent pre-classifier.")
+    parser.add_argument("--logs", type=str, default=EVENTS_FILE, help="Event log to bootstrap extra examples from")
+    parser.add_argument("--k", type=int, default=5, help="Number of neighbours")
+    args = parser.parse_args()
+
+    tool = KnowledgeAugmentationTool()
+    if not tool.model:
+        raise SystemExit("Embedding model unavailable; cannot build the classifier.")
+
+    classifier = IntentClassifier.bootstrap(tool.model, log_path=args.logs, k=args.k)
+    held_out = golden_examples()
+    print(f"=== Intent Classifier Report ({len(classifier.examples)} training, {len(held_out)} golden examples) ===")
+    for row in classifier.report(held_out=held_out):
+        print(
+            f"threshold {row['threshold']:.2f}: coverage {row['coverage']:.2%}, "
+            f"intent accuracy {row['intent_accuracy']:.2%}, sentiment accuracy {row['sentiment_accuracy']:.2%}"
+        )
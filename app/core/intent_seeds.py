@@ -0,0 +1,44 @@
+# Hand-written seed examples for the intent classifier.
+#
+# These must stay disjoint from app/evaluation/golden_dataset.py: the golden dataset measures the
+# classifier, so none of its messages may be used to train it.
+
+from typing import Dict, List
+
+SEED_EXAMPLES: List[Dict[str, str]] = [
+    # inquiry
+    {"text": "What's included in the starter tier?", "intent": "inquiry", "sentiment": "neutral"},
+    {"text": "Do you have an API we can call from our own backend?", "intent": "inquiry", "sentiment": "neutral"},
+    {"text": "Is there a per-seat price or a flat monthly fee?", "intent": "inquiry", "sentiment": "neutral"},
+    {"text": "Which CRMs do you sync with out of the box?", "intent": "inquiry", "sentiment": "neutral"},
+    {"text": "How long does a typical rollout take for a team of fifty?", "intent": "inquiry", "sentiment": "neutral"},
+    {"text": "Can we export our data if we ever leave?", "intent": "inquiry", "sentiment": "neutral"},
+    {"text": "Does the dashboard support custom reports?", "intent": "inquiry", "sentiment": "neutral"},
+    {"text": "This looks great, what does support look like on your side?", "intent": "inquiry", "sentiment": "positive"},
+    # objection
+    {"text": "Honestly that's way over our budget.", "intent": "objection", "sentiment": "negative"},
+    {"text": "Our legal team won't sign off without on-prem hosting.", "intent": "objection", "sentiment": "negative"},
+    {"text": "We already use a competitor and switching sounds painful.", "intent": "objection", "sentiment": "negative"},
+    {"text": "I'm worried about where our customer data would be stored.", "intent": "objection", "sentiment": "negative"},
+    {"text": "The last tool like this we bought never got adopted.", "intent": "objection", "sentiment": "negative"},
+    {"text": "Another vendor quoted us half of that.", "intent": "objection", "sentiment": "neutral"},
+    # buying_signal
+    {"text": "Send over the contract and we'll get it signed this week.", "intent": "buying_signal", "sentiment": "positive"},
+    {"text": "Can we set up a pilot for our sales team next month?", "intent": "buying_signal", "sentiment": "positive"},
+    {"text": "Who do I talk to about purchasing twenty licenses?", "intent": "buying_signal", "sentiment": "positive"},
+    {"text": "We're ready to move forward, what are the next steps?", "intent": "buying_signal", "sentiment": "positive"},
+    {"text": "Our renewal is coming up, can you send a quote for another year?", "intent": "buying_signal", "sentiment": "neutral"},
+    {"text": "I'd like to book an onboarding call for the team.", "intent": "buying_signal", "sentiment": "positive"},
+    # clarification
+    {"text": "Sorry, what did you mean by usage-based?", "intent": "clarification", "sentiment": "neutral"},
+    {"text": "Could you explain that last point again?", "intent": "clarification", "sentiment": "neutral"},
+    {"text": "Wait, is that price per user or per account?", "intent": "clarification", "sentiment": "neutral"},
+    {"text": "Did you mean the add-on is included or extra?", "intent": "clarification", "sentiment": "neutral"},
+    {"text": "Following up on my email from Tuesday, any update?", "intent": "clarification", "sentiment": "neutral"},
+    # other
+    {"text": "I can't log in, it keeps saying my password is wrong.", "intent": "other", "sentiment": "negative"},
+    {"text": "The export button throws an error every time.", "intent": "other", "sentiment": "negative"},
+    {"text": "Thanks, have a good weekend!", "intent": "other", "sentiment": "positive"},
+    {"text": "Please remove me from this mailing list.", "intent": "other", "sentiment": "negative"},
+    {"text": "I'm out of office until Monday.", "intent": "other", "sentiment": "neutral"},
+]
@@ -0,0 +1,500 @@
+import asyncio
+import ipaddress
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.quotas import TenantQuotas, estimate_request_tokens
+from app.models.schemas import ProcessMessageRequest, ProcessMessageResponse
+from app.monitoring.metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "data/jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Retry n waits JOB_RETRY_BACKOFF_S * 2^(n-1) seconds.
+JOB_RETRY_BACKOFF_S = float(os.getenv("JOB_RETRY_BACKOFF_S", "2"))
+JOB_POLL_INTERVAL_S = float(os.getenv("JOB_POLL_INTERVAL_S", "1"))
+JOB_CALLBACK_TIMEOUT_S = float(os.getenv("JOB_CALLBACK_TIMEOUT_S", "10"))
+# A running job whose lease is not renewed for this long is assumed abandoned and requeued.
+JOB_LEASE_S = float(os.getenv("JOB_LEASE_S", "60"))
+# Callback URL schemes and hosts that are allowed; an empty host list allows any host that
+# resolves only to public addresses. Listed hosts may resolve to private addresses.
+JOB_CALLBACK_SCHEMES = [s for s in os.getenv("JOB_CALLBACK_SCHEMES", "https").split(",") if s]
+JOB_CALLBACK_ALLOWED_HOSTS = [h.lower() for h in os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "").split(",") if h]
+
+job_queue_depth = gauge("job_queue_depth", "Jobs waiting to be picked up by a worker.")
+job_queue_wait_seconds = histogram(
+    "job_queue_wait_seconds",
+    "Time from submission (or retry) until a worker picked the job up.",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+jobs_total = counter("jobs_total", "Job lifecycle events by outcome.", ("outcome",))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    callback_url TEXT,
+    tenant TEXT,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, available_at, created_at);
+-- Idempotency keys are per tenant, so one tenant can never be handed another tenant's job.
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_idempotency ON jobs (COALESCE(tenant, ''), idempotency_key);
+"""
+
+COLUMNS = (
+    "id, idempotency_key, priority, status, payload, result, error, attempts, max_attempts, callback_url,"
+    " tenant, created_at, available_at, started_at, finished_at, owner, lease_until"
+)
+
+
+def validate_callback_url(url: str) -> None:
+    """
+    Check a job's callback URL before it is accepted, so callbacks cannot be aimed at internal services.
+
+    The scheme must be one of JOB_CALLBACK_SCHEMES, and the host must be in
+    JOB_CALLBACK_ALLOWED_HOSTS when that is set. Otherwise the host must not be a private,
+    loopback, link-local or otherwise non-public IP address. Host names are resolved at
+    delivery time by `resolve_callback_host`.
+
+    Raises:
+        ValueError: If the URL is not allowed.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in JOB_CALLBACK_SCHEMES:
+        raise ValueError(f"callback_url scheme must be one of {JOB_CALLBACK_SCHEMES}.")
+    host = (parts.hostname or "").lower()
+    if not host:
+        raise ValueError("callback_url has no host.")
+    if JOB_CALLBACK_ALLOWED_HOSTS:
+        if host not in JOB_CALLBACK_ALLOWED_HOSTS:
+            raise ValueError(f"callback_url host '{host}' is not in JOB_CALLBACK_ALLOWED_HOSTS.")
+        return
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        if host == "localhost" or host.endswith((".localhost", ".local", ".internal")):
+            raise ValueError(f"callback_url host '{host}' is not public.")
+        return
+    if not address.is_global:
+        raise ValueError(f"callback_url address '{host}' is not public.")
+
+
+def resolve_callback_host(url: str) -> None:
+    """
+    Check that a callback URL's host resolves only to public addresses (unless it is allowlisted).
+
+    Raises:
+        ValueError: If the URL is not allowed or a resolved address is not public.
+    """
+    validate_callback_url(url)
+    parts = urlsplit(url)
+    if JOB_CALLBACK_ALLOWED_HOSTS:
+        return
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+    except socket.gaierror as e:
+        raise ValueError(f"callback_url host '{parts.hostname}' does not resolve: {e}")
+    for info in infos:
+        if not ipaddress.ip_address(info[4][0].split("%")[0]).is_global:
+            raise ValueError(f"callback_url host '{parts.hostname}' resolves to non-public address {info[4][0]}.")
+
+
+class JobQueue:
+    def __init__(self, path: str = JOB_QUEUE_PATH, max_attempts: int = JOB_MAX_ATTEMPTS, lease_s: float = JOB_LEASE_S):
+        """
+        A durable priority queue of process_message jobs stored in SQLite.
+
+        Jobs survive restarts. A claimed job is leased to this queue's `owner` for `lease_s`
+        seconds, and its worker renews the lease while it runs; a "running" job whose lease has
+        expired (its process crashed or hung) is requeued, while jobs another live process is
+        running are left alone. Higher `priority` values are served first, FIFO within a
+        priority. Submitting with an idempotency key the same tenant already used returns the existing job.
+
+        The database is opened by `open`, not on construction, so importing the app does not
+        touch the queue.
+
+        Args:
+            path (str): The SQLite database file (":memory:" for tests).
+            max_attempts (int): How many times a job is tried before it is marked failed.
+            lease_s (float): How long a claimed job stays leased without a renewal.
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lease_s = lease_s
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def open(self) -> "JobQueue":
+        """Open (and if needed create or migrate) the database, and requeue jobs with expired leases."""
+        if self._conn is not None:
+            return self
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            existing = self._conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'jobs'").fetchone()
+            if existing is not None:
+                columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+                for column, kind in (("tenant", "TEXT"), ("owner", "TEXT"), ("lease_until", "REAL")):
+                    if column not in columns:
+                        self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+                if "idempotency_key TEXT UNIQUE" in existing["sql"]:
+                    self._migrate_idempotency_scope()
+            self._conn.executescript(SCHEMA)
+        self.requeue_expired()
+        self._update_depth()
+        return self
+
+    def _migrate_idempotency_scope(self) -> None:
+        # Databases created before idempotency keys were scoped per tenant have a global UNIQUE
+        # constraint on the column, which SQLite can only drop by rebuilding the table.
+        self._conn.executescript(f"""
+            BEGIN;
+            ALTER TABLE jobs RENAME TO jobs_unscoped;
+            DROP INDEX IF EXISTS jobs_ready;
+            {SCHEMA}
+            INSERT INTO jobs ({COLUMNS}) SELECT {COLUMNS} FROM jobs_unscoped;
+            DROP TABLE jobs_unscoped;
+            COMMIT;
+        """)
+        logger.info("Migrated the job queue to per-tenant idempotency keys.")
+
+    def requeue_expired(self) -> int:
+        """
+        Put back in the queue every running job whose lease has expired (or that predates leases).
+
+        Returns:
+            int: The number of jobs requeued.
+        """
+        now = time.time()
+        with self._lock:
+            recovered = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, available_at = ?"
+                " WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?)",
+                (now, now),
+            ).rowcount
+        if recovered:
+            logger.warning(f"Requeued {recovered} running jobs whose lease expired.")
+            jobs_total.inc(recovered, outcome="lease_expired")
+            job_queue_depth.inc(recovered)
+        return recovered
+
+    def _update_depth(self) -> None:
+        job_queue_depth.set(self.depth())
+
+    def depth(self) -> int:
+        """Return the number of queued jobs."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def submit(
+        self,
+        request: ProcessMessageRequest,
+        priority: int = 0,
+        idempotency_key: Optional[str] = None,
+        callback_url: Optional[str] = None,
+        tenant: Optional[str] = None,
+    ) -> Dict:
+        """
+        Add a job to the queue.
+
+        Args:
+            request (ProcessMessageRequest): The message to process.
+            priority (int): Higher values are processed first.
+            idempotency_key (Optional[str]): Deduplicates the tenant's submissions; resubmitting returns the
+                tenant's existing job. Other tenants' keys never match.
+            callback_url (Optional[str]): Receives a POST with the job status once it finishes.
+            tenant (Optional[str]): The tenant the job's LLM usage is charged to.
+
+        Returns:
+            Dict: The job, as returned by `get`.
+
+        Raises:
+            ValueError: If `callback_url` is not allowed (see `validate_callback_url`).
+        """
+        if callback_url:
+            validate_callback_url(callback_url)
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, idempotency_key, priority, status, payload, max_attempts, callback_url,"
+                    " tenant, created_at, available_at) VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?, ?)",
+                    (job_id, idempotency_key, priority, request.model_dump_json(), self.max_attempts,
+                     callback_url, tenant, now, now),
+                )
+            except sqlite3.IntegrityError:
+                jobs_total.inc(outcome="deduplicated")
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE idempotency_key = ? AND COALESCE(tenant, '') = ?",
+                    (idempotency_key, tenant or ""),
+                ).fetchone()
+                return self._to_dict(row)
+        jobs_total.inc(outcome="submitted")
+        job_queue_depth.inc()
+        return self.get(job_id)
+
+    def claim(self) -> Optional[Dict]:
+        """
+        Atomically take the next ready job, mark it running and lease it to this queue's owner.
+
+        Returns:
+            Optional[Dict]: The job, or None if nothing is ready.
+        """
+        self.requeue_expired()
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' AND available_at <= ?"
+                    " ORDER BY priority DESC, available_at, created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, owner = ?,"
+                    " lease_until = ? WHERE id = ?",
+                    (now, self.owner, now + self.lease_s, row["id"]),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        job_queue_depth.dec()
+        job_queue_wait_seconds.observe(now - row["available_at"])
+        job = self._to_dict(row)
+        job["status"], job["attempts"] = "running", row["attempts"] + 1
+        job["owner"], job["lease_until"] = self.owner, now + self.lease_s
+        return job
+
+    def renew(self, job_id: str) -> bool:
+        """
+        Extend the lease of a job this queue is running.
+
+        Returns:
+            bool: False if the lease was lost (it expired and the job was requeued or taken over).
+        """
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running' AND owner = ?",
+                (time.time() + self.lease_s, job_id, self.owner),
+            ).rowcount > 0
+
+    def complete(self, job_id: str, response: ProcessMessageResponse) -> bool:
+        """
+        Mark a job succeeded and store its response.
+
+        Returns:
+            bool: False if this queue no longer holds the job's lease, in which case nothing is recorded.
+        """
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, finished_at = ?, owner = NULL,"
+                " lease_until = NULL WHERE id = ? AND status = 'running' AND owner = ?",
+                (response.model_dump_json(), time.time(), job_id, self.owner),
+            ).rowcount > 0
+        if updated:
+            jobs_total.inc(outcome="succeeded")
+        else:
+            logger.warning(f"Job {job_id} finished after its lease was lost; discarding the result.")
+        return updated
+
+    def fail(self, job_id: str, error: str) -> bool:
+        """
+        Record a failed attempt. The job is requeued with exponential backoff until it runs out of attempts.
+
+        Returns:
+            bool: True if the job will be retried, False if it is now permanently failed.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = 'running' AND owner = ?",
+                (job_id, self.owner),
+            ).fetchone()
+            if row is None:
+                logger.warning(f"Job {job_id} failed after its lease was lost; not recording the failure.")
+                return False
+            retry = row["attempts"] < row["max_attempts"]
+            if retry:
+                delay = JOB_RETRY_BACKOFF_S * 2 ** (row["attempts"] - 1)
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, available_at = ?, owner = NULL, lease_until = NULL"
+                    " WHERE id = ?",
+                    (error, now + delay, job_id),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, owner = NULL, lease_until = NULL"
+                    " WHERE id = ?",
+                    (error, now, job_id),
+                )
+        if retry:
+            jobs_total.inc(outcome="retried")
+            job_queue_depth.inc()
+        else:
+            jobs_total.inc(outcome="failed")
+        return retry
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a job by ID, or None if it does not exist."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def _to_dict(self, row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def close(self) -> None:
+        """Requeue the jobs this queue was still running (e.g. interrupted by shutdown) and close the database."""
+        if self._conn is None:
+            return
+        with self._lock:
+            released = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, available_at = ?"
+                " WHERE status = 'running' AND owner = ?",
+                (time.time(), self.owner),
+            ).rowcount
+            self._conn.close()
+            self._conn = None
+        if released:
+            logger.info(f"Requeued {released} interrupted jobs on shutdown.")
+
+
+class JobWorkerPool:
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: Callable[[ProcessMessageRequest], Awaitable[ProcessMessageResponse]],
+        workers: int = JOB_WORKERS,
+        quotas: Optional[TenantQuotas] = None,
+    ):
+        """
+        A pool of asyncio workers that drain a JobQueue through `handler`.
+
+        Workers sleep until a job is submitted (or the poll interval passes, which also picks up
+        retries whose backoff has elapsed). Queue operations run in a thread so SQLite I/O never
+        blocks the event loop. With `quotas`, jobs that carry a tenant wait for that tenant's
+        quota before running; a job still over quota after the longest wait fails and is retried.
+
+        Args:
+            queue (JobQueue): The queue to drain.
+            handler: The coroutine that processes one request, normally `process_message_pipeline`.
+            workers (int): The number of concurrent workers.
+            quotas (Optional[TenantQuotas]): Per-tenant quotas to charge jobs to.
+        """
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.quotas = quotas
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._run(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} job workers.")
+
+    async def stop(self) -> None:
+        """Stop the workers. A job interrupted mid-run is requeued by `JobQueue.close` (or once its lease expires)."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers, e.g. right after a submission."""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _run(self, worker_id: int) -> None:
+        while True:
+            job = await asyncio.to_thread(self.queue.claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL_S)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heartbeat = asyncio.ensure_future(self._heartbeat(job["id"]))
+            try:
+                response = await self._handle(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job['id']} attempt {job['attempts']} failed: {e}")
+                if await asyncio.to_thread(self.queue.fail, job["id"], str(e)):
+                    continue
+            else:
+                if not await asyncio.to_thread(self.queue.complete, job["id"], response):
+                    continue
+            finally:
+                heartbeat.cancel()
+
+            if job["callback_url"]:
+                await self._deliver_callback(job["id"], job["callback_url"])
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Renew a running job's lease every third of the lease period, so other processes leave it alone."""
+        while True:
+            await asyncio.sleep(self.queue.lease_s / 3)
+            if not await asyncio.to_thread(self.queue.renew, job_id):
+                logger.warning(f"Lost the lease on job {job_id}; another process may run it again.")
+                return
+
+    async def _handle(self, job: Dict) -> ProcessMessageResponse:
+        request = ProcessMessageRequest(**job["payload"])
+        if self.quotas is None or not job["tenant"]:
+            return await self.handler(request)
+        async with self.quotas.limit(job["tenant"], estimate_request_tokens(request), queue=True):
+            return await self.handler(request)
+
+    async def _deliver_callback(self, job_id: str, url: str) -> None:
+        job = await asyncio.to_thread(self.queue.get, job_id)
+        body = {"job_id": job_id, "status": job["status"], "result": job["result"], "error": job["error"]}
+        try:
+            # Checked again here: the host may now resolve to an internal address.
+            await asyncio.to_thread(resolve_callback_host, url)
+            # Redirects are not followed, as they could point anywhere.
+            async with httpx.AsyncClient(timeout=JOB_CALLBACK_TIMEOUT_S, follow_redirects=False) as http:
+                response = await http.post(url, json=body)
+                response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Callback for job {job_id} to {url} failed: {e}")
@@ -1,12 +1,25 @@
 import os
 import json
-from openai import AsyncOpenAI
-from typing import List
+import time
+from openai import AsyncOpenAI, BadRequestError
+from pydantic import BaseModel, ValidationError
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Type
 from app.models.schemas import (
     Message, ProcessMessageRequest, ProcessMessageResponse,
-    AnalysisResult, ToolUsageLogEntry
+    AnalysisResult, SynthesisResult, ToolUsageLogEntry, SessionMessageRequest, InternalAction, LLMUsage
 )
 from app.core.tools import KnowledgeAugmentationTool
+from app.core.intent_classifier import IntentClassifier, redact
+from app.core.singleflight import SingleFlight, request_key
+from app.core.sessions import Session, format_message
+from app.logging.logger import log_event
+from app.llm.output_parser import parse_llm_json, JSONRepairError, StructuredOutputError
+from app.llm.pricing import estimate_cost
+from app.llm.routing import ModelRouter, Route
+from app.llm.usage import LLMCallUsage, UsageTotals, current_tenant, record_usage, track_usage
+from app.monitoring.metrics import counter, histogram
+from app.monitoring.tracing import span
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -15,6 +28,131 @@ load_dotenv()
 client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 model_name = os.getenv("OPENAI_MODEL", "gpt-4")           
 temperature = float(os.getenv("OPENAI_TEMPERATURE", "0.3"))
+# "auto" enables JSON mode only for models known to support it; "on"/"off" force it.
+json_mode = os.getenv("OPENAI_JSON_MODE", "auto").lower()
+# How many times a single stage is re-asked when its output fails to parse or validate.
+max_repair_attempts = int(os.getenv("LLM_MAX_REPAIR_ATTEMPTS", "1"))
+# Messages the local classifier labels with at least this confidence skip the analysis LLM call.
+intent_classifier_enabled = os.getenv("INTENT_CLASSIFIER_ENABLED", "true").lower() == "true"
+intent_classifier_threshold = float(os.getenv("INTENT_CLASSIFIER_THRESHOLD", "0.8"))
+# Opt-in: write (redacted) prospect messages to "analysis" events so the classifier can learn from them.
+intent_classifier_log_messages = os.getenv("INTENT_CLASSIFIER_LOG_MESSAGES", "false").lower() == "true"
+# Tool outputs are summarized in the tool usage log, not copied in full.
+tool_summary_max_chars = int(os.getenv("TOOL_SUMMARY_MAX_CHARS", "500"))
+# Recorded with every LLM call so usage and cost can be compared across prompt revisions.
+prompt_version = os.getenv("PROMPT_VERSION", "v1")
+
+JSON_MODE_MODEL_PREFIXES = ("gpt-4o", "gpt-4-turbo", "gpt-4-1106", "gpt-4-0125", "gpt-4.1", "gpt-3.5-turbo", "o1", "o3", "o4")
+
+REPAIR_PROMPT = """Your previous reply could not be used: {error}
+Reply again with only the corrected JSON object, no markdown and no commentary."""
+
+structured_output_total = counter(
+    "llm_structured_output_total",
+    "Structured LLM completions per stage, by outcome (valid, repaired, invalid).",
+    ("stage", "outcome"),
+)
+stage_reasks_total = counter(
+    "llm_stage_reasks_total",
+    "Times a single pipeline stage was re-asked after invalid output.",
+    ("stage",),
+)
+
+intent_classifier_decisions_total = counter(
+    "intent_classifier_decisions_total",
+    "Analysis stage decisions: 'skipped' when the local classifier answered, 'fallback' when the LLM was called.",
+    ("outcome",),
+)
+
+llm_call_latency_seconds = histogram(
+    "llm_call_latency_seconds",
+    "Latency of each chat completion call per stage, model and routing tier.",
+    ("stage", "model", "tier"),
+)
+llm_call_cost_usd_total = counter(
+    "llm_call_cost_usd_total",
+    "Estimated USD cost of chat completions per stage, model, routing tier, tenant and prompt version.",
+    ("stage", "model", "tier", "tenant", "prompt_version"),
+)
+llm_tokens_total = counter(
+    "llm_tokens_total",
+    "LLM tokens per stage, model, routing tier, tenant and prompt version, by kind (prompt, completion, cached).",
+    ("stage", "model", "tier", "tenant", "prompt_version", "kind"),
+)
+
+# Models that rejected response_format at runtime; JSON mode is not retried for them.
+_json_mode_unsupported = set()
+
+
+def _json_mode_enabled(model: str) -> bool:
+    if json_mode == "off" or model in _json_mode_unsupported:
+        return False
+    if json_mode == "on":
+        return True
+    return model.startswith(JSON_MODE_MODEL_PREFIXES)
+
+
+def _summarize(text: str) -> str:
+    if len(text) <= tool_summary_max_chars:
+        return text
+    return text[:tool_summary_max_chars - 3] + "..."
+
+
+def _llm_usage_entries(usage: UsageTotals) -> List[ToolUsageLogEntry]:
+    return [
+        ToolUsageLogEntry(
+            tool_name="LLM",
+            function=call.stage,
+            input={"model": call.model, "tier": call.tier, "prompt_version": call.prompt_version},
+            output_summary=f"{call.prompt_tokens} prompt + {call.completion_tokens} completion tokens, ${call.cost_usd:.6f}",
+            usage=LLMUsage(
+                prompt_tokens=call.prompt_tokens,
+                completion_tokens=call.completion_tokens,
+                cached_tokens=call.cached_tokens,
+                cost_usd=call.cost_usd,
+            ),
+        )
+        for call in usage.calls
+    ]
+
+
+def _primary_action(next_steps: List[InternalAction]) -> str:
+    # A flag for human review outranks any other next step when reporting KPIs.
+    actions = [step.action for step in next_steps]
+    if "FLAG_FOR_HUMAN_REVIEW" in actions:
+        return "FLAG_FOR_HUMAN_REVIEW"
+    return actions[0] if actions else "NO_ACTION"
+
+
+def structured_output_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Summarize the structured output counters into per-stage rates.
+
+    Returns:
+        Dict[str, Dict[str, float]]: For each stage, the number of completions and the
+        fraction that needed a local repair or failed to parse/validate entirely.
+    """
+    totals: Dict[str, Dict[str, float]] = {}
+    for labels, value in structured_output_total.samples():
+        totals.setdefault(labels["stage"], {}).setdefault(labels["outcome"], 0.0)
+        totals[labels["stage"]][labels["outcome"]] += value
+
+    stats = {}
+    for stage, outcomes in totals.items():
+        total = sum(outcomes.values())
+        stats[stage] = {
+            "completions": total,
+            "repair_rate": outcomes.get("repaired", 0.0) / total,
+            "parse_failure_rate": outcomes.get("invalid", 0.0) / total,
+        }
+    return stats
+
+
+def classifier_skip_rate() -> float:
+    """Return the fraction of analyses answered by the local intent classifier without an LLM call."""
+    skipped = intent_classifier_decisions_total.value(outcome="skipped")
+    total = skipped + intent_classifier_decisions_total.value(outcome="fallback")
+    return skipped / total if total else 0.0
 
 
 
@@ -24,30 +162,54 @@ class LLMOrchestrator:
         Initialize the LLMOrchestrator with a KnowledgeAugmentationTool instance.
 
         The tool is used for CRM lookups and knowledge base queries to support
-        the orchestration process.
+        the orchestration process. Its embedding model is reused by the local
+        intent classifier, which is skipped if the model is unavailable. The
+        router picks the model used by each stage.
         """
 
         self.tool = KnowledgeAugmentationTool()
+        self.router = ModelRouter.from_env(model_name)
+        self.intent_classifier = None
+        embedding_model = getattr(self.tool, "model", None)
+        if intent_classifier_enabled and embedding_model:
+            self.intent_classifier = IntentClassifier.bootstrap(embedding_model)
 
-    async def analyze_message(self, request: ProcessMessageRequest) -> AnalysisResult:
+    async def analyze_message(self, request: ProcessMessageRequest, history: Optional[str] = None) -> AnalysisResult:
         """
         Analyze the given message in the context of the conversation history.
 
         Asks an OpenAI GPT model to analyze the message and identify the user's intent, sentiment, and any product-related entities.
+        If the local intent classifier is confident enough, its prediction is returned instead and the
+        LLM call is skipped; such results carry no entities.
 
         Args:
             request (ProcessMessageRequest): The request containing the conversation history and current message.
+            history (Optional[str]): The already formatted conversation history, if the caller has it.
 
         Returns:
             AnalysisResult: The analysis result as a named tuple with the intent, sentiment, entities, and confidence.
         """
 
+        if self.intent_classifier:
+            prediction = self.intent_classifier.classify(request.current_prospect_message)
+            if prediction and prediction.confidence >= intent_classifier_threshold:
+                intent_classifier_decisions_total.inc(outcome="skipped")
+                return AnalysisResult(
+                    intent=prediction.intent,
+                    sentiment=prediction.sentiment,
+                    entities=[],
+                    confidence=prediction.confidence,
+                )
+            intent_classifier_decisions_total.inc(outcome="fallback")
+
+        if history is None:
+            history = self._format_history(request.conversation_history)
         prompt = f"""
 You are a sales assistant AI. Analyze the following message in the context of the conversation history.
 Identify the user's intent, sentiment, and any product-related entities.
 
 CONVERSATION HISTORY:
-{self._format_history(request.conversation_history)}
+{history}
 
 CURRENT MESSAGE:
 "{request.current_prospect_message}"
@@ -60,16 +222,31 @@ Return in JSON format:
     "confidence": 0.0 - 1.0
 }}
 """
-        response = await client.chat.completions.create(
-            model=model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-        )
-        analysis_json = json.loads(response.choices[0].message.content)
-
-        return AnalysisResult(**analysis_json)
-
-    async def process(self, request: ProcessMessageRequest) -> ProcessMessageResponse:
+        route = self.router.route_analysis(request, len(history) + len(request.current_prospect_message))
+        analysis, route = await self._complete_structured("analyze", prompt, AnalysisResult, route)
+        if analysis.confidence < self.router.min_confidence:
+            escalated = self.router.escalate("analyze", route, "low_confidence")
+            if escalated:
+                analysis, route = await self._complete_structured("analyze", prompt, AnalysisResult, escalated)
+
+        # With INTENT_CLASSIFIER_LOG_MESSAGES, high-confidence LLM analyses become labeled examples
+        # for the intent classifier. Without it the message text never reaches the event log.
+        event = {
+            "event": "analysis",
+            "source": "llm",
+            "intent": analysis.intent,
+            "sentiment": analysis.sentiment,
+            "confidence": analysis.confidence,
+            "model": route.model,
+        }
+        if intent_classifier_log_messages:
+            event["message"] = redact(request.current_prospect_message)
+        log_event(event)
+        return analysis
+
+    async def process(
+        self, request: ProcessMessageRequest, batch=None, session: Optional[Session] = None
+    ) -> ProcessMessageResponse:
         """
         Process a message from a prospect and return a ProcessMessageResponse.
 
@@ -84,51 +261,113 @@ Return in JSON format:
 
         Args:
             request (ProcessMessageRequest): The request containing the conversation history and current message.
+            batch (Optional[BatchContext]): When processing a batch, the shared context that deduplicates
+                CRM lookups and batches knowledge base queries across items.
+            session (Optional[Session]): For server-side sessions, supplies the pre-formatted history and
+                the cached CRM record; `request.conversation_history` is ignored.
+
+        Each stage runs in a tracing span (analyze, crm_fetch, kb_encode/kb_search, synthesize), and a
+        "process" event with the total latency, the per-stage breakdown and the token usage and cost
+        is logged at the end, also when processing fails (with the exception in `error`). Every LLM call also gets a tool usage log entry with its usage.
 
         Returns:
             ProcessMessageResponse: The ProcessMessageResponse containing the analysis, suggested response draft, internal next steps, confidence scores, tool usage logs, and reasoning trace.
         """
-        analysis = await self.analyze_message(request)
+        response, tool_error, error = None, False, None
+        try:
+            with track_usage() as usage, span("process") as process_span:
+                response, tool_error = await self._process(request, batch, session)
+            response.tool_usage_log.extend(_llm_usage_entries(usage))
+            return response
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            # Failed requests are logged too (with `error` set and no outcome), so their latency and spend count.
+            event = {
+                "event": "process",
+                "trace_id": process_span.trace_id,
+                "tenant": usage.tenant,
+                "prompt_version": prompt_version,
+                "latency_ms": round(process_span.duration_ms, 3),
+                "stages": process_span.stage_breakdown(),
+                "tool_error": tool_error,
+                "error": error,
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "cached_tokens": usage.cached_tokens,
+                "cost_usd": round(usage.cost_usd, 8),
+                "usage_by_stage": usage.by_stage(),
+                "models": sorted({call.model for call in usage.calls}),
+            }
+            if response is not None:
+                event["intent"] = response.detailed_analysis.intent
+                event["confidence_score"] = response.confidence_score
+                event["action"] = _primary_action(response.internal_next_steps)
+            log_event(event)
+
+    async def _process(
+        self, request: ProcessMessageRequest, batch=None, session: Optional[Session] = None
+    ) -> Tuple[ProcessMessageResponse, bool]:
+        if session:
+            history = session.history_text
+        else:
+            history = self._format_history(request.conversation_history)
+        with span("analyze"):
+            analysis = await self.analyze_message(request, history)
 
         tool_usage_log = []
         retrieved_knowledge = []
+        crm_data = None
+        tool_error = False
 
         # CRM Lookup if prospect_id is present
         if request.prospect_id:
-            crm_data = self.tool.fetch_prospect_details(request.prospect_id)
+            tools = batch or self.tool
+            with span("crm_fetch"):
+                if session:
+                    crm_data = session.get_crm_data(tools.fetch_prospect_details)
+                else:
+                    crm_data = tools.fetch_prospect_details(request.prospect_id)
             tool_usage_log.append(ToolUsageLogEntry(
                 tool_name="KnowledgeAugmentationTool",
                 function="fetch_prospect_details",
                 input={"prospect_id": request.prospect_id},
-                output_summary=str(crm_data)
+                output_summary=_summarize(json.dumps(crm_data, separators=(",", ":"), default=str))
             ))
             retrieved_knowledge.append(f"CRM Data: {crm_data}")
+            tool_error = "error" in crm_data
 
         # RAG Query if entities or objection present
         if analysis.intent in ["objection", "clarification", "inquiry"]:
             query_text = f"{request.current_prospect_message} | Entities: {', '.join(analysis.entities)}"
-            kb_result = self.tool.query_knowledge_base(query_text)
+            if batch:
+                kb_result = await batch.query_knowledge_base(query_text)
+            else:
+                kb_result = self.tool.query_knowledge_base(query_text)
             tool_usage_log.append(ToolUsageLogEntry(
                 tool_name="KnowledgeAugmentationTool",
                 function="query_knowledge_base",
                 input={"query": query_text},
-                output_summary="; ".join([doc['text'][:200] for doc in kb_result])
+                output_summary=_summarize("; ".join([doc['text'][:200] for doc in kb_result]))
             ))
             retrieved_knowledge.append("Knowledge Base Results:\n" + "\n".join([doc["text"] for doc in kb_result]))
+            tool_error = tool_error or any("error" in doc for doc in kb_result)
 
         # Synthesize response
-        final_response = await self.synthesize_response(request, analysis, retrieved_knowledge)
+        with span("synthesize"):
+            final_response = await self.synthesize_response(request, analysis, retrieved_knowledge, crm_data, history)
 
         return ProcessMessageResponse(
             detailed_analysis=analysis,
-            suggested_response_draft=final_response["response"],
-            internal_next_steps=final_response["next_steps"],
+            suggested_response_draft=final_response.response,
+            internal_next_steps=final_response.next_steps,
             confidence_score=analysis.confidence,
             tool_usage_log=tool_usage_log,
-            reasoning_trace=final_response.get("reasoning_trace", "")
-        )
+            reasoning_trace=final_response.reasoning_trace or ""
+        ), tool_error
 
-    async def synthesize_response(self, request, analysis, knowledge_blocks) -> dict:
+    async def synthesize_response(self, request, analysis, knowledge_blocks, crm_data=None, history=None) -> SynthesisResult:
         """
         Synthesize a response using the knowledge retrieved and the analysis.
 
@@ -136,16 +375,20 @@ Return in JSON format:
             request (ProcessMessageRequest): The request containing the conversation history and current message.
             analysis (AnalysisResult): The AnalysisResult of the message.
             knowledge_blocks (List[str]): The retrieved knowledge relevant to the message.
+            crm_data (Optional[dict]): The prospect's CRM record, used to route high-value leads to the large model.
+            history (Optional[str]): The already formatted conversation history, if the caller has it.
 
         Returns:
-            dict: A dictionary containing the suggested response draft, internal next steps, and reasoning trace.
+            SynthesisResult: The suggested response draft, internal next steps, and reasoning trace.
         """
 
+        if history is None:
+            history = self._format_history(request.conversation_history)
         prompt = f"""
 You're an AI sales assistant helping draft the next message to a prospect.
 
 CONVERSATION HISTORY:
-{self._format_history(request.conversation_history)}
+{history}
 
 CURRENT MESSAGE:
 "{request.current_prospect_message}"
@@ -183,13 +426,118 @@ Output in JSON:
 }}
 """
 
-        response = await client.chat.completions.create(
-            model=model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
+        route = self.router.route_synthesis(analysis, crm_data)
+        result, _ = await self._complete_structured("synthesize", prompt, SynthesisResult, route)
+        return result
+
+    async def _complete_structured(
+        self, stage: str, prompt: str, schema: Type[BaseModel], route: Route
+    ) -> Tuple[BaseModel, Route]:
+        """
+        Run a single pipeline stage and return its output validated against `schema`.
+
+        The completion is parsed with the tolerant JSON parser, so fenced or slightly malformed
+        output is repaired locally instead of failing the request. If the output still cannot be
+        parsed or validated, only this stage is re-asked (with the error fed back to the model),
+        up to `max_repair_attempts` times. Re-asks of a small-model route are escalated to the
+        large model.
+
+        Args:
+            stage (str): The stage name used in metrics, e.g. "analyze" or "synthesize".
+            prompt (str): The stage prompt.
+            schema (Type[BaseModel]): The model the JSON output must validate against.
+            route (Route): The model route chosen for this stage.
+
+        Returns:
+            Tuple[BaseModel, Route]: An instance of `schema`, and the route that produced it.
+
+        Raises:
+            StructuredOutputError: If every attempt produced invalid output.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        attempt_messages = messages
+        error = None
+
+        for attempt in range(max_repair_attempts + 1):
+            if attempt:
+                stage_reasks_total.inc(stage=stage)
+                route = self.router.escalate(stage, route, "invalid_output") or route
+            content = await self._chat(stage, route, attempt_messages)
+            try:
+                data, repaired = parse_llm_json(content)
+                result = schema(**data)
+            except (JSONRepairError, ValidationError, TypeError) as e:
+                structured_output_total.inc(stage=stage, outcome="invalid")
+                error = e
+                attempt_messages = messages + [
+                    {"role": "assistant", "content": content or ""},
+                    {"role": "user", "content": REPAIR_PROMPT.format(error=e)},
+                ]
+                continue
+
+            structured_output_total.inc(stage=stage, outcome="repaired" if repaired else "valid")
+            return result, route
+
+        raise StructuredOutputError(f"{stage} output invalid after {max_repair_attempts + 1} attempts: {error}")
+
+    async def _chat(self, stage: str, route: Route, messages: List[dict]) -> str:
+        """
+        Send a chat completion request to the routed model and return the message content.
+
+        JSON mode is requested when the model supports it. If the provider rejects the
+        `response_format` parameter, the model is remembered as unsupported and the call
+        is retried without it. Latency is recorded per stage and route. Prompt, completion and cached
+        tokens and their cost are recorded per stage, route, tenant and prompt version, and added to
+        the request's usage totals (for the tool usage log, the process event and tenant quotas).
+        """
+        kwargs = {}
+        if _json_mode_enabled(route.model):
+            kwargs["response_format"] = {"type": "json_object"}
+
+        start = time.perf_counter()
+        try:
+            response = await client.chat.completions.create(
+                model=route.model,
+                messages=messages,
+                temperature=temperature,
+                **kwargs,
+            )
+        except BadRequestError:
+            if not kwargs:
+                raise
+            _json_mode_unsupported.add(route.model)
+            response = await client.chat.completions.create(
+                model=route.model,
+                messages=messages,
+                temperature=temperature,
+            )
+        labels = {"stage": stage, "model": route.model, "tier": route.tier}
+        llm_call_latency_seconds.observe(time.perf_counter() - start, **labels)
+        usage = getattr(response, "usage", None)
+        if usage:
+            self._record_usage(stage, route, usage)
+        return response.choices[0].message.content
+
+    def _record_usage(self, stage: str, route: Route, usage) -> None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", 0) if details else 0) or 0
+        call = LLMCallUsage(
+            stage=stage,
+            model=route.model,
+            tier=route.tier,
+            prompt_version=prompt_version,
+            prompt_tokens=usage.prompt_tokens or 0,
+            completion_tokens=usage.completion_tokens or 0,
+            cached_tokens=cached_tokens,
+            cost_usd=estimate_cost(route.model, usage.prompt_tokens or 0, usage.completion_tokens or 0, cached_tokens),
         )
-        content = response.choices[0].message.content
-        return json.loads(content)
+        labels = {"stage": stage, "model": route.model, "tier": route.tier,
+                  "tenant": current_tenant() or "none", "prompt_version": prompt_version}
+        llm_call_cost_usd_total.inc(call.cost_usd, **labels)
+        llm_tokens_total.inc(call.prompt_tokens, kind="prompt", **labels)
+        llm_tokens_total.inc(call.completion_tokens, kind="completion", **labels)
+        llm_tokens_total.inc(call.cached_tokens, kind="cached", **labels)
+        record_usage(call)
 
     def _format_history(self, history: List[Message]) -> str:
         """
@@ -208,11 +556,13 @@ Output in JSON:
         Returns:
             str: The formatted string.
         """
-        return "\n".join([f"[{msg.timestamp}] {msg.sender}: {msg.content}" for msg in history])
+        return "\n".join([format_message(msg) for msg in history])
 
 orchestrator = LLMOrchestrator()
+# Identical requests arriving while one is still running (double-clicks, client retries) share its execution.
+process_flight = SingleFlight("process_message")
 
-async def process_message_pipeline(request: ProcessMessageRequest) -> ProcessMessageResponse:
+async def process_message_pipeline(request: ProcessMessageRequest, batch=None) -> ProcessMessageResponse:
     """
     Process a message from a prospect.
 
@@ -227,12 +577,57 @@ async def process_message_pipeline(request: ProcessMessageRequest) -> ProcessMes
     4. Synthesizing a response draft using the retrieved knowledge and analysis.
     5. Returning a ProcessMessageResponse containing the suggested response draft, internal next steps, tool usage logs, and confidence scores.
 
+    Byte-identical requests from the same tenant that arrive while an identical one is in flight
+    are coalesced and receive the same response (or error) instead of starting a second pipeline
+    run. The shared run's LLM usage is charged to the tenant that started it, so requests from
+    different tenants are never merged.
+
     Args:
         request (ProcessMessageRequest): The request containing the conversation history and current message.
+        batch (Optional[BatchContext]): Shared CRM and knowledge base access when the request is one item of a batch.
 
     Returns:
         ProcessMessageResponse: The response containing the suggested response draft, internal next steps, tool usage logs, and confidence scores.
     """
-    return await orchestrator.process(request)
+    key = request_key(request, current_tenant())
+    return await process_flight.do(key, lambda: orchestrator.process(request, batch=batch))
+
+
+async def process_session_message(session: Session, request: SessionMessageRequest) -> ProcessMessageResponse:
+    """
+    Process the next prospect message of a server-side conversation session.
 
-    
\ No newline at end of file
+    New history messages (e.g. the reply the agent actually sent) are appended to the session,
+    the pipeline runs against the session's pre-formatted history and cached CRM record, and the
+    prospect message is appended once it has been processed successfully. If the pipeline fails,
+    the session is left as it was before the call. Turns of one session are serialized so
+    concurrent calls cannot interleave its history.
+
+    Args:
+        session (Session): The conversation session.
+        request (SessionMessageRequest): The messages added since the last turn and the current prospect message.
+
+    Returns:
+        ProcessMessageResponse: The response for the current prospect message.
+    """
+    async with session.lock:
+        # The pipeline reads the session's history, so the new messages go in first; if the turn
+        # fails they are taken out again, so a client retry does not add them twice.
+        mark = session.mark()
+        try:
+            session.extend(request.new_messages)
+            pipeline_request = ProcessMessageRequest.model_construct(
+                conversation_history=[],
+                current_prospect_message=request.current_prospect_message,
+                prospect_id=session.prospect_id,
+            )
+            response = await orchestrator.process(pipeline_request, session=session)
+            session.append(Message(
+                sender="prospect",
+                content=request.current_prospect_message,
+                timestamp=request.timestamp or datetime.utcnow(),
+            ))
+        except BaseException:
+            session.rollback(mark)
+            raise
+    return response
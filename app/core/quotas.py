@@ -0,0 +1,306 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Mapping, Optional, Tuple
+
+from app.llm.usage import track_usage
+from app.models.schemas import ProcessMessageRequest
+from app.monitoring.metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the corresponding limit.
+QUOTA_REQUESTS_PER_MIN = float(os.getenv("QUOTA_REQUESTS_PER_MIN", "0"))
+QUOTA_TOKENS_PER_MIN = float(os.getenv("QUOTA_TOKENS_PER_MIN", "0"))
+# JSON file of per-tenant overrides: {"tenant": {"requests_per_min": 600, "tokens_per_min": 200000}}
+QUOTA_TENANTS_FILE = os.getenv("QUOTA_TENANTS_FILE", "")
+# "reject" answers over-quota requests with 429 at once; "queue" waits up to QUOTA_MAX_WAIT_MS for refill.
+QUOTA_MODE = os.getenv("QUOTA_MODE", "reject")
+QUOTA_MAX_WAIT_S = float(os.getenv("QUOTA_MAX_WAIT_MS", "5000")) / 1000
+# SQLite file shared by all workers on the host; unset keeps buckets in process memory.
+QUOTA_STORE_PATH = os.getenv("QUOTA_STORE_PATH", "")
+# JSON file mapping the SHA-256 hex digest of each API key to its tenant: {"<sha256 of key>": "acme"}
+QUOTA_API_KEYS_FILE = os.getenv("QUOTA_API_KEYS_FILE", "")
+# Honour X-Tenant-ID for configured tenants. Only enable behind a gateway that authenticates the header.
+QUOTA_TRUST_TENANT_HEADER = os.getenv("QUOTA_TRUST_TENANT_HEADER", "0") == "1"
+
+# Callers without a credential, and callers whose credential maps to no configured tenant.
+ANONYMOUS_TENANT = "anonymous"
+UNKNOWN_TENANT = "unknown"
+
+# Rough token estimate for one pipeline run: two prompts that each carry the history and message,
+# plus the fixed prompt text and completion budget of both stages.
+CHARS_PER_TOKEN = 4
+PIPELINE_OVERHEAD_TOKENS = 1200
+
+quota_rejections_total = counter("quota_rejections_total", "Requests rejected for exceeding a tenant quota.", ("tenant", "resource"))
+quota_tokens_total = counter("quota_tokens_total", "LLM tokens charged to each tenant (after correction with real usage).", ("tenant",))
+quota_wait_seconds = histogram(
+    "quota_wait_seconds",
+    "Time over-quota requests waited for their tenant's buckets to refill (queue mode).",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0),
+)
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, tenant: str, resource: str, retry_after: float):
+        """
+        Raised when a tenant is over its request or token quota.
+
+        Args:
+            tenant (str): The tenant.
+            resource (str): "requests" or "tokens".
+            retry_after (float): Seconds until enough quota will have refilled.
+        """
+        super().__init__(f"Tenant '{tenant}' exceeded its {resource} quota; retry after {retry_after:.1f}s.")
+        self.tenant = tenant
+        self.resource = resource
+        self.retry_after = retry_after
+
+
+class InMemoryBucketStore:
+    # `take` only touches memory, so it is cheap enough to call on the event loop.
+    blocking = False
+
+    def __init__(self):
+        """Token bucket state for a single process: {key: (tokens, updated_at)}."""
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: float, amount: float, force: bool = False) -> float:
+        """
+        Refill the bucket for elapsed time, then take `amount` if available.
+
+        Args:
+            key (str): The bucket key.
+            rate (float): Refill rate in units per second.
+            capacity (float): The bucket size (burst).
+            amount (float): Units to take. Negative amounts refund (capped at capacity).
+            force (bool): Take even if that puts the bucket in debt (used for usage corrections).
+
+        Returns:
+            float: 0 if taken, otherwise the seconds until `amount` will be available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens, wait = _take(tokens, updated_at, now, rate, capacity, amount, force)
+            self._buckets[key] = (tokens, now)
+            return wait
+
+
+class SQLiteBucketStore:
+    # `take` may wait on the database lock (up to the busy timeout), so async callers run it in a thread.
+    blocking = True
+
+    def __init__(self, path: str):
+        """
+        Token bucket state shared by every worker process on the host through a SQLite file.
+
+        Each take is one short `BEGIN IMMEDIATE` transaction, so buckets stay consistent across
+        processes. Wall-clock time is used because monotonic clocks are per process.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated_at REAL)")
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: float, amount: float, force: bool = False) -> float:
+        """Same contract as `InMemoryBucketStore.take`."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated_at = row if row else (capacity, now)
+                tokens, wait = _take(tokens, updated_at, now, rate, capacity, amount, force)
+                self._conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (key, tokens, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return wait
+
+
+def _take(tokens, updated_at, now, rate, capacity, amount, force) -> Tuple[float, float]:
+    tokens = min(capacity, tokens + (now - updated_at) * rate)
+    if force or amount <= tokens:
+        return min(capacity, tokens - amount), 0.0
+    return tokens, (amount - tokens) / rate
+
+
+class TenantQuotas:
+    def __init__(
+        self,
+        requests_per_min: float = QUOTA_REQUESTS_PER_MIN,
+        tokens_per_min: float = QUOTA_TOKENS_PER_MIN,
+        overrides: Optional[Dict[str, Dict[str, float]]] = None,
+        mode: str = QUOTA_MODE,
+        max_wait_s: float = QUOTA_MAX_WAIT_S,
+        store=None,
+        api_keys: Optional[Dict[str, str]] = None,
+        trust_tenant_header: bool = QUOTA_TRUST_TENANT_HEADER,
+    ):
+        """
+        Per-tenant token buckets metering request count and estimated LLM tokens.
+
+        Each tenant has a request bucket and a token bucket, refilled continuously at their
+        per-minute rate with one minute of burst. A request is charged an estimate of its
+        prompt+completion tokens up front; once it finishes, the difference to the real
+        `response.usage` totals is charged or refunded.
+
+        Tenants are identified by `tenant_for`, only from configured credentials, so callers
+        cannot pick another tenant's (or a fresh) quota, and the `tenant` metric label only
+        takes configured values.
+
+        Args:
+            requests_per_min (float): Default request limit per tenant (0 = unlimited).
+            tokens_per_min (float): Default token limit per tenant (0 = unlimited).
+            overrides (Optional[Dict[str, Dict[str, float]]]): Per-tenant limits replacing the defaults.
+            mode (str): "reject" or "queue" for over-quota requests.
+            max_wait_s (float): The longest a queued request waits before it is rejected anyway.
+            store: The bucket store; defaults to in-process memory.
+            api_keys (Optional[Dict[str, str]]): SHA-256 hex digest of each API key to its tenant.
+            trust_tenant_header (bool): Accept X-Tenant-ID naming a configured tenant.
+        """
+        self.requests_per_min = requests_per_min
+        self.tokens_per_min = tokens_per_min
+        self.overrides = overrides or {}
+        self.mode = mode
+        self.max_wait_s = max_wait_s
+        self.store = store or InMemoryBucketStore()
+        self.api_keys = api_keys or {}
+        self.trust_tenant_header = trust_tenant_header
+
+    @classmethod
+    def from_env(cls) -> "TenantQuotas":
+        overrides = _load_json(QUOTA_TENANTS_FILE, "tenant quotas")
+        api_keys = _load_json(QUOTA_API_KEYS_FILE, "API keys")
+        store = SQLiteBucketStore(QUOTA_STORE_PATH) if QUOTA_STORE_PATH else None
+        return cls(overrides=overrides, store=store, api_keys=api_keys)
+
+    def tenant_for(self, headers: Mapping[str, str]) -> str:
+        """
+        Identify the tenant of a request from its credentials.
+
+        The API key (`X-API-Key` or a bearer token) is looked up by its SHA-256 digest in
+        `api_keys`; a key that is not configured is UNKNOWN_TENANT, and a request without one is
+        ANONYMOUS_TENANT. With `trust_tenant_header`, an `X-Tenant-ID` naming a configured tenant
+        takes precedence; any other value is UNKNOWN_TENANT.
+        """
+        if self.trust_tenant_header:
+            tenant = headers.get("x-tenant-id")
+            if tenant:
+                return tenant if tenant in self.overrides or tenant in self.api_keys.values() else UNKNOWN_TENANT
+        api_key = headers.get("x-api-key")
+        authorization = headers.get("authorization", "")
+        if not api_key and authorization.lower().startswith("bearer "):
+            api_key = authorization[7:]
+        if not api_key:
+            return ANONYMOUS_TENANT
+        return self.api_keys.get(hashlib.sha256(api_key.encode("utf-8")).hexdigest(), UNKNOWN_TENANT)
+
+    def limits(self, tenant: str) -> Tuple[float, float]:
+        """Return the tenant's (requests_per_min, tokens_per_min)."""
+        override = self.overrides.get(tenant, {})
+        return (
+            override.get("requests_per_min", self.requests_per_min),
+            override.get("tokens_per_min", self.tokens_per_min),
+        )
+
+    def _take(self, tenant: str, resource: str, per_min: float, amount: float, force: bool = False) -> float:
+        if not per_min:
+            return 0.0
+        return self.store.take(f"{tenant}:{resource}", per_min / 60, per_min, amount, force)
+
+    async def _take_async(self, tenant: str, resource: str, per_min: float, amount: float, force: bool = False) -> float:
+        if self.store.blocking and per_min:
+            return await asyncio.to_thread(self._take, tenant, resource, per_min, amount, force)
+        return self._take(tenant, resource, per_min, amount, force)
+
+    async def _acquire(self, tenant: str, resource: str, per_min: float, amount: float, queue: bool) -> float:
+        # A request larger than the whole bucket could never be admitted; cap it at one full burst.
+        amount = min(amount, per_min) if per_min else amount
+        waited = 0.0
+        while True:
+            wait = await self._take_async(tenant, resource, per_min, amount)
+            if not wait:
+                break
+            if not queue or waited + wait > self.max_wait_s:
+                quota_rejections_total.inc(tenant=tenant, resource=resource)
+                raise QuotaExceeded(tenant, resource, wait)
+            await asyncio.sleep(wait)
+            waited += wait
+        if waited:
+            quota_wait_seconds.observe(waited)
+        return amount
+
+    @asynccontextmanager
+    async def limit(self, tenant: str, estimated_tokens: int, queue: Optional[bool] = None) -> AsyncIterator[None]:
+        """
+        Charge a request to the tenant's quotas for the duration of the `async with` block.
+
+        Args:
+            tenant (str): The tenant to charge.
+            estimated_tokens (int): The up-front token estimate, corrected with real usage on exit.
+            queue (Optional[bool]): Wait for quota instead of rejecting; defaults to the configured mode.
+
+        Raises:
+            QuotaExceeded: If the tenant is over quota (immediately in reject mode, or after
+                `max_wait_s` in queue mode).
+        """
+        requests_per_min, tokens_per_min = self.limits(tenant)
+        queue = self.mode == "queue" if queue is None else queue
+        await self._acquire(tenant, "requests", requests_per_min, 1, queue)
+        try:
+            charged = await self._acquire(tenant, "tokens", tokens_per_min, estimated_tokens, queue)
+        except BaseException:
+            # The request never ran, so it should not count against the request quota.
+            await self._take_async(tenant, "requests", requests_per_min, -1, force=True)
+            raise
+
+        with track_usage(tenant) as usage:
+            try:
+                yield
+            finally:
+                actual = usage.total_tokens
+                await self._take_async(tenant, "tokens", tokens_per_min, actual - charged, force=True)
+                quota_tokens_total.inc(actual, tenant=tenant)
+
+
+def estimate_tokens(history_chars: int, message_chars: int) -> int:
+    """Estimate the prompt+completion tokens of one pipeline run from its input size."""
+    return 2 * (history_chars + message_chars) // CHARS_PER_TOKEN + PIPELINE_OVERHEAD_TOKENS
+
+
+def estimate_request_tokens(request: ProcessMessageRequest) -> int:
+    """Estimate the prompt+completion tokens of processing a ProcessMessageRequest."""
+    # Each formatted history line also carries a timestamp and sender, ~40 characters.
+    history_chars = sum(len(m.content) + 40 for m in request.conversation_history)
+    return estimate_tokens(history_chars, len(request.current_prospect_message))
+
+
+def tenant_from_headers(headers: Mapping[str, str]) -> str:
+    """Identify the tenant of a request with the configured quotas; see `TenantQuotas.tenant_for`."""
+    return quotas.tenant_for(headers)
+
+
+def _load_json(path: str, what: str) -> Dict:
+    if not path:
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Failed to load {what} '{path}': {e}")
+        return {}
+
+
+quotas = TenantQuotas.from_env()
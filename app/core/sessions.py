@@ -0,0 +1,359 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.models.schemas import Message
+from app.monitoring.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+SESSION_MAX_ACTIVE = int(os.getenv("SESSION_MAX_ACTIVE", "10000"))
+# SQLite file that evicted sessions spill to; unset keeps sessions in memory only.
+SESSION_SPILL_PATH = os.getenv("SESSION_SPILL_PATH", "")
+
+sessions_active = gauge("sessions_active", "Conversation sessions held in memory.")
+session_events_total = counter("session_events_total", "Session store events (hit, miss, spilled, restored).", ("event",))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    prospect_id TEXT,
+    messages TEXT NOT NULL,
+    history_text TEXT NOT NULL,
+    crm_data TEXT,
+    updated_at REAL NOT NULL,
+    tenant TEXT
+);
+"""
+
+
+class SessionExists(Exception):
+    """Raised when creating a session with an ID that is already in use."""
+
+
+def format_message(msg: Message) -> str:
+    """Format one message as a conversation history line: `[timestamp] sender: content`."""
+    return f"[{msg.timestamp}] {msg.sender}: {msg.content}"
+
+
+class Session:
+    def __init__(
+        self,
+        conversation_id: str,
+        prospect_id: Optional[str] = None,
+        messages: Optional[List[Message]] = None,
+        history_text: Optional[str] = None,
+        crm_data: Optional[Dict] = None,
+        tenant: Optional[str] = None,
+    ):
+        """
+        A conversation kept on the server so clients only send new messages.
+
+        The formatted history text is maintained incrementally, so appending a message formats
+        only that message instead of re-joining the whole thread, and the prospect's CRM record
+        is fetched once per session.
+
+        Args:
+            conversation_id (str): The session key.
+            prospect_id (Optional[str]): The CRM prospect the conversation is with.
+            messages (Optional[List[Message]]): The existing history.
+            history_text (Optional[str]): The already formatted history, if known.
+            crm_data (Optional[Dict]): The cached CRM record, if already fetched.
+            tenant (Optional[str]): The tenant that owns the session.
+        """
+        self.conversation_id = conversation_id
+        self.prospect_id = prospect_id
+        self.tenant = tenant
+        self.messages: List[Message] = []
+        self.history_text = ""
+        self.crm_data = crm_data
+        self.updated_at = time.time()
+        # Serializes turns: two concurrent appends to one conversation would interleave history.
+        self.lock = asyncio.Lock()
+        # Requests currently holding the session; the store never evicts a session in use.
+        self.users = 0
+        if history_text is not None:
+            self.messages = list(messages or [])
+            self.history_text = history_text
+        else:
+            self.extend(messages or [])
+
+    def append(self, message: Message) -> None:
+        """Add one message to the history, formatting only that message."""
+        line = format_message(message)
+        self.history_text = f"{self.history_text}\n{line}" if self.messages else line
+        self.messages.append(message)
+        self.updated_at = time.time()
+
+    def extend(self, messages: List[Message]) -> None:
+        for message in messages:
+            self.append(message)
+
+    def mark(self) -> Tuple[int, str, float]:
+        """Return the current end of the history, to `rollback` to if a turn fails."""
+        return len(self.messages), self.history_text, self.updated_at
+
+    def rollback(self, mark: Tuple[int, str, float]) -> None:
+        """Drop every message appended since `mark`."""
+        count, self.history_text, self.updated_at = mark
+        del self.messages[count:]
+
+    def get_crm_data(self, fetch: Callable[[str], Dict]) -> Optional[Dict]:
+        """Return the prospect's CRM record, fetching it with `fetch` the first time."""
+        if self.prospect_id and self.crm_data is None:
+            self.crm_data = fetch(self.prospect_id)
+        return self.crm_data
+
+
+class SessionStore:
+    def __init__(self, max_active: int = SESSION_MAX_ACTIVE, spill_path: str = SESSION_SPILL_PATH):
+        """
+        An in-memory LRU of sessions with an optional SQLite spill for evicted ones.
+
+        When more than `max_active` sessions are held, the least recently used one is written to
+        the spill database (or dropped if there is none) and transparently restored on next use.
+        Sessions held by a request (`use`) or mid-turn are not evicted until they are released.
+
+        Sessions belong to the tenant that created them; lookups given a `tenant` treat other
+        tenants' sessions as missing. With spilling enabled, evicting and restoring is SQLite I/O,
+        so the `*_async` methods used by the API run store operations in a worker thread.
+
+        Args:
+            max_active (int): The maximum number of sessions kept in memory.
+            spill_path (str): The SQLite file to spill to, or "" to disable spilling.
+        """
+        self.max_active = max_active
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._conn = None
+        self._lock = threading.Lock()
+        # Guards `_sessions`, and moving sessions between it and the spill database: store operations
+        # run in worker threads when spilling, and memory accounting reads it from a thread.
+        self._sessions_lock = threading.RLock()
+        if spill_path:
+            os.makedirs(os.path.dirname(spill_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(spill_path, check_same_thread=False, isolation_level=None)
+            self._conn.executescript(SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+            if "tenant" not in columns:
+                self._conn.execute("ALTER TABLE sessions ADD COLUMN tenant TEXT")
+
+    @property
+    def blocking(self) -> bool:
+        """Whether store operations may do SQLite I/O, so async callers should run them in a thread."""
+        return self._conn is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def snapshot(self) -> List[Session]:
+        """Return the in-memory sessions as a list, safe to walk from another thread."""
+        with self._sessions_lock:
+            return list(self._sessions.values())
+
+    def create(
+        self,
+        prospect_id: Optional[str] = None,
+        messages: Optional[List[Message]] = None,
+        conversation_id: Optional[str] = None,
+        tenant: Optional[str] = None,
+    ) -> Session:
+        """
+        Create a session and return it.
+
+        Raises:
+            SessionExists: If `conversation_id` is already used by a session, in memory or spilled.
+        """
+        session = Session(conversation_id or uuid.uuid4().hex, prospect_id, messages, tenant=tenant)
+        with self._sessions_lock:
+            if session.conversation_id in self._sessions or self._spilled(session.conversation_id):
+                raise SessionExists(f"Session '{session.conversation_id}' already exists.")
+            self._put(session)
+        self._evict()
+        return session
+
+    def get(self, conversation_id: str, tenant: Optional[str] = None) -> Optional[Session]:
+        """Return a session by ID, restoring it from the spill database if it was evicted, or None if it is not `tenant`'s."""
+        return self._get(conversation_id, evict=True, tenant=tenant)
+
+    @contextmanager
+    def use(self, conversation_id: str, tenant: Optional[str] = None) -> Iterator[Optional[Session]]:
+        """
+        Hold a session (or None if it does not exist for `tenant`) for the duration of a request.
+
+        A session in use is never evicted: evicting it would let the next `get` restore a second
+        copy with its own lock, and whatever the in-flight turn appends would be lost. Sessions
+        kept over `max_active` because they were in use are evicted once released.
+        """
+        session = self._hold(conversation_id, tenant)
+        try:
+            yield session
+        finally:
+            self._release(session)
+
+    def delete(self, conversation_id: str, tenant: Optional[str] = None) -> bool:
+        """Delete a session from memory and the spill database. Returns whether it existed (for `tenant`)."""
+        with self._sessions_lock:
+            session = self._sessions.get(conversation_id)
+            if session is not None and tenant is not None and session.tenant != tenant:
+                return False
+            existed = self._sessions.pop(conversation_id, None) is not None
+            if self._conn:
+                query, params = "DELETE FROM sessions WHERE id = ?", (conversation_id,)
+                if tenant is not None:
+                    query, params = query + " AND tenant IS ?", params + (tenant,)
+                with self._lock:
+                    spilled = self._conn.execute(query, params).rowcount > 0
+                existed = existed or spilled
+        sessions_active.set(len(self._sessions))
+        return existed
+
+    async def create_async(
+        self,
+        prospect_id: Optional[str] = None,
+        messages: Optional[List[Message]] = None,
+        conversation_id: Optional[str] = None,
+        tenant: Optional[str] = None,
+    ) -> Session:
+        """`create`, off the event loop when it may spill."""
+        return await self._call(self.create, prospect_id, messages, conversation_id, tenant)
+
+    async def get_async(self, conversation_id: str, tenant: Optional[str] = None) -> Optional[Session]:
+        """`get`, off the event loop when it may restore or spill."""
+        return await self._call(self.get, conversation_id, tenant)
+
+    async def delete_async(self, conversation_id: str, tenant: Optional[str] = None) -> bool:
+        """`delete`, off the event loop when spilling is enabled."""
+        return await self._call(self.delete, conversation_id, tenant)
+
+    @asynccontextmanager
+    async def use_async(self, conversation_id: str, tenant: Optional[str] = None) -> AsyncIterator[Optional[Session]]:
+        """`use`, with restoring and spilling off the event loop."""
+        session = await self._call(self._hold, conversation_id, tenant)
+        try:
+            yield session
+        finally:
+            await self._call(self._release, session)
+
+    async def _call(self, fn: Callable, *args):
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def _hold(self, conversation_id: str, tenant: Optional[str]) -> Optional[Session]:
+        session = self._get(conversation_id, evict=False, tenant=tenant, hold=True)
+        self._evict()
+        return session
+
+    def _release(self, session: Optional[Session]) -> None:
+        if session is not None:
+            with self._sessions_lock:
+                session.users -= 1
+            self._evict()
+
+    def _get(self, conversation_id: str, evict: bool, tenant: Optional[str] = None, hold: bool = False) -> Optional[Session]:
+        # Looking up, restoring and marking the session held happen under one lock, so a concurrent
+        # eviction cannot spill it in between and two threads cannot restore two copies.
+        with self._sessions_lock:
+            session = self._sessions.get(conversation_id)
+            event = "hit"
+            if session is None:
+                session = self._restore(conversation_id)
+                event = "restored" if session else "miss"
+                if session:
+                    self._put(session)
+            if session is not None:
+                if tenant is not None and session.tenant != tenant:
+                    session = None
+                else:
+                    self._sessions.move_to_end(conversation_id)
+                    if hold:
+                        session.users += 1
+        session_events_total.inc(event=event)
+        if event == "restored" and evict:
+            self._evict()
+        return session
+
+    def _spilled(self, conversation_id: str) -> bool:
+        if not self._conn:
+            return False
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sessions WHERE id = ?", (conversation_id,)).fetchone() is not None
+
+    def _put(self, session: Session) -> None:
+        with self._sessions_lock:
+            self._sessions[session.conversation_id] = session
+            self._sessions.move_to_end(session.conversation_id)
+        sessions_active.set(len(self._sessions))
+
+    def _evict(self) -> None:
+        """Spill least recently used sessions until at most `max_active` remain, skipping those in use."""
+        with self._sessions_lock:
+            excess = len(self._sessions) - self.max_active
+            victims = []
+            if excess > 0:
+                for session in self._sessions.values():
+                    if not session.users and not session.lock.locked():
+                        victims.append(session)
+                        if len(victims) == excess:
+                            break
+                # Spill before releasing the lock, so a session is always either in memory or spilled.
+                for session in victims:
+                    del self._sessions[session.conversation_id]
+                    self._spill(session)
+        sessions_active.set(len(self._sessions))
+
+    def _spill(self, session: Session) -> None:
+        if not self._conn:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, prospect_id, messages, history_text, crm_data, updated_at, tenant)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    session.conversation_id,
+                    session.prospect_id,
+                    json.dumps([m.model_dump(mode="json") for m in session.messages]),
+                    session.history_text,
+                    json.dumps(session.crm_data) if session.crm_data is not None else None,
+                    session.updated_at,
+                    session.tenant,
+                ),
+            )
+        session_events_total.inc(event="spilled")
+
+    def _restore(self, conversation_id: str) -> Optional[Session]:
+        if not self._conn:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT prospect_id, messages, history_text, crm_data, tenant FROM sessions WHERE id = ?", (conversation_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        prospect_id, messages, history_text, crm_data, tenant = row
+        return Session(
+            conversation_id,
+            prospect_id,
+            [Message(**m) for m in json.loads(messages)],
+            history_text=history_text,
+            crm_data=json.loads(crm_data) if crm_data else None,
+            tenant=tenant,
+        )
+
+    def close(self) -> None:
+        """Spill every in-memory session (if spilling is enabled) so they survive a restart."""
+        if not self._conn:
+            return
+        for session in self.snapshot():
+            self._spill(session)
+        with self._lock:
+            self._conn.close()
+        self._conn = None
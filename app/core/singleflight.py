@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import json
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from pydantic import BaseModel
+
+from app.monitoring.metrics import counter
+
+T = TypeVar("T")
+
+coalesced_total = counter(
+    "singleflight_coalesced_total",
+    "Calls that joined an identical in-flight execution instead of starting their own.",
+    ("group",),
+)
+
+
+def request_key(request: BaseModel, scope: Optional[str] = None) -> str:
+    """
+    Return a canonical hash of a request model.
+
+    The model is dumped to JSON-compatible values and serialized with sorted keys, so two
+    payloads that parse to the same request hash the same regardless of key order or spacing.
+
+    Args:
+        request (BaseModel): The request to hash.
+        scope (Optional[str]): Keeps identical requests apart when they must not share an
+            execution, e.g. the tenant the work is billed to.
+    """
+    canonical = json.dumps([scope, request.model_dump(mode="json")], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, group: str):
+        """
+        Coalesces concurrent calls with the same key into a single execution.
+
+        The first caller for a key starts the work as a separate task; callers arriving while
+        it runs await the same task and receive the same result or exception. The entry is
+        dropped as soon as the task finishes, so results and errors are never cached.
+
+        A caller that is cancelled only stops waiting: the shared task keeps running for the
+        remaining callers and is cancelled only once nobody is waiting for it anymore.
+
+        Args:
+            group (str): The name used to label this group's metrics.
+        """
+        self.group = group
+        self._flights: Dict[str, _Flight] = {}
+
+    def in_flight(self) -> int:
+        """Return the number of distinct executions currently running."""
+        return len(self._flights)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `fn()` unless an execution for `key` is already in flight, and return its result.
+
+        Args:
+            key (str): The deduplication key, e.g. from `request_key`.
+            fn (Callable[[], Awaitable[T]]): Starts the work; only called by the first caller.
+
+        Returns:
+            T: The result of the shared execution.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._finish(key, flight))
+        else:
+            coalesced_total.inc(group=self.group)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _finish(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Retrieve the exception so an error nobody awaited is not logged as "never retrieved".
+        if not flight.task.cancelled():
+            flight.task.exception()
@@ -2,8 +2,10 @@ import json
 import os
 import logging
 from typing import List, Dict, Optional
+import numpy as np
 from sentence_transformers import SentenceTransformer
 import faiss
+from app.monitoring.tracing import span
 
 KB_FILE = "data/kb.json"
 CRM_FILE = "data/crm.json"
@@ -111,14 +113,33 @@ class KnowledgeAugmentationTool:
         Returns:
             List[Dict]: A list of up to 3 documents from the knowledge base that are most similar to the query, or a list with a single document containing an "error" field if the query fails.
         """
+        return self.query_knowledge_base_batch([query])[0]
+
+    def query_knowledge_base_batch(self, queries: List[str], k: int = 3) -> List[List[Dict]]:
+        """
+        Queries the knowledge base for several queries at once.
+
+        All queries are encoded in a single model call and searched in a single FAISS call,
+        which is much cheaper than one encode and search per query.
+
+        Args:
+            queries (List[str]): The queries to search for in the knowledge base.
+            k (int): The number of documents to return per query.
+
+        Returns:
+            List[List[Dict]]: For each query, in order, the documents most similar to it, or a list
+            with a single document containing an "error" field if the query fails.
+        """
         if not self.model or not self.index:
             logger.warning("Query skipped: embedding model or index not available.")
-            return [{"text": "Knowledge base temporarily unavailable."}]
+            return [[{"text": "Knowledge base temporarily unavailable.", "error": True}] for _ in queries]
 
         try:
-            query_embedding = self.model.encode([query])[0]
-            scores, indices = self.index.search([query_embedding], k=3)
-            return [self.kb_docs[i] for i in indices[0] if i < len(self.kb_docs)]
+            with span("kb_encode"):
+                query_embeddings = np.asarray(self.model.encode(queries), dtype=np.float32)
+            with span("kb_search"):
+                scores, indices = self.index.search(query_embeddings, k)
+            return [[self.kb_docs[i] for i in row if 0 <= i < len(self.kb_docs)] for row in indices]
         except Exception as e:
             logger.error(f"Knowledge base query failed: {e}")
-            return [{"text": f"Knowledge base query failed: {str(e)}"}]
+            return [[{"text": f"Knowledge base query failed: {str(e)}", "error": True}] for _ in queries]
@@ -0,0 +1 @@
+from app.evaluation.evaluation import evaluate_full, evaluate_lite
@@ -0,0 +1,303 @@
+# app/evaluation/async_runner.py
+
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.quotas import InMemoryBucketStore
+from app.evaluation.golden_dataset import GOLDEN_DATASET
+from app.evaluation.prediction_cache import EVAL_CACHE_DIR, PredictionCache, prediction_key
+from app.evaluation.prompt_testing import average_scores, score_example
+
+logger = logging.getLogger(__name__)
+
+# Prompt calls in flight at once.
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "8"))
+# Client-side cap on prompt calls per second across all workers; 0 disables it.
+EVAL_REQUESTS_PER_S = float(os.getenv("EVAL_REQUESTS_PER_S", "0"))
+# Attempts after the first for a failing call, with exponential backoff from EVAL_RETRY_BACKOFF_S.
+EVAL_MAX_RETRIES = int(os.getenv("EVAL_MAX_RETRIES", "4"))
+EVAL_RETRY_BACKOFF_S = float(os.getenv("EVAL_RETRY_BACKOFF_S", "1"))
+
+
+def _rate_limit_delay(error: Exception) -> Optional[float]:
+    """
+    Return how long to back off if `error` is a rate limit (HTTP 429), else None.
+
+    Honours `retry_after` attributes and `Retry-After` response headers, as raised by the OpenAI
+    client and by this service's own quotas.
+    """
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status != 429 and type(error).__name__ not in ("RateLimitError", "QuotaExceeded"):
+        return None
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        retry_after = headers.get("retry-after")
+    try:
+        return max(float(retry_after), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class Checkpoint:
+    def __init__(self, path: str):
+        """
+        Append-only JSONL record of scored examples, one line per (variant, example).
+
+        Every line is flushed as it is written, so after a crash at most the line being written
+        is lost; a torn last line is skipped on load.
+
+        Args:
+            path (str): The checkpoint file; created if missing.
+        """
+        self.path = path
+        self._file = None
+
+    def load(self) -> Dict[Tuple[str, str], Dict[str, float]]:
+        """Return the scores already recorded, keyed by (variant, example ID)."""
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    done[(record["variant"], record["example_id"])] = record["scores"]
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    logger.warning(f"Skipping unreadable checkpoint line in '{self.path}'.")
+        return done
+
+    def append(self, variant: str, example_id: str, scores: Dict[str, float]) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a+")
+            # Terminate a line torn by a crash so the next record starts on its own line.
+            if self._file.tell() > 0:
+                self._file.seek(self._file.tell() - 1)
+                if self._file.read(1) != "\n":
+                    self._file.write("\n")
+        self._file.write(json.dumps({"variant": variant, "example_id": example_id, "scores": scores}) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Progress:
+    def __init__(self, total: int, done: int = 0, stream=sys.stderr, interval_s: float = 1.0):
+        """Prints completed/total, throughput and ETA at most every `interval_s`, and once at the end."""
+        self.total = total
+        self.done = done
+        self.failed = 0
+        self.stream = stream
+        self.interval_s = interval_s
+        self._resumed = done
+        self._start = time.monotonic()
+        self._printed_at = 0.0
+
+    def update(self, ok: bool) -> None:
+        self.done += 1
+        self.failed += not ok
+        now = time.monotonic()
+        if self.done == self.total or now - self._printed_at >= self.interval_s:
+            self._printed_at = now
+            self.stream.write(self.line() + "\n")
+            self.stream.flush()
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self._start
+        rate = (self.done - self._resumed) / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else float("inf")
+        pct = 100 * self.done / self.total if self.total else 100.0
+        return f"[eval] {self.done}/{self.total} ({pct:.0f}%) failed={self.failed} {rate:.1f}/s eta={eta:.0f}s"
+
+
+class AsyncEvaluationRunner:
+    def __init__(
+        self,
+        concurrency: int = EVAL_CONCURRENCY,
+        requests_per_s: float = EVAL_REQUESTS_PER_S,
+        max_retries: int = EVAL_MAX_RETRIES,
+        retry_backoff_s: float = EVAL_RETRY_BACKOFF_S,
+        checkpoint_path: Optional[str] = None,
+        progress: bool = True,
+        cache: Optional[PredictionCache] = None,
+    ):
+        """
+        Scores every prompt variant on every example concurrently.
+
+        A fixed pool of `concurrency` workers takes (variant, example) pairs from a queue. Calls
+        are paced by a token bucket when `requests_per_s` is set. A rate-limit error (HTTP 429)
+        pauses every worker for its Retry-After, since the limit is shared; other errors are
+        retried with exponential backoff and jitter. Scored examples are appended to the
+        checkpoint as they finish, and a rerun with the same checkpoint only runs what is missing.
+
+        Per-variant aggregates are averaged in dataset order with the same scoring as
+        `run_prompt_variant`, so they match the sequential runner exactly.
+
+        Args:
+            concurrency (int): Prompt calls in flight at once.
+            requests_per_s (float): Maximum prompt calls per second; 0 for no limit.
+            max_retries (int): Retries per example before it is recorded as failed.
+            retry_backoff_s (float): Backoff before the first retry; doubles with each retry.
+            checkpoint_path (Optional[str]): JSONL file to record and resume from.
+            progress (bool): Print progress to stderr.
+            cache (Optional[PredictionCache]): Serve unchanged predictions from this cache.
+        """
+        self.concurrency = max(1, concurrency)
+        self.requests_per_s = requests_per_s
+        self.max_retries = max_retries
+        self.retry_backoff_s = retry_backoff_s
+        self.checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+        self.progress = progress
+        self.cache = cache
+        self.errors: List[Dict] = []
+        self._buckets = InMemoryBucketStore()
+        self._paused_until = 0.0
+
+    async def _wait_turn(self) -> None:
+        while True:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            if self.requests_per_s <= 0:
+                return
+            wait = self._buckets.take("eval", self.requests_per_s, max(1.0, self.requests_per_s), 1)
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def _call(self, prompt_fn: Callable, inputs: Dict) -> Dict:
+        if inspect.iscoroutinefunction(prompt_fn):
+            return await prompt_fn(**inputs)
+        output = await asyncio.to_thread(prompt_fn, **inputs)
+        return await output if inspect.isawaitable(output) else output
+
+    async def _score(self, name: str, prompt_fn: Callable, example: Dict) -> Dict[str, float]:
+        inputs = {
+            "conversation_history": example["conversation_history"],
+            "current_message": example["current_prospect_message"],
+            "prospect_id": example["prospect_id"],
+        }
+        # Cache hits skip the rate limiter: they never reach the model.
+        key = prediction_key(prompt_fn, inputs) if self.cache is not None else None
+        output = self.cache.get(key) if key else None
+        if output is not None:
+            return score_example(output, example["ground_truth"])
+
+        for attempt in range(self.max_retries + 1):
+            await self._wait_turn()
+            try:
+                output = await self._call(prompt_fn, inputs)
+                if key:
+                    self.cache.put(key, output)
+                return score_example(output, example["ground_truth"])
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = _rate_limit_delay(e)
+                if delay is not None:
+                    # Rate limits are shared by every worker, so all of them back off.
+                    delay = max(delay, self.retry_backoff_s * 2 ** attempt)
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                    logger.warning(f"Rate limited on {name}/{example['id']}; pausing all workers for {delay:.1f}s.")
+                else:
+                    delay = self.retry_backoff_s * 2 ** attempt * random.uniform(0.5, 1.5)
+                    logger.warning(f"{name}/{example['id']} failed ({e}); retrying in {delay:.1f}s.")
+                    await asyncio.sleep(delay)
+
+    async def run(self, variants: Dict[str, Callable], dataset: List[Dict] = GOLDEN_DATASET) -> List[Dict]:
+        """
+        Evaluate each prompt variant on the dataset.
+
+        Args:
+            variants (Dict[str, Callable]): Variant name to prompt function (sync or async), called like
+                `prompt_fn(conversation_history=..., current_message=..., prospect_id=...)`.
+            dataset (List[Dict]): Examples with an "id" and a "ground_truth".
+
+        Returns:
+            List[Dict]: One {"prompt_name", "scores"} per variant, in the order given. Examples that failed
+            every retry are left out of the averages and listed in `self.errors`.
+        """
+        done = self.checkpoint.load() if self.checkpoint else {}
+        scores = {key: value for key, value in done.items() if key[0] in variants}
+        pending = [
+            (name, example) for name in variants for example in dataset if (name, example["id"]) not in scores
+        ]
+        progress = Progress(len(variants) * len(dataset), len(variants) * len(dataset) - len(pending)) if self.progress else None
+        if scores:
+            logger.info(f"Resuming: {len(scores)} results loaded from the checkpoint, {len(pending)} to run.")
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in pending:
+            queue.put_nowait(item)
+
+        async def worker():
+            while not queue.empty():
+                name, example = queue.get_nowait()
+                try:
+                    result = await self._score(name, variants[name], example)
+                except Exception as e:
+                    self.errors.append({"prompt_name": name, "example_id": example["id"], "error": str(e)})
+                    logger.error(f"{name}/{example['id']} failed after {self.max_retries} retries: {e}")
+                else:
+                    scores[(name, example["id"])] = result
+                    if self.checkpoint:
+                        self.checkpoint.append(name, example["id"], result)
+                if progress:
+                    progress.update(ok=(name, example["id"]) in scores)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(pending)))))
+        finally:
+            if self.checkpoint:
+                self.checkpoint.close()
+
+        return [
+            {
+                "prompt_name": name,
+                "scores": average_scores([scores[(name, ex["id"])] for ex in dataset if (name, ex["id"]) in scores]),
+            }
+            for name in variants
+        ]
+
+
+if __name__ == "__main__":
+    from app.llm.prompts import orchestration_prompt_v1, orchestration_prompt_v2
+
+    parser = argparse.ArgumentParser(description="Evaluate prompt variants on the golden dataset concurrently.")
+    parser.add_argument("--concurrency", type=int, default=EVAL_CONCURRENCY)
+    parser.add_argument("--requests-per-s", type=float, default=EVAL_REQUESTS_PER_S, help="0 for no limit")
+    parser.add_argument("--max-retries", type=int, default=EVAL_MAX_RETRIES)
+    parser.add_argument("--checkpoint", type=str, default=None, help="JSONL file to record progress in and resume from")
+    parser.add_argument("--cache-dir", type=str, default=EVAL_CACHE_DIR, help="Prediction cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="Call the model for every example")
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else PredictionCache(args.cache_dir)
+    runner = AsyncEvaluationRunner(
+        args.concurrency, args.requests_per_s, args.max_retries, checkpoint_path=args.checkpoint, cache=cache
+    )
+    results = asyncio.run(runner.run({
+        "v1_default": orchestration_prompt_v1,
+        "v2_chain_of_thought": orchestration_prompt_v2,
+    }))
+    for r in results:
+        print(f"Prompt: {r['prompt_name']}")
+        for k, v in r["scores"].items():
+            print(f"  {k}: {v:.2f}")
+        print("-" * 20)
+    if runner.errors:
+        print(f"{len(runner.errors)} examples failed; rerun with the same --checkpoint to retry them.")
+        sys.exit(1)
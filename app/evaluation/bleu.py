@@ -0,0 +1,231 @@
+# app/evaluation/bleu.py
+
+import sys
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+DEFAULT_WEIGHTS = (0.25, 0.25, 0.25, 0.25)
+SMOOTHING_METHODS = tuple(f"method{i}" for i in range(8))
+
+References = Union[str, Sequence[str]]
+
+
+class BleuScorer:
+    def __init__(
+        self,
+        weights: Tuple[float, ...] = DEFAULT_WEIGHTS,
+        smoothing: Optional[str] = None,
+        epsilon: float = 0.1,
+        alpha: float = 5,
+        k: float = 5,
+        auto_reweigh: bool = False,
+    ):
+        """
+        Sentence- and corpus-level BLEU, matching NLTK's `sentence_bleu` / `corpus_bleu`.
+
+        Texts are split on whitespace (like `compute_bleu`) once, and their tokens interned as
+        integer IDs; both are cached for the scorer's lifetime, so references repeated across an
+        evaluation set are only tokenized once. The caches are unbounded, so the module helpers
+        use a fresh scorer per call. A batch is scored at once: every n-gram of every text gets
+        a dense ID (built order by order from the (n-1)-gram ID and the next token), and clipped
+        counts for all sentences come from a few sorts and searches over integer arrays instead
+        of a Counter per sentence and order.
+
+        The smoothing methods are Chen and Cherry's (2014) as implemented by NLTK's
+        `SmoothingFunction`, including its corpus-level behaviour of taking the last sentence
+        for the per-hypothesis terms of methods 5 to 7. Scores agree with NLTK to floating-point
+        rounding.
+
+        Args:
+            weights (Tuple[float, ...]): Weights of the 1..N-gram precisions.
+            smoothing (Optional[str]): "method0" to "method7", or None for no smoothing (method0).
+            epsilon (float): Method 1's added count.
+            alpha (float): Method 6's prior weight.
+            k (float): Method 4's scale.
+            auto_reweigh (bool): Use uniform weights up to the hypothesis length when it is
+                shorter than 4 and the weights are the default, as NLTK does.
+        """
+        if smoothing is not None and smoothing not in SMOOTHING_METHODS:
+            raise ValueError(f"Unknown smoothing '{smoothing}'; choose from {SMOOTHING_METHODS}.")
+        self.weights = tuple(weights)
+        self.smoothing = int(smoothing[-1]) if smoothing else 0
+        self.epsilon = epsilon
+        self.alpha = alpha
+        self.k = k
+        self.auto_reweigh = auto_reweigh
+        self._vocab: Dict[str, int] = {}
+        self._tokens: Dict[str, np.ndarray] = {}
+
+    def tokenize(self, text: str) -> np.ndarray:
+        """Return the interned token IDs of `text`, split on whitespace (cached)."""
+        return self.tokenize_many([text])[0]
+
+    def tokenize_many(self, texts: Sequence[str]) -> List[np.ndarray]:
+        """Return the interned token IDs of each text; texts not seen before are tokenized together."""
+        cache = self._tokens
+        new_texts = [text for text in dict.fromkeys(texts) if text not in cache]
+        if new_texts:
+            splits = [text.split() for text in new_texts]
+            flat = list(chain.from_iterable(splits))
+            vocab = self._vocab
+            new_tokens = [token for token in dict.fromkeys(flat) if token not in vocab]
+            vocab.update(zip(new_tokens, range(len(vocab), len(vocab) + len(new_tokens))))
+            ids = np.fromiter(map(vocab.__getitem__, flat), dtype=np.int64, count=len(flat))
+            ends = np.cumsum([len(split) for split in splits]).tolist()
+            cache.update(zip(new_texts, (ids[start:end] for start, end in zip([0] + ends, ends))))
+        return [cache[text] for text in texts]
+
+    def _stats(self, references: Sequence[References], hypotheses: Sequence[str], orders: int):
+        """
+        Clipped n-gram matches and hypothesis n-gram counts per sentence and order, hypothesis
+        lengths and closest reference lengths.
+        """
+        if len(references) != len(hypotheses):
+            raise ValueError("The number of hypotheses and their references should be the same.")
+        n_hyp = len(hypotheses)
+        refs = [[r] if isinstance(r, str) else list(r) for r in references]
+        owner = np.repeat(np.arange(n_hyp), [len(r) for r in refs])
+        multi_ref = bool(np.any(owner[1:] == owner[:-1]))
+        texts = self.tokenize_many(list(hypotheses) + [r for rs in refs for r in rs])
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+        hyp_len, ref_len = lengths[:n_hyp], lengths[n_hyp:]
+
+        # Closest reference length per hypothesis: smallest |ref - hyp|, ties to the shorter reference.
+        span = int(lengths.max(initial=0)) + 1
+        closest = np.full(n_hyp, np.iinfo(np.int64).max)
+        np.minimum.at(closest, owner, np.abs(ref_len - hyp_len[owner]) * span + ref_len)
+        closest_len = np.where(closest == np.iinfo(np.int64).max, 0, closest % span)
+
+        tokens = np.concatenate(texts) if texts else np.empty(0, dtype=np.int64)
+        segment = np.repeat(np.arange(len(texts)), lengths)
+        numerators = np.zeros((n_hyp, orders))
+        grams = tokens
+        n_tokens = max(len(self._vocab), 1)
+        n_grams = n_tokens
+        # Keys below pack (text, n-gram ID) into an int64; renumber n-grams densely only when needed.
+        key_limit = np.iinfo(np.int64).max // max(len(texts), 1)
+        for n in range(1, orders + 1):
+            count = len(tokens) - n + 1
+            if count <= 0:
+                break
+            if n > 1:
+                # The n-gram starting at i is the (n-1)-gram at i followed by token i+n-1.
+                if n_grams > key_limit // n_tokens:
+                    grams = np.unique(grams, return_inverse=True)[1].reshape(-1)
+                    n_grams = int(grams.max(initial=0)) + 1
+                grams = grams[:-1] * n_tokens + tokens[n - 1:]
+                n_grams *= n_tokens
+            seg = segment[:count]
+            valid = seg == segment[n - 1:]
+            keys = seg * n_grams + grams[:count]
+            hyp_keys, hyp_counts = np.unique(keys[valid & (seg < n_hyp)], return_counts=True)
+            ref_keys, ref_counts = np.unique(keys[valid & (seg >= n_hyp)], return_counts=True)
+            # Max count over each hypothesis's references, keyed by (hypothesis, n-gram).
+            ref_keys = owner[ref_keys // n_grams - n_hyp] * n_grams + ref_keys % n_grams
+            if multi_ref:
+                order = np.argsort(ref_keys, kind="stable")
+                ref_keys, ref_counts = ref_keys[order], ref_counts[order]
+                if len(ref_keys):
+                    ref_keys, starts = np.unique(ref_keys, return_index=True)
+                    ref_counts = np.maximum.reduceat(ref_counts, starts)
+            pos = np.minimum(np.searchsorted(ref_keys, hyp_keys), max(len(ref_keys) - 1, 0))
+            found = (ref_keys[pos] == hyp_keys) if len(ref_keys) else np.zeros(len(hyp_keys), dtype=bool)
+            clipped = np.where(found, np.minimum(hyp_counts, ref_counts[pos] if len(ref_keys) else 0), 0)
+            numerators[:, n - 1] = np.bincount(hyp_keys // n_grams, weights=clipped, minlength=n_hyp)
+        denominators = np.maximum(1, hyp_len[:, None] - np.arange(orders)[None, :]).astype(np.float64)
+        return numerators, denominators, hyp_len, closest_len
+
+    def _smooth(self, num: np.ndarray, den: np.ndarray, hyp_len: np.ndarray, p5: np.ndarray, last_len: np.ndarray) -> np.ndarray:
+        """Smoothed precisions, one row per score. `p5` is the order-5 precision, `last_len` the length methods 5-7 see."""
+        method = self.smoothing
+        zero = num == 0
+        p = num / den
+        if method == 0:
+            return np.where(zero, sys.float_info.min, p)
+        if method == 1:
+            return np.where(zero, (num + self.epsilon) / den, p)
+        if method == 2:
+            p[:, 1:] = (num[:, 1:] + 1) / (den[:, 1:] + 1)
+            return p
+        if method == 3:
+            return np.where(zero, 1 / (2 ** np.cumsum(zero, axis=1) * den), p)
+        if method in (4, 7):
+            scale = np.log(np.maximum(hyp_len, 2)).astype(np.float64)[:, None]
+            smoothed = 1 / (2 ** np.cumsum(zero, axis=1) * self.k / scale) / den
+            p = np.where(zero & (hyp_len[:, None] > 1), smoothed, p)
+            if method == 4:
+                return p
+        if method in (5, 7):
+            following = np.concatenate([p, p5[:, None]], axis=1)
+            previous = p[:, 0] + 1
+            for i in range(p.shape[1]):
+                p[:, i] = previous = (previous + p[:, i] + following[:, i + 1]) / 3
+            return p
+        # Method 6: interpolate with a prior extrapolated from the two lower orders.
+        if p.shape[1] > 2 and not np.all(p[:, 2]):
+            raise ValueError("This smoothing method requires non-zero precision for trigrams.")
+        for i in range(2, p.shape[1]):
+            prior = np.where(p[:, i - 2] == 0, 0.0, p[:, i - 1] ** 2 / np.where(p[:, i - 2] == 0, 1, p[:, i - 2]))
+            p[:, i] = (num[:, i] + self.alpha * prior) / (np.maximum(last_len - i, 0) + self.alpha)
+        return p
+
+    def _combine(self, p: np.ndarray, num1: np.ndarray, hyp_len: np.ndarray, ref_len: np.ndarray) -> np.ndarray:
+        weights = np.tile(np.asarray(self.weights, dtype=np.float64), (len(p), 1))
+        if self.auto_reweigh and self.weights == DEFAULT_WEIGHTS:
+            short = (hyp_len < 4) & (hyp_len > 0)
+            for length in np.unique(hyp_len[short]):
+                row = np.zeros(len(self.weights))
+                row[:length] = 1 / length
+                weights[hyp_len == length] = row
+        logs = np.where(p > 0, weights * np.log(np.where(p > 0, p, 1)), 0.0)
+        with np.errstate(divide="ignore"):
+            bp = np.where(hyp_len > ref_len, 1.0, np.where(hyp_len == 0, 0.0, np.exp(1 - ref_len / np.maximum(hyp_len, 1))))
+        return np.where(num1 == 0, 0.0, bp * np.exp(logs.sum(axis=1)))
+
+    def _orders(self) -> int:
+        return max(len(self.weights), 5) if self.smoothing in (5, 7) else len(self.weights)
+
+    def sentence_scores(self, references: Sequence[References], hypotheses: Sequence[str]) -> np.ndarray:
+        """
+        BLEU of each hypothesis against its reference(s), like NLTK's `sentence_bleu` on each pair.
+
+        Args:
+            references (Sequence[References]): One reference string, or a list of them, per hypothesis.
+            hypotheses (Sequence[str]): The hypotheses.
+
+        Returns:
+            np.ndarray: One score per hypothesis.
+        """
+        num, den, hyp_len, ref_len = self._stats(references, hypotheses, self._orders())
+        n = len(self.weights)
+        p5 = num[:, 4] / den[:, 4] if num.shape[1] > 4 else np.zeros(len(num))
+        p = self._smooth(num[:, :n].copy(), den[:, :n], hyp_len, p5, hyp_len)
+        return self._combine(p, num[:, 0], hyp_len, ref_len)
+
+    def corpus_score(self, references: Sequence[References], hypotheses: Sequence[str]) -> float:
+        """BLEU of the whole corpus, like NLTK's `corpus_bleu` (matches and lengths summed before combining)."""
+        num, den, hyp_len, ref_len = self._stats(references, hypotheses, self._orders())
+        if not len(num):
+            return 0.0
+        n = len(self.weights)
+        total_hyp, total_ref = np.array([hyp_len.sum()]), np.array([ref_len.sum()])
+        p5 = num[-1:, 4] / den[-1:, 4] if num.shape[1] > 4 else np.zeros(1)
+        p = self._smooth(num[:, :n].sum(axis=0, keepdims=True), den[:, :n].sum(axis=0, keepdims=True), total_hyp, p5, hyp_len[-1:])
+        return float(self._combine(p, num[:, :1].sum(axis=0), total_hyp, total_ref)[0])
+
+
+def sentence_bleu(reference: References, hypothesis: str, smoothing: Optional[str] = None, **kwargs) -> float:
+    """BLEU of one hypothesis string against one or more reference strings."""
+    return float(BleuScorer(smoothing=smoothing, **kwargs).sentence_scores([reference], [hypothesis])[0])
+
+
+def corpus_bleu(references: Sequence[References], hypotheses: Sequence[str], smoothing: Optional[str] = None, **kwargs) -> float:
+    """Corpus BLEU of the hypotheses against their references; see `BleuScorer.corpus_score`."""
+    return BleuScorer(smoothing=smoothing, **kwargs).corpus_score(references, hypotheses)
+
+
+def sentence_bleus(references: Sequence[References], hypotheses: Sequence[str], smoothing: Optional[str] = None, **kwargs) -> List[float]:
+    """Sentence BLEU of each hypothesis, scored as one batch; see `BleuScorer.sentence_scores`."""
+    return BleuScorer(smoothing=smoothing, **kwargs).sentence_scores(references, hypotheses).tolist()
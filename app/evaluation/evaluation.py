@@ -13,6 +13,9 @@ try:
 except ImportError:
     sentence_bleu = None
 
+from app.evaluation.bleu import sentence_bleu as native_sentence_bleu
+from app.evaluation.bleu import sentence_bleus as native_sentence_bleus
+
 logger = logging.getLogger(__name__)
 
 # Optional: Import only if using full mode
@@ -47,23 +50,43 @@ def entity_f1(gt_entities: List[str], pred_entities: List[str]) -> float:
         return 0.0
     return 2 * prec * rec / (prec + rec)
 
+# Built once; NLTK's SmoothingFunction is cheap but was being created for every example.
+_SMOOTHING = SmoothingFunction().method4 if sentence_bleu else None
+
 def compute_bleu(reference: str, hypothesis: str) -> float:
     """
     Compute the BLEU score for a single example's response draft.
 
+    Uses NLTK when installed and the native scorer in `app.evaluation.bleu` otherwise; both
+    give the same score. To score many examples, use `compute_bleu_batch`.
+
     Args:
         reference: The ground truth response draft.
         hypothesis: The predicted response draft.
 
     Returns:
-        The BLEU score of the prediction, or -1 if BLEU is not installed.
+        The BLEU score of the prediction.
     """
-    # BLEU not available
-    if not sentence_bleu:
-        return -1  
     # Use smoothing to avoid zero score on short sentences
-    smoothie = SmoothingFunction().method4
-    return sentence_bleu([reference.split()], hypothesis.split(), smoothing_function=smoothie)
+    if not sentence_bleu:
+        return native_sentence_bleu(reference, hypothesis, smoothing="method4")
+    return sentence_bleu([reference.split()], hypothesis.split(), smoothing_function=_SMOOTHING)
+
+def compute_bleu_batch(references: List[str], hypotheses: List[str]) -> List[float]:
+    """
+    Compute `compute_bleu` for many examples at once with the native scorer.
+
+    Each call tokenizes its texts once (repeated references share the work) and keeps nothing
+    afterwards, so long-running processes do not accumulate a vocabulary.
+
+    Args:
+        references: The ground truth response drafts.
+        hypotheses: The predicted response drafts, one per reference.
+
+    Returns:
+        The BLEU score of each prediction.
+    """
+    return native_sentence_bleus(references, hypotheses, smoothing="method4")
 
 def evaluate_lite(dataset: List[Dict], print_report: bool = False) -> Dict[str, float]:
     """
@@ -381,7 +404,7 @@ def calculate_llm_score(metrics: Dict) -> float:
 #     print(f"Avg BLEU Score:           {round(sum(bleu_scores)/len(bleu_scores), 4)}")
 
 
-def evaluate(dataset_path: str, mode: str = "lite"):
+def evaluate(dataset_path: str, mode: str = "lite", stream: bool = False, chunk_size: int = 10_000, workers: int = 1):
     """
     Evaluate the LLM predictions in the given dataset file.
 
@@ -405,9 +428,35 @@ def evaluate(dataset_path: str, mode: str = "lite"):
 
     The results are printed to the console as a table.
 
+    With `stream`, the file (a JSON array or JSONL) is read and scored `chunk_size` records at a
+    time by `app.evaluation.parallel.evaluate_parallel`, which computes the `evaluate_lite` /
+    `evaluate_full` metrics and an intent confusion matrix in bounded memory. With `workers` other
+    than 1 the chunks are scored on a process pool; the averages are exact, so the result does not
+    depend on the number of workers or the chunk size.
+
     :param dataset_path: the path to the dataset file
     :param mode: the evaluation mode, either 'lite' or 'full'
+    :param stream: evaluate the file in chunks instead of loading it
+    :param chunk_size: records per chunk when streaming or running in parallel
+    :param workers: worker processes for the chunks (0 for one per CPU); implies streaming
     """
+    if stream or workers != 1:
+        from app.evaluation.parallel import evaluate_parallel
+
+        if mode not in ("lite", "full"):
+            logger.error("Invalid mode. Choose 'lite' or 'full'.")
+            return None
+        logger.info(f"Running {'parallel' if workers != 1 else 'streaming'} {mode} evaluation...")
+        summary = evaluate_parallel(dataset_path, mode, workers, chunk_size)
+        confusion = summary.pop("intent_confusion")
+        logger.info("\n=== Evaluation Summary ===")
+        for k, v in summary.items():
+            logger.info(f"{k}: {v}")
+        logger.info("\n=== Intent Confusion (rows: true, columns: predicted) ===")
+        for label, row in zip(confusion["labels"], confusion["matrix"]):
+            logger.info(f"{label}: {row}")
+        return {**summary, "intent_confusion": confusion}
+
     with open(dataset_path, "r") as f:
         data = json.load(f)
 
@@ -445,6 +494,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--file", type=str, required=True, help="Path to evaluation dataset file")
     parser.add_argument("--mode", type=str, default="lite", choices=["lite", "full"], help="Evaluation mode")
+    parser.add_argument("--stream", action="store_true", help="Read the file (JSON array or JSONL) in chunks")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="Records per chunk when streaming or running in parallel")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes scoring the chunks (0 for one per CPU); implies --stream")
 
     args = parser.parse_args()
-    evaluate(args.file, args.mode)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    evaluate(args.file, args.mode, args.stream, args.chunk_size, args.workers)
@@ -0,0 +1,109 @@
+# app/evaluation/parallel.py
+
+import gc
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from app.evaluation.streaming import DEFAULT_CHUNK_SIZE, StreamingEvaluator, _starts_with_array, iter_chunks, iter_records
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for parallel evaluation; 0 uses one per CPU.
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "0"))
+
+
+def _iter_line_chunks(path: str, chunk_size: int) -> Iterator[List[bytes]]:
+    """Yield the raw lines of a JSONL file `chunk_size` at a time; workers parse them."""
+    with open(path, "rb") as f:
+        chunk = []
+        for line in f:
+            chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _score_chunk(chunk: List, full: bool, raw: bool) -> StreamingEvaluator:
+    """Score one work unit (parsed records, or raw JSONL lines when `raw`) into a partial aggregate."""
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        if raw:
+            loads = orjson.loads if orjson else json.loads
+            chunk = [loads(line) for line in chunk if line.strip()]
+        evaluator = StreamingEvaluator(full=full)
+        if chunk:
+            evaluator.update(chunk)
+        return evaluator
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def evaluate_parallel(
+    source: Union[str, Iterable[Dict]],
+    mode: str = "lite",
+    workers: int = EVAL_WORKERS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict:
+    """
+    Evaluate a predictions file (JSON array or JSONL) or an iterable of records on a process pool.
+
+    The records are cut into work units of `chunk_size`. Each unit is scored on a worker into a
+    partial `StreamingEvaluator`, and the partials are merged in unit order. JSONL files are sent
+    to the workers as raw lines, so parsing is parallel too; JSON arrays and in-memory records are
+    parsed here and pickled to the workers. At most two units per worker are in flight, so memory
+    stays bounded as with `evaluate_stream`.
+
+    Every merged total is an integer, and entity precision and recall are averaged exactly from
+    per-ratio counts, so the result is identical for any number of workers and any chunk size. It
+    matches `evaluate_stream` except that the entity averages are correctly rounded rather than
+    summed left to right (they can differ in the last bit).
+
+    Args:
+        source (Union[str, Iterable[Dict]]): A file path or the records themselves.
+        mode (str): "lite" for the `evaluate_lite` metrics, "full" to add tools and next steps.
+        workers (int): Worker processes; 0 for one per CPU, 1 to score in this process.
+        chunk_size (int): Records per work unit.
+
+    Returns:
+        Dict: See `StreamingEvaluator.result`.
+    """
+    full = mode == "full"
+    workers = workers or os.cpu_count() or 1
+    raw = False
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            raw = _starts_with_array(f) is False
+    if raw:
+        chunks = _iter_line_chunks(source, chunk_size)
+    else:
+        chunks = iter_chunks(iter_records(source) if isinstance(source, str) else source, chunk_size)
+
+    merged = StreamingEvaluator(full=full)
+    if workers == 1:
+        for chunk in chunks:
+            merged.merge(_score_chunk(chunk, full, raw))
+        return merged.result(exact=True)
+
+    logger.info(f"Evaluating on {workers} worker processes, {chunk_size} records per work unit.")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_score_chunk, chunk, full, raw))
+            if len(pending) >= 2 * workers:
+                merged.merge(pending.popleft().result())
+        while pending:
+            merged.merge(pending.popleft().result())
+    return merged.result(exact=True)
@@ -0,0 +1,225 @@
+# app/evaluation/prediction_cache.py
+
+import argparse
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Directory of cached predictions, one JSON file per key.
+EVAL_CACHE_DIR = os.getenv("EVAL_CACHE_DIR", "data/prediction_cache")
+# Part of every key: a prediction made with another model or sampling settings is a different prediction.
+EVAL_MODEL = os.getenv("OPENAI_MODEL", "gpt-4")
+EVAL_SAMPLING_PARAMS = {"temperature": float(os.getenv("OPENAI_TEMPERATURE", "0.3"))}
+
+
+def prompt_fingerprint(prompt: Any) -> str:
+    """
+    Identify a prompt by its content: the template text, or a prompt function's qualified name and source.
+
+    Editing a prompt function changes its fingerprint, so only its predictions are recomputed.
+    """
+    if isinstance(prompt, str):
+        return prompt
+    prompt = inspect.unwrap(prompt)
+    try:
+        source = inspect.getsource(prompt)
+    except (OSError, TypeError):
+        source = ""
+    return f"{prompt.__module__}.{prompt.__qualname__}\n{source}"
+
+
+def prediction_key(prompt: Any, inputs: Dict, model: str = EVAL_MODEL, params: Optional[Dict] = None) -> str:
+    """
+    Hash (prompt, example inputs, model, sampling params) into a cache key.
+
+    Args:
+        prompt (Any): A prompt template string or prompt function.
+        inputs (Dict): What the prompt sees of the example (not its ground truth, which does not
+            affect the prediction).
+        model (str): The model name.
+        params (Optional[Dict]): Sampling parameters; defaults to EVAL_SAMPLING_PARAMS.
+
+    Returns:
+        str: A SHA-256 hex digest.
+    """
+    payload = {
+        "prompt": prompt_fingerprint(prompt),
+        "inputs": inputs,
+        "model": model,
+        "params": EVAL_SAMPLING_PARAMS if params is None else params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, path: str = EVAL_CACHE_DIR):
+        """
+        A content-addressed on-disk cache of LLM predictions for evaluation runs.
+
+        Each prediction is a JSON file named by its key, under a two-character prefix directory.
+        Files are written to a temporary name and renamed into place, so concurrent runs and
+        crashes never leave a partial entry. A file's modification time is bumped on every hit,
+        which is what `prune` uses as "last used".
+
+        Args:
+            path (str): The cache directory; created on first write.
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached prediction for `key`, or None."""
+        path = self._file(key)
+        try:
+            with open(path, "r") as f:
+                output = json.load(f)["output"]
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return output
+
+    def put(self, key: str, output: Any) -> None:
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"output": output, "created_at": time.time()}, f)
+        os.replace(tmp, path)
+
+    def _entries(self):
+        if not os.path.isdir(self.path):
+            return
+        for prefix in os.listdir(self.path):
+            directory = os.path.join(self.path, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name.endswith(".json"):
+                    path = os.path.join(directory, name)
+                    try:
+                        yield path, os.stat(path)
+                    except FileNotFoundError:
+                        continue
+
+    def stats(self) -> Dict:
+        """Return the number of entries, their total size, the oldest and newest use, and this session's hit rate."""
+        entries = [stat for _, stat in self._entries()]
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(entries),
+            "bytes": sum(stat.st_size for stat in entries),
+            "oldest_used": min((stat.st_mtime for stat in entries), default=None),
+            "newest_used": max((stat.st_mtime for stat in entries), default=None),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def prune(self, older_than_days: Optional[float] = None, max_bytes: Optional[int] = None) -> int:
+        """
+        Delete entries unused for `older_than_days`, then the least recently used ones until the
+        cache fits in `max_bytes`.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[1].st_mtime)
+        keep, removed = [], 0
+        cutoff = time.time() - older_than_days * 86400 if older_than_days is not None else None
+        for path, stat in entries:
+            if cutoff is not None and stat.st_mtime < cutoff:
+                removed += _remove(path)
+            else:
+                keep.append((path, stat))
+        if max_bytes is not None:
+            total = sum(stat.st_size for _, stat in keep)
+            for path, stat in keep:
+                if total <= max_bytes:
+                    break
+                removed += _remove(path)
+                total -= stat.st_size
+        return removed
+
+
+def _remove(path: str) -> int:
+    try:
+        os.remove(path)
+        return 1
+    except FileNotFoundError:
+        return 0
+
+
+def cached_prompt(prompt_fn: Callable, cache: PredictionCache, model: str = EVAL_MODEL, params: Optional[Dict] = None) -> Callable:
+    """
+    Wrap a prompt function (sync or async) so its predictions are served from and stored in `cache`.
+
+    The wrapper takes the same keyword arguments as the prompt function:
+    `conversation_history`, `current_message` and `prospect_id`.
+    """
+    def key_for(kwargs: Dict) -> str:
+        return prediction_key(prompt_fn, kwargs, model, params)
+
+    if inspect.iscoroutinefunction(prompt_fn):
+        @functools.wraps(prompt_fn)
+        async def async_wrapper(**kwargs):
+            key = key_for(kwargs)
+            output = cache.get(key)
+            if output is None:
+                output = await prompt_fn(**kwargs)
+                cache.put(key, output)
+            return output
+        return async_wrapper
+
+    @functools.wraps(prompt_fn)
+    def wrapper(**kwargs):
+        key = key_for(kwargs)
+        output = cache.get(key)
+        if output is None:
+            output = prompt_fn(**kwargs)
+            cache.put(key, output)
+        return output
+    return wrapper
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or prune the evaluation prediction cache.")
+    parser.add_argument("--dir", type=str, default=EVAL_CACHE_DIR, help="The cache directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="Show the number and size of cached predictions")
+    prune = commands.add_parser("prune", help="Delete old entries, or the least recently used beyond a size")
+    prune.add_argument("--older-than-days", type=float, default=None, help="Delete entries unused for this long")
+    prune.add_argument("--max-mb", type=float, default=None, help="Then delete the least recently used until this size")
+    commands.add_parser("clear", help="Delete every entry")
+    args = parser.parse_args()
+
+    cache = PredictionCache(args.dir)
+    if args.command == "stats":
+        for k, v in cache.stats().items():
+            if k.endswith("_used") and v is not None:
+                v = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(v))
+            if k not in ("hits", "misses", "hit_rate"):
+                print(f"{k}: {v}")
+    elif args.command == "prune":
+        if args.older_than_days is None and args.max_mb is None:
+            parser.error("prune needs --older-than-days and/or --max-mb")
+        max_bytes = int(args.max_mb * 2**20) if args.max_mb is not None else None
+        print(f"Deleted {cache.prune(args.older_than_days, max_bytes)} entries.")
+    else:
+        print(f"Deleted {cache.prune(max_bytes=0)} entries.")
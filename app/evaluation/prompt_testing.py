@@ -1,13 +1,56 @@
 import json
 from pathlib import Path
-from typing import Dict, Callable
-from evaluation import evaluate_lite, calculate_llm_score
+from typing import Dict, Callable, List, Optional
+from app.evaluation.evaluation import evaluate_lite, calculate_llm_score
 from app.llm.prompts import orchestration_prompt_v1 as run_prompt
 from app.evaluation.golden_dataset import GOLDEN_DATASET
+from app.evaluation.prediction_cache import PredictionCache, cached_prompt, prediction_key
+from app.evaluation.similarity import SimilarityEngine
 from app.evaluation.metrics import compute_intent_f1, compute_entity_overlap, similarity_score
 from app.evaluation.score import compute_llm_score
 
-def run_prompt_variant(prompt_fn: Callable, name: str) -> Dict:
+def score_example(output: Dict, truth: Dict, response_similarity: Optional[float] = None) -> Dict[str, float]:
+    """
+    Scores one prompt output against its ground truth.
+
+    Args:
+        output (Dict): The prompt function's output.
+        truth (Dict): The example's ground truth.
+        response_similarity (Optional[float]): A precomputed draft similarity (e.g. from a batched
+            SimilarityEngine); the character-level `similarity_score` otherwise.
+
+    Returns:
+        Dict[str, float]: Intent F1, entity F1, response similarity, confidence score, tool call score
+        and the combined LLM score.
+    """
+    scores = {
+        "intent_f1": compute_intent_f1(output["intent"], truth["intent"]),
+        "entity_f1": compute_entity_overlap(output["entities"], truth["entities"])["f1"],
+        "response_similarity": similarity_score(
+            output["suggested_response_draft"], truth["suggested_response_draft"]
+        ) if response_similarity is None else response_similarity,
+        "confidence_score": output.get("confidence_score", 0.0),
+        "tool_call_score": 1.0 if "tools_to_call" not in truth or "tools_to_call" not in output else 0.8  # Simplified
+        
+    }
+
+    scores["llm_score"] = compute_llm_score(scores)
+    return scores
+
+
+def average_scores(results: List[Dict[str, float]]) -> Dict[str, float]:
+    """Averages per-example scores, in the order given, rounded to 4 places."""
+    if not results:
+        return {}
+    return {
+        k: round(sum(r[k] for r in results) / len(results), 4)
+        for k in results[0]
+    }
+
+
+def run_prompt_variant(
+    prompt_fn: Callable, name: str, cache: Optional[PredictionCache] = None, similarity: Optional[SimilarityEngine] = None
+) -> Dict:
     """
     Evaluates a prompt function against a golden dataset and computes average scores.
 
@@ -15,39 +58,38 @@ def run_prompt_variant(prompt_fn: Callable, name: str) -> Dict:
         prompt_fn (Callable): A function that generates a response based on conversation history,
                               the current message, and prospect ID.
         name (str): The name of the prompt variant being evaluated.
+        cache (Optional[PredictionCache]): Serve unchanged predictions from this cache, so only the
+                                           scores are recomputed.
+        similarity (Optional[SimilarityEngine]): Score all response drafts in one batch with this engine
+                                                 instead of the per-pair character ratio.
 
     Returns:
         Dict: A dictionary containing the prompt name and the average scores for intent F1, 
               entity F1, response similarity, confidence score, tool call score, and LLM score.
     """
 
-    results = []
+    if cache is not None:
+        prompt_fn = cached_prompt(prompt_fn, cache)
+
+    outputs = []
     for example in GOLDEN_DATASET:
-        output = prompt_fn(
+        outputs.append(prompt_fn(
             conversation_history=example["conversation_history"],
             current_message=example["current_prospect_message"],
             prospect_id=example["prospect_id"]
-        )
-
-        truth = example["ground_truth"]
-        scores = {
-            "intent_f1": compute_intent_f1(output["intent"], truth["intent"]),
-            "entity_f1": compute_entity_overlap(output["entities"], truth["entities"])["f1"],
-            "response_similarity": similarity_score(
-                output["suggested_response_draft"], truth["suggested_response_draft"]
-            ),
-            "confidence_score": output.get("confidence_score", 0.0),
-            "tool_call_score": 1.0 if "tools_to_call" not in truth or "tools_to_call" not in output else 0.8  # Simplified
-            
-        }
+        ))
 
-        scores["llm_score"] = compute_llm_score(scores)
-        results.append(scores)
+    truths = [example["ground_truth"] for example in GOLDEN_DATASET]
+    if similarity is not None:
+        similarities = similarity.scores(
+            [output["suggested_response_draft"] for output in outputs],
+            [truth["suggested_response_draft"] for truth in truths],
+        ).tolist()
+    else:
+        similarities = [None] * len(outputs)
+    results = [score_example(output, truth, sim) for output, truth, sim in zip(outputs, truths, similarities)]
 
-    avg_scores = {
-        k: round(sum(r[k] for r in results) / len(results), 4)
-        for k in results[0]
-    }
+    avg_scores = average_scores(results)
 
     return {"prompt_name": name, "scores": avg_scores}
 
@@ -72,7 +114,7 @@ def load_prompt_versions(prompt_dir: str) -> Dict[str, str]:
     return prompts
 
 
-def run_prompt_on_example(prompt_template: str, example: Dict) -> Dict:
+def run_prompt_on_example(prompt_template: str, example: Dict, cache: Optional[PredictionCache] = None) -> Dict:
     # Combine history + current message into a single prompt input
     """
     Generates a prediction using a given prompt template and example data.
@@ -81,6 +123,7 @@ def run_prompt_on_example(prompt_template: str, example: Dict) -> Dict:
         prompt_template (str): The template for the prompt to be used with the LLM.
         example (Dict): A dictionary containing the conversation history, current prospect message,
                         and ground truth data.
+        cache (Optional[PredictionCache]): Reuse the prediction for this template and input, if cached.
 
     Returns:
         Dict: A dictionary containing the predicted response and the expected ground truth.
@@ -90,7 +133,12 @@ def run_prompt_on_example(prompt_template: str, example: Dict) -> Dict:
     input_text = f"{conversation}\nprospect: {example['current_prospect_message']}"
     
     # Call LLM with specific prompt
-    response = run_prompt(prompt_template, input_text)
+    key = prediction_key(prompt_template, {"input_text": input_text})
+    response = cache.get(key) if cache is not None else None
+    if response is None:
+        response = run_prompt(prompt_template, input_text)
+        if cache is not None:
+            cache.put(key, response)
 
     return {
         "predicted": response,
@@ -98,7 +146,7 @@ def run_prompt_on_example(prompt_template: str, example: Dict) -> Dict:
     }
 
 
-def test_all_prompts(golden_path: str, prompt_dir: str):
+def test_all_prompts(golden_path: str, prompt_dir: str, cache: Optional[PredictionCache] = None):
     """
     Tests multiple prompt versions against a golden dataset and evaluates their performance.
 
@@ -110,6 +158,7 @@ def test_all_prompts(golden_path: str, prompt_dir: str):
     Args:
         golden_path (str): The file path to the golden dataset in JSON format.
         prompt_dir (str): The directory containing the prompt files.
+        cache (Optional[PredictionCache]): Only call the LLM for template/example pairs not cached yet.
 
     Returns:
         Dict[str, Dict]: A dictionary mapping each prompt version name to its average LLM score 
@@ -129,7 +178,7 @@ def test_all_prompts(golden_path: str, prompt_dir: str):
 
         for example in golden_dataset:
             try:
-                full_example = run_prompt_on_example(prompt_template, example)
+                full_example = run_prompt_on_example(prompt_template, example, cache)
                 metrics = evaluate_lite(full_example)
                 metrics["llm_score"] = calculate_llm_score(metrics)
                 version_results.append(metrics)
@@ -152,5 +201,6 @@ def test_all_prompts(golden_path: str, prompt_dir: str):
 if __name__ == "__main__":
     test_all_prompts(
         golden_path="evaluation/golden_dataset.json",
-        prompt_dir="prompts/"
+        prompt_dir="prompts/",
+        cache=PredictionCache()
     )
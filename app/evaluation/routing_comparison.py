@@ -0,0 +1,105 @@
+# app/evaluation/routing_comparison.py
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from app.core.llm_orchestrator import orchestrator, llm_call_cost_usd_total, model_name
+from app.evaluation.golden_dataset import GOLDEN_DATASET
+from app.evaluation.metrics import compute_entity_overlap, similarity_score
+from app.llm.routing import ModelRouter
+from app.models.schemas import ProcessMessageRequest
+
+
+def _total_cost() -> float:
+    return sum(value for _, value in llm_call_cost_usd_total.samples())
+
+
+async def run_policy(name: str, router: ModelRouter) -> Dict:
+    """
+    Run the full pipeline over the golden dataset with the given router and score the outputs.
+
+    The intent classifier is disabled for the run so every policy pays for (and is judged on)
+    its own analysis calls.
+
+    Args:
+        name (str): The policy name shown in the report.
+        router (ModelRouter): The router to install on the orchestrator.
+
+    Returns:
+        Dict: Average latency, cost, entity F1, response similarity and next-step match for the policy,
+        plus the per-example predicted intents (used to compare policies against each other).
+    """
+    saved_router, saved_classifier = orchestrator.router, orchestrator.intent_classifier
+    orchestrator.router, orchestrator.intent_classifier = router, None
+
+    latencies, costs, entity_f1s, similarities, step_matches, intents = [], [], [], [], [], []
+    try:
+        for example in GOLDEN_DATASET:
+            request = ProcessMessageRequest(
+                conversation_history=example["conversation_history"],
+                current_prospect_message=example["current_prospect_message"],
+                prospect_id=example["prospect_id"],
+            )
+            truth = example["ground_truth"]
+            cost_before = _total_cost()
+            start = time.perf_counter()
+            response = await orchestrator.process(request)
+            latencies.append(time.perf_counter() - start)
+            costs.append(_total_cost() - cost_before)
+
+            entity_f1s.append(compute_entity_overlap(response.detailed_analysis.entities, truth["entities"])["f1"])
+            similarities.append(similarity_score(response.suggested_response_draft, truth["suggested_response_draft"]))
+            expected_actions = sorted(step["action"] for step in truth.get("internal_next_steps", []))
+            predicted_actions = sorted(step.action for step in response.internal_next_steps)
+            step_matches.append(float(expected_actions == predicted_actions))
+            intents.append(response.detailed_analysis.intent)
+    finally:
+        orchestrator.router, orchestrator.intent_classifier = saved_router, saved_classifier
+
+    n = len(latencies)
+    return {
+        "policy": name,
+        "avg_latency_s": round(sum(latencies) / n, 3),
+        "total_cost_usd": round(sum(costs), 4),
+        "entity_f1": round(sum(entity_f1s) / n, 4),
+        "response_similarity": round(sum(similarities) / n, 4),
+        "next_steps_match": round(sum(step_matches) / n, 4),
+        "intents": intents,
+    }
+
+
+async def compare(small_model: str, large_model: str) -> List[Dict]:
+    """
+    Compare small-only, large-only and routed policies on the golden dataset.
+
+    Each policy's intent agreement is measured against the large-only run, which is the
+    quality reference for routing.
+    """
+    routed = ModelRouter.from_env(large_model)
+    routed.small_model = small_model
+
+    results = [
+        await run_policy("large_only", ModelRouter.fixed(large_model)),
+        await run_policy("small_only", ModelRouter.fixed(small_model)),
+        await run_policy("routed", routed),
+    ]
+    reference = results[0]["intents"]
+    for r in results:
+        intents = r.pop("intents")
+        r["intent_agreement_with_large"] = round(sum(a == b for a, b in zip(intents, reference)) / len(reference), 4)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare model routing policies on the golden dataset.")
+    parser.add_argument("--small-model", type=str, default="gpt-4o-mini", help="The cheap model")
+    parser.add_argument("--large-model", type=str, default=model_name, help="The large model")
+    args = parser.parse_args()
+
+    for r in asyncio.run(compare(args.small_model, args.large_model)):
+        print(f"Policy: {r.pop('policy')}")
+        for k, v in r.items():
+            print(f"  {k}: {v}")
+        print("-" * 20)
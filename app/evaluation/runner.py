@@ -1,9 +1,13 @@
 # app/evaluation/runner.py
 
+import argparse
+from typing import Optional
+from app.evaluation.prediction_cache import EVAL_CACHE_DIR, PredictionCache
 from app.evaluation.prompt_testing import run_prompt_variant
+from app.evaluation.similarity import EVAL_EMBEDDING_CACHE_PATH, SIMILARITY_METHODS, EmbeddingCache, SimilarityEngine
 from app.llm.prompts import orchestration_prompt_v1, orchestration_prompt_v2
 
-def run_all():
+def run_all(cache: Optional[PredictionCache] = None, similarity: Optional[SimilarityEngine] = None):
     """
     Run all evaluation prompts and print out the results.
 
@@ -12,7 +16,8 @@ def run_all():
     (intent recognition, entity recognition, suggested response, etc.) as well as the overall score.
 
     The results are printed to stdout, but could be modified to write to a file or return the results
-    instead.
+    instead. With a cache, only predictions for new or changed prompts and examples call the model.
+    With a similarity engine, response similarity is scored in batches with it (e.g. embeddings).
 
     Example output:
 
@@ -34,14 +39,25 @@ def run_all():
         --------------------
     """
     results = []
-    results.append(run_prompt_variant(orchestration_prompt_v1, "v1_default"))
-    results.append(run_prompt_variant(orchestration_prompt_v2, "v2_chain_of_thought"))
+    results.append(run_prompt_variant(orchestration_prompt_v1, "v1_default", cache, similarity))
+    results.append(run_prompt_variant(orchestration_prompt_v2, "v2_chain_of_thought", cache, similarity))
 
     for r in results:
         print(f"Prompt: {r['prompt_name']}")
         for k, v in r["scores"].items():
             print(f"  {k}: {v:.2f}")
         print("-" * 20)
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Prediction cache: {stats['hits']} hits, {stats['misses']} misses ({stats['entries']} entries)")
 
 if __name__ == "__main__":
-    run_all()
+    parser = argparse.ArgumentParser(description="Evaluate the prompt variants on the golden dataset.")
+    parser.add_argument("--cache-dir", type=str, default=EVAL_CACHE_DIR, help="Prediction cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="Call the model for every example")
+    parser.add_argument("--similarity", choices=SIMILARITY_METHODS, default="ratio", help="How response drafts are compared")
+    args = parser.parse_args()
+    engine = None
+    if args.similarity == "embedding":
+        engine = SimilarityEngine("embedding", cache=EmbeddingCache(EVAL_EMBEDDING_CACHE_PATH))
+    run_all(None if args.no_cache else PredictionCache(args.cache_dir), engine)
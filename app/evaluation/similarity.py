@@ -0,0 +1,231 @@
+# app/evaluation/similarity.py
+
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.evaluation.metrics import similarity_score
+
+logger = logging.getLogger(__name__)
+
+# The project's embedding models, tried in order (as in the knowledge base tool).
+EVAL_SIMILARITY_MODELS = os.getenv("EVAL_SIMILARITY_MODELS", "all-MiniLM-L6-v2,all-MiniLM-L12-v2").split(",")
+EVAL_SIMILARITY_BATCH_SIZE = int(os.getenv("EVAL_SIMILARITY_BATCH_SIZE", "256"))
+# SQLite file that keeps embeddings across runs; unset keeps them in memory only.
+EVAL_EMBEDDING_CACHE_PATH = os.getenv("EVAL_EMBEDDING_CACHE_PATH", "")
+
+SIMILARITY_METHODS = ("embedding", "ratio")
+
+
+def _load_model(model_names: List[str]):
+    from sentence_transformers import SentenceTransformer
+
+    for name in model_names:
+        try:
+            return name, SentenceTransformer(name)
+        except Exception as e:
+            logger.warning(f"Failed to load model '{name}': {e}")
+    raise RuntimeError(f"No embedding model could be loaded (tried {', '.join(model_names)}); use the 'ratio' method.")
+
+
+def _model_name(model) -> Optional[str]:
+    """The name or path a SentenceTransformer was loaded from, if it records one."""
+    name = getattr(getattr(model, "model_card_data", None), "base_model", None)
+    if name:
+        return name
+    transformers_model = getattr(model, "transformers_model", None)
+    return getattr(getattr(transformers_model, "config", None), "_name_or_path", None) or None
+
+
+class EmbeddingCache:
+    def __init__(self, path: str = EVAL_EMBEDDING_CACHE_PATH):
+        """
+        Normalized text embeddings keyed by a hash of (model, text), kept in memory and, when
+        `path` is set, in a SQLite file so later runs only encode texts they have not seen.
+
+        Args:
+            path (str): The SQLite file, or "" for memory only.
+        """
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._conn = None
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Return the cached vectors among `keys`."""
+        with self._lock:
+            found = {key: self._vectors[key] for key in keys if key in self._vectors}
+            missing = [key for key in keys if key not in found]
+            if self._conn is not None and missing:
+                # SQLite caps bound parameters per statement.
+                for start in range(0, len(missing), 900):
+                    batch = missing[start:start + 900]
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = self._vectors[key] = np.frombuffer(blob, dtype=np.float32)
+            return found
+
+    def put_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._vectors.update(vectors)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                        [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()],
+                    )
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class SimilarityEngine:
+    def __init__(
+        self,
+        method: str = "embedding",
+        model=None,
+        model_name: Optional[str] = None,
+        cache: Optional[EmbeddingCache] = None,
+        batch_size: int = EVAL_SIMILARITY_BATCH_SIZE,
+    ):
+        """
+        Scores predicted response drafts against references in batches.
+
+        "embedding" encodes every distinct text once with the project's SentenceTransformer (in
+        batches, skipping texts already in the cache), normalizes the vectors, and scores all
+        pairs with a single row-wise dot product, so a run costs one encode per new text rather
+        than a quadratic string comparison per pair. "ratio" is the character-level
+        `similarity_score` (difflib), for comparison with earlier results.
+
+        Args:
+            method (str): "embedding" or "ratio".
+            model: A SentenceTransformer (or anything with a compatible `encode`); loaded from
+                EVAL_SIMILARITY_MODELS on first use if not given.
+            model_name (Optional[str]): The model's name, part of the cache key. Required with a
+                `model` whose name cannot be read from its config, since models sharing a cache
+                key would reuse each other's embeddings.
+            cache (Optional[EmbeddingCache]): Where embeddings are kept; a memory-only cache by default.
+            batch_size (int): Texts per encode call.
+        """
+        if method not in SIMILARITY_METHODS:
+            raise ValueError(f"Unknown similarity method '{method}'; choose from {SIMILARITY_METHODS}.")
+        if model is not None and not model_name:
+            model_name = _model_name(model)
+            if not model_name:
+                raise ValueError("model_name is required when the model's name cannot be read from its config.")
+        self.method = method
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache if cache is not None else EmbeddingCache("")
+        self.batch_size = batch_size
+        self.encoded = 0
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Return unit-normalized embeddings of `texts`, encoding only those not cached."""
+        if self.model is None:
+            self.model_name, self.model = _load_model(EVAL_SIMILARITY_MODELS)
+        keys = [EmbeddingCache.key(self.model_name, text) for text in texts]
+        vectors = self.cache.get_many(list(dict.fromkeys(keys)))
+        missing = list({key: text for key, text in zip(keys, texts) if key not in vectors}.items())
+        if missing:
+            encoded = np.asarray(
+                self.model.encode([text for _, text in missing], batch_size=self.batch_size, convert_to_numpy=True),
+                dtype=np.float32,
+            )
+            encoded /= np.maximum(np.linalg.norm(encoded, axis=1, keepdims=True), 1e-12)
+            new = {key: vector for (key, _), vector in zip(missing, encoded)}
+            self.cache.put_many(new)
+            vectors.update(new)
+            self.encoded += len(missing)
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([vectors[key] for key in keys])
+
+    def scores(self, predicted: Sequence[str], references: Sequence[str]) -> np.ndarray:
+        """
+        Similarity of each predicted text to the reference at the same position.
+
+        Returns:
+            np.ndarray: One score per pair: cosine similarity for "embedding", 0-1 ratio for "ratio".
+        """
+        if len(predicted) != len(references):
+            raise ValueError("predicted and references must have the same length.")
+        if self.method == "ratio":
+            return np.array([similarity_score(a, b) for a, b in zip(predicted, references)], dtype=np.float64)
+        if not predicted:
+            return np.zeros(0, dtype=np.float32)
+        embeddings = self.embed(list(predicted) + list(references))
+        a, b = embeddings[:len(predicted)], embeddings[len(predicted):]
+        return np.einsum("ij,ij->i", a, b)
+
+    def matrix(self, predicted: Sequence[str], references: Sequence[str]) -> np.ndarray:
+        """Cosine similarity of every predicted text to every reference, as one matrix product."""
+        embeddings = self.embed(list(predicted) + list(references))
+        return embeddings[:len(predicted)] @ embeddings[len(predicted):].T
+
+    def score(self, predicted: str, reference: str) -> float:
+        return float(self.scores([predicted], [reference])[0])
+
+
+def benchmark(pairs: int = 100_000, distinct: int = 5_000, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """
+    Measure the throughput of both methods on `pairs` synthetic draft pairs.
+
+    Drafts are drawn from `distinct` texts, as evaluation runs repeat the same references. The
+    embedding method is timed cold (empty cache) and warm (every text cached); it is skipped if
+    no embedding model can be loaded.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Seconds and pairs per second for each method.
+    """
+    rng = np.random.default_rng(seed)
+    words = ("plan pricing enterprise pro analytics support api seats discount trial demo team "
+             "security onboarding contract renewal integration dashboard export billing").split()
+    texts = [" ".join(rng.choice(words, size=rng.integers(12, 30))).capitalize() + "." for _ in range(distinct)]
+    predicted = [texts[i] for i in rng.integers(0, distinct, pairs)]
+    references = [texts[i] for i in rng.integers(0, distinct, pairs)]
+
+    def timed(engine):
+        start = time.perf_counter()
+        engine.scores(predicted, references)
+        seconds = time.perf_counter() - start
+        return {"seconds": round(seconds, 3), "pairs_per_sec": round(pairs / seconds)}
+
+    results = {"ratio": timed(SimilarityEngine("ratio"))}
+    try:
+        engine = SimilarityEngine("embedding")
+        results["embedding_cold"] = timed(engine)
+        results["embedding_warm"] = timed(engine)
+    except RuntimeError as e:
+        logger.warning(f"Skipping the embedding benchmark: {e}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark response similarity methods.")
+    parser.add_argument("--pairs", type=int, default=100_000)
+    parser.add_argument("--distinct", type=int, default=5_000, help="Distinct texts the pairs are drawn from")
+    args = parser.parse_args()
+    for method, result in benchmark(args.pairs, args.distinct).items():
+        print(f"{method}: {result['seconds']}s ({result['pairs_per_sec']} pairs/s)")
@@ -0,0 +1,319 @@
+# app/evaluation/streaming.py
+
+import gc
+import json
+import re
+from fractions import Fraction
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Records scored per NumPy batch; memory use is bounded by this, not by the file size.
+DEFAULT_CHUNK_SIZE = 10_000
+# Characters read from the file at a time when parsing a JSON array.
+READ_BLOCK_SIZE = 1 << 20
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def _iter_json_array(f, block_size: int) -> Iterator[Dict]:
+    # Decode one element at a time from a sliding buffer; an element cut off by the end of the
+    # buffer fails to decode, so read more and try again.
+    decoder = json.JSONDecoder()
+    buf, pos, eof = f.read(block_size), 0, False
+    pos = buf.index("[") + 1
+    while True:
+        pos = _SEPARATORS.match(buf, pos).end()
+        if pos == len(buf):
+            if eof:
+                raise ValueError("Unterminated JSON array.")
+            buf, pos = f.read(block_size), 0
+            eof = not buf
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            record, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = f.read(block_size)
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield record
+        pos = end
+
+
+def iter_records(path: str, block_size: int = READ_BLOCK_SIZE) -> Iterator[Dict]:
+    """
+    Yield the records of a JSON array file or a JSONL file one at a time, without loading the file.
+
+    The format is detected from the first non-blank character: "[" is a JSON array, anything else
+    is read as one JSON object per line. JSONL lines are parsed with orjson when it is installed.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        is_array = _starts_with_array(f)
+        if is_array is None:
+            return
+        if is_array:
+            yield from _iter_json_array(f, block_size)
+        else:
+            loads = orjson.loads if orjson else json.loads
+            for line in f:
+                if line.strip():
+                    yield loads(line)
+
+
+def _starts_with_array(f) -> Optional[bool]:
+    # Whether the file's first non-blank character is "[" (None if it is all blank); rewinds the file.
+    head = f.read(4096).lstrip()
+    while not head:
+        block = f.read(4096)
+        if not block:
+            return None
+        head = block.lstrip()
+    f.seek(0)
+    return head[:1] in ("[", b"[")
+
+
+def iter_chunks(records: Iterable[Dict], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _canonical(item) -> str:
+    # Strings compare as themselves; anything else (e.g. tool call dicts) by its sorted-key JSON,
+    # prefixed so it can never equal a plain string.
+    return item if type(item) is str else "\0" + json.dumps(item, sort_keys=True)
+
+
+def _flatten(lists: List[List]):
+    """Flatten per-example lists into (example index array, items)."""
+    lengths = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+    return np.repeat(np.arange(len(lists), dtype=np.int64), lengths), list(chain.from_iterable(lists))
+
+
+def _encode(lists_a: List[List], lists_b: List[List], canonical: bool = False):
+    """
+    Flatten two columns of per-example item lists into int64 keys `example * vocab + item_id`,
+    so set operations per example become operations on sorted integer arrays.
+    """
+    (ex_a, items_a), (ex_b, items_b) = _flatten(lists_a), _flatten(lists_b)
+    if canonical:
+        items_a, items_b = list(map(_canonical, items_a)), list(map(_canonical, items_b))
+    if not items_a and not items_b:
+        return ex_a, ex_b, 1
+    ids = np.unique(np.array(items_a + items_b, dtype=str), return_inverse=True)[1].reshape(-1)
+    vocab = int(ids.max()) + 1
+    return ex_a * vocab + ids[:len(items_a)], ex_b * vocab + ids[len(items_a):], vocab
+
+
+def set_overlap(lists_a: List[List], lists_b: List[List]):
+    """
+    Per-example set sizes and intersection sizes of two columns of item lists.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: |A|, |B| and |A & B| for each example.
+    """
+    n = len(lists_a)
+    keys_a, keys_b, vocab = _encode(lists_a, lists_b)
+    keys_a, keys_b = np.unique(keys_a), np.unique(keys_b)
+    size_a = np.bincount(keys_a // vocab, minlength=n)
+    size_b = np.bincount(keys_b // vocab, minlength=n)
+    both = np.bincount(np.intersect1d(keys_a, keys_b, assume_unique=True) // vocab, minlength=n)
+    return size_a, size_b, both
+
+
+def multiset_equal(lists_a: List[List], lists_b: List[List]) -> np.ndarray:
+    """Per-example equality of two columns of item lists, ignoring order (like comparing sorted lists)."""
+    keys_a, keys_b, vocab = _encode(lists_a, lists_b, canonical=True)
+    keys, inverse = np.unique(np.concatenate([keys_a, keys_b]), return_inverse=True)
+    weights = np.concatenate([np.ones(len(keys_a)), -np.ones(len(keys_b))])
+    counts = np.bincount(inverse.reshape(-1), weights=weights, minlength=len(keys))
+    equal = np.ones(len(lists_a), dtype=bool)
+    equal[keys[counts != 0] // vocab] = False
+    return equal
+
+
+def _count_ratios(counts: Dict[Tuple[int, int], int], numerators: np.ndarray, denominators: np.ndarray) -> None:
+    if not len(numerators):
+        return
+    ratios, freq = np.unique(np.stack([numerators, denominators], axis=1), axis=0, return_counts=True)
+    for (num, den), count in zip(ratios.tolist(), freq.tolist()):
+        counts[(num, den)] = counts.get((num, den), 0) + count
+
+
+def _exact_mean(counts: Dict[Tuple[int, int], int], total: int) -> float:
+    if not total:
+        return 0
+    return float(sum(count * Fraction(num, den) for (num, den), count in counts.items()) / total)
+
+
+class StreamingEvaluator:
+    def __init__(self, full: bool = False):
+        """
+        Accumulates evaluation metrics over chunks of {"ground_truth", "predicted"} records.
+
+        Each chunk is flattened into label arrays (intents, entities, tools, next steps) and
+        scored with NumPy set operations on integer-encoded keys. Only running totals and the
+        intent confusion matrix are kept between chunks, so memory depends on the chunk size and
+        the number of intents, not on the number of records.
+
+        Per-example values are added to the running sums in record order, so the results equal
+        `evaluate_lite` / `evaluate_full` on the same records exactly.
+
+        Args:
+            full (bool): Also score tools and internal next steps, as `evaluate_full` does.
+        """
+        self.full = full
+        self.total = 0
+        self.response_matches = 0
+        self.tools_correct = 0
+        self.steps_correct = 0
+        self.precision_sum = 0.0
+        self.recall_sum = 0.0
+        # How many examples had each entity precision / recall, as (numerator, denominator).
+        self.precision_counts: Dict[Tuple[int, int], int] = {}
+        self.recall_counts: Dict[Tuple[int, int], int] = {}
+        self.intents: Dict[str, int] = {}
+        self.confusion = np.zeros((0, 0), dtype=np.int64)
+
+    def _intent_ids(self, labels: List[str]) -> np.ndarray:
+        ids = np.fromiter((self.intents.setdefault(label, len(self.intents)) for label in labels), dtype=np.int64, count=len(labels))
+        if len(self.intents) > len(self.confusion):
+            grown = np.zeros((len(self.intents), len(self.intents)), dtype=np.int64)
+            grown[:len(self.confusion), :len(self.confusion)] = self.confusion
+            self.confusion = grown
+        return ids
+
+    @staticmethod
+    def _add_in_order(total: float, values: np.ndarray) -> float:
+        # add.accumulate adds left to right, like the builtin sum, unlike np.sum's pairwise summation.
+        return float(np.add.accumulate(np.concatenate(([total], values)))[-1])
+
+    def update(self, chunk: List[Dict]) -> None:
+        n = len(chunk)
+        gts = [entry["ground_truth"] for entry in chunk]
+        preds = [entry["predicted"] for entry in chunk]
+
+        def column(side, field):
+            return [values.get(field, []) for values in side]
+
+        # Interleaved so intents are numbered in the order records first mention them, however they are chunked.
+        ids = self._intent_ids([label for gt, pred in zip(gts, preds) for label in (gt["intent"], pred["intent"])])
+        true_ids, pred_ids = ids[0::2], ids[1::2]
+        np.add.at(self.confusion, (true_ids, pred_ids), 1)
+
+        true_size, pred_size, overlap = set_overlap(column(gts, "entities"), column(preds, "entities"))
+        both_empty = (true_size == 0) & (pred_size == 0)
+        # An empty prediction scores 0 (0/1), unless the truth is empty too, which scores 1 (1/1).
+        precision_num = np.where(both_empty, 1, np.where(pred_size > 0, overlap, 0))
+        precision_den = np.where(both_empty, 1, np.maximum(pred_size, 1))
+        recall_num = np.where(both_empty, 1, np.where(true_size > 0, overlap, 0))
+        recall_den = np.where(both_empty, 1, np.maximum(true_size, 1))
+        precision, recall = precision_num / precision_den, recall_num / recall_den
+        _count_ratios(self.precision_counts, precision_num, precision_den)
+        _count_ratios(self.recall_counts, recall_num, recall_den)
+        self.precision_sum = self._add_in_order(self.precision_sum, precision)
+        self.recall_sum = self._add_in_order(self.recall_sum, recall)
+
+        self.response_matches += sum(
+            gt.get("suggested_response_draft", "") == pred.get("suggested_response_draft", "") for gt, pred in zip(gts, preds)
+        )
+        if self.full:
+            self.tools_correct += int(multiset_equal(column(gts, "tools_to_call"), column(preds, "tools_to_call")).sum())
+            self.steps_correct += int(multiset_equal(column(gts, "internal_next_steps"), column(preds, "internal_next_steps")).sum())
+        self.total += n
+
+    def merge(self, other: "StreamingEvaluator") -> None:
+        """
+        Add the totals of an evaluator that scored other records (e.g. a later chunk on another
+        process). Intents are matched by label, keeping first-seen order.
+        """
+        self.total += other.total
+        self.response_matches += other.response_matches
+        self.tools_correct += other.tools_correct
+        self.steps_correct += other.steps_correct
+        self.precision_sum += other.precision_sum
+        self.recall_sum += other.recall_sum
+        for counts, more in ((self.precision_counts, other.precision_counts), (self.recall_counts, other.recall_counts)):
+            for ratio, count in more.items():
+                counts[ratio] = counts.get(ratio, 0) + count
+        ids = self._intent_ids(list(other.intents))
+        self.confusion[np.ix_(ids, ids)] += other.confusion
+
+    def result(self, exact: bool = False) -> Dict:
+        """
+        Return the metrics of `evaluate_lite` (and `evaluate_full`), plus the averaged entity
+        precision and recall, the record count and the intent confusion matrix
+        (rows are true intents, columns predicted ones).
+
+        Args:
+            exact (bool): Average entity precision and recall from the per-ratio counts, which
+                gives the correctly rounded mean whatever the chunking or merge order, instead of
+                the running sums (equal to `evaluate_lite` bit for bit, but only without `merge`).
+        """
+        total = self.total
+        if exact:
+            avg_prec = _exact_mean(self.precision_counts, total)
+            avg_rec = _exact_mean(self.recall_counts, total)
+        else:
+            avg_prec = self.precision_sum / total if total else 0
+            avg_rec = self.recall_sum / total if total else 0
+        result = {
+            "intent_accuracy": int(np.trace(self.confusion)) / total if total else 0.0,
+            "entity_f1_score": 2 * avg_prec * avg_rec / (avg_prec + avg_rec) if avg_prec + avg_rec > 0 else 0.0,
+            "response_match_accuracy": self.response_matches / total if total else 0.0,
+        }
+        if self.full:
+            result["tools_accuracy"] = self.tools_correct / total if total else 0.0
+            result["steps_accuracy"] = self.steps_correct / total if total else 0.0
+        result.update({
+            "num_examples": total,
+            "entity_precision": avg_prec,
+            "entity_recall": avg_rec,
+            "intent_confusion": {"labels": list(self.intents), "matrix": self.confusion.tolist()},
+        })
+        return result
+
+
+def evaluate_stream(
+    source: Union[str, Iterable[Dict]], mode: str = "lite", chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Dict:
+    """
+    Evaluate a predictions file (JSON array or JSONL) or an iterable of records in chunks.
+
+    Args:
+        source (Union[str, Iterable[Dict]]): A file path or the records themselves.
+        mode (str): "lite" for the `evaluate_lite` metrics, "full" to add tools and next steps.
+        chunk_size (int): Records scored per batch.
+
+    Returns:
+        Dict: See `StreamingEvaluator.result`.
+    """
+    records = iter_records(source) if isinstance(source, str) else source
+    evaluator = StreamingEvaluator(full=(mode == "full"))
+    # Parsed records are acyclic and freed by reference counting, but holding a chunk of them
+    # makes the cyclic collector rescan every live dict over and over; pause it for the run.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for chunk in iter_chunks(records, chunk_size):
+            evaluator.update(chunk)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return evaluator.result()
@@ -0,0 +1,129 @@
+import json
+import re
+from typing import Any, List, Tuple
+
+_FENCE_RE = re.compile(r"```[a-zA-Z]*\s*(.*?)(?:```|$)", re.DOTALL)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONRepairError(ValueError):
+    """Raised when no JSON value can be recovered from an LLM completion."""
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a pipeline stage keeps returning output that fails schema validation."""
+
+
+def parse_llm_json(text: str) -> Tuple[Any, bool]:
+    """
+    Parse the JSON object returned by an LLM, repairing common formatting mistakes.
+
+    The strict `json.loads` path is tried first so well-formed completions cost nothing extra.
+    If it fails, the following repairs are applied:
+
+    - Markdown code fences (```json ... ```) are stripped.
+    - Prose before the first `{`/`[` and after the matching closing bracket is dropped.
+    - Trailing commas before `}` or `]` are removed.
+    - Truncated output is closed: an open string is terminated, a dangling key or
+      partial value is cut back to the last complete member, and open brackets are closed.
+
+    Args:
+        text (str): The raw completion content.
+
+    Returns:
+        Tuple[Any, bool]: The parsed value, and whether any repair was needed.
+
+    Raises:
+        JSONRepairError: If the text contains no recoverable JSON value.
+    """
+    if not text or not text.strip():
+        raise JSONRepairError("Empty completion.")
+
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+
+    fenced = _FENCE_RE.search(text)
+    candidate = fenced.group(1) if fenced else text
+
+    for repaired in _repair_candidates(candidate):
+        try:
+            return json.loads(repaired), True
+        except json.JSONDecodeError:
+            continue
+
+    raise JSONRepairError(f"Could not recover JSON from completion: {text[:200]!r}")
+
+
+def _repair_candidates(text: str) -> List[str]:
+    """
+    Scan `text` once and return repaired candidates to try, most faithful first.
+
+    The scan copies the first JSON value found, skipping trailing commas, and records the
+    bracket stack at every comma and opening bracket outside a string so truncated output
+    can be cut back to the last complete member.
+    """
+    start = next((i for i, ch in enumerate(text) if ch in _CLOSERS), None)
+    if start is None:
+        return []
+
+    out: List[str] = []
+    stack: List[str] = []
+    cut_points: List[Tuple[int, List[str]]] = []
+    in_string = False
+    escaped = False
+
+    for ch in text[start:]:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(ch)
+            out.append(ch)
+            cut_points.append((len(out), list(stack)))
+            continue
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                return ["".join(out)]
+            continue
+        elif ch == ",":
+            cut_points.append((len(out), list(stack)))
+        out.append(ch)
+
+    # Reached the end of the text with brackets still open: the completion was truncated.
+    candidates = []
+    body = "".join(out)
+    if in_string:
+        body = body[:-1] if escaped else body
+        body += '"'
+    candidates.append(_close(body, stack))
+    for position, cut_stack in reversed(cut_points[-3:]):
+        candidates.append(_close("".join(out[:position]), cut_stack))
+    return candidates
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i]
+
+
+def _close(body: str, stack: List[str]) -> str:
+    body = body.rstrip().rstrip(",")
+    return body + "".join(_CLOSERS[opener] for opener in reversed(stack))
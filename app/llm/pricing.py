@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# USD per 1M tokens as (prompt, completion, cached prompt). Override with a JSON file via LLM_PRICE_TABLE.
+DEFAULT_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4": (30.0, 60.0, 30.0),
+    "gpt-4-turbo": (10.0, 30.0, 10.0),
+    "gpt-4o": (2.5, 10.0, 1.25),
+    "gpt-4o-mini": (0.15, 0.6, 0.075),
+    "gpt-4.1": (2.0, 8.0, 0.5),
+    "gpt-4.1-mini": (0.4, 1.6, 0.1),
+    "gpt-3.5-turbo": (0.5, 1.5, 0.5),
+}
+
+
+def load_price_table(path: Optional[str] = None) -> Dict[str, Tuple[float, float, float]]:
+    """
+    Load the model price table, merging any overrides from a JSON file into the defaults.
+
+    The file maps model names to `[prompt_price, completion_price]` or
+    `[prompt_price, completion_price, cached_prompt_price]` in USD per 1M tokens. Without a
+    cached price, cached prompt tokens cost the same as other prompt tokens.
+
+    Args:
+        path (Optional[str]): The JSON file to read. Defaults to the LLM_PRICE_TABLE environment variable.
+
+    Returns:
+        Dict[str, Tuple[float, float, float]]: The merged price table.
+    """
+    prices = dict(DEFAULT_PRICES)
+    path = path or os.getenv("LLM_PRICE_TABLE")
+    if not path:
+        return prices
+
+    try:
+        with open(path, "r") as f:
+            overrides = json.load(f)
+        prices.update({model: (values[0], values[1], values[2] if len(values) > 2 else values[0])
+                       for model, values in overrides.items()})
+    except (OSError, json.JSONDecodeError, TypeError) as e:
+        logger.error(f"Failed to load price table '{path}': {e}")
+    return prices
+
+
+PRICES = load_price_table()
+
+
+def model_prices(model: str) -> Optional[Tuple[float, float, float]]:
+    """
+    Look up the prices for a model, matching dated snapshots (e.g. "gpt-4o-2024-08-06")
+    by the longest known name they start with.
+    """
+    if model in PRICES:
+        return PRICES[model]
+    matches = [name for name in PRICES if model.startswith(name)]
+    return PRICES[max(matches, key=len)] if matches else None
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """
+    Compute the USD cost of a completion.
+
+    Args:
+        model (str): The model name.
+        prompt_tokens (int): Prompt tokens billed, including cached ones.
+        completion_tokens (int): Completion tokens billed.
+        cached_tokens (int): How many of the prompt tokens were served from the prompt cache.
+
+    Returns:
+        float: The cost in USD, or 0.0 for models missing from the price table.
+    """
+    prices = model_prices(model)
+    if not prices:
+        return 0.0
+    prompt_price, completion_price, cached_price = prices
+    uncached = prompt_tokens - cached_tokens
+    return (uncached * prompt_price + cached_tokens * cached_price + completion_tokens * completion_price) / 1_000_000
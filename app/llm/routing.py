@@ -0,0 +1,139 @@
+import os
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from app.models.schemas import AnalysisResult, ProcessMessageRequest
+from app.monitoring.metrics import counter
+
+route_decisions_total = counter(
+    "llm_route_decisions_total",
+    "Model routing decisions per stage, tier and the rule that decided.",
+    ("stage", "tier", "reason"),
+)
+route_escalations_total = counter(
+    "llm_route_escalations_total",
+    "Escalations from the small to the large model per stage and cause.",
+    ("stage", "reason"),
+)
+
+
+@dataclass(frozen=True)
+class Route:
+    tier: str
+    model: str
+    reason: str
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        small_model: Optional[str],
+        large_model: str,
+        max_small_chars: int = 400,
+        min_confidence: float = 0.7,
+        high_value_lead_score: int = 80,
+        large_intents: Iterable[str] = ("objection",),
+    ):
+        """
+        Picks the model for each pipeline stage from simple per-request rules.
+
+        Analysis goes to the small model unless the message (plus history) is long. Synthesis
+        goes to the small model unless the analysis confidence is low, the prospect's CRM lead
+        score is high, or the intent is one that needs careful handling. A stage routed to the
+        small model is escalated to the large one when its output fails validation or, for the
+        analysis stage, comes back with low confidence.
+
+        Without a small model configured every route resolves to the large model, which keeps
+        the single-model behaviour.
+
+        Args:
+            small_model (Optional[str]): The cheap model, or None to disable routing.
+            large_model (str): The default, most capable model.
+            max_small_chars (int): The longest input (in characters) analysed by the small model.
+            min_confidence (float): Analyses below this confidence are escalated and synthesised by the large model.
+            high_value_lead_score (int): Prospects at or above this CRM lead score get the large model for synthesis.
+            large_intents (Iterable[str]): Intents always synthesised by the large model.
+        """
+        self.small_model = small_model or large_model
+        self.large_model = large_model
+        self.max_small_chars = max_small_chars
+        self.min_confidence = min_confidence
+        self.high_value_lead_score = high_value_lead_score
+        self.large_intents = set(large_intents)
+
+    @classmethod
+    def from_env(cls, large_model: str) -> "ModelRouter":
+        """Build a router from the LLM_ROUTE_* / OPENAI_SMALL_MODEL environment variables."""
+        return cls(
+            small_model=os.getenv("OPENAI_SMALL_MODEL"),
+            large_model=large_model,
+            max_small_chars=int(os.getenv("LLM_ROUTE_MAX_SMALL_CHARS", "400")),
+            min_confidence=float(os.getenv("LLM_ROUTE_MIN_CONFIDENCE", "0.7")),
+            high_value_lead_score=int(os.getenv("LLM_ROUTE_HIGH_VALUE_LEAD_SCORE", "80")),
+            large_intents=[i for i in os.getenv("LLM_ROUTE_LARGE_INTENTS", "objection").split(",") if i],
+        )
+
+    @classmethod
+    def fixed(cls, model: str) -> "ModelRouter":
+        """A router that always returns `model`; used for baselines and offline comparisons."""
+        return cls(small_model=None, large_model=model)
+
+    @property
+    def enabled(self) -> bool:
+        return self.small_model != self.large_model
+
+    def _route(self, stage: str, tier: str, reason: str) -> Route:
+        if not self.enabled:
+            tier, reason = "large", "single_model"
+        route_decisions_total.inc(stage=stage, tier=tier, reason=reason)
+        model = self.small_model if tier == "small" else self.large_model
+        return Route(tier=tier, model=model, reason=reason)
+
+    def route_analysis(self, request: ProcessMessageRequest, input_chars: int) -> Route:
+        """
+        Route the analysis stage.
+
+        Args:
+            request (ProcessMessageRequest): The incoming request.
+            input_chars (int): The length of the formatted history plus the current message.
+
+        Returns:
+            Route: The model to use and why.
+        """
+        if input_chars > self.max_small_chars:
+            return self._route("analyze", "large", "long_input")
+        return self._route("analyze", "small", "default")
+
+    def route_synthesis(self, analysis: AnalysisResult, crm_data: Optional[dict]) -> Route:
+        """
+        Route the synthesis stage.
+
+        Args:
+            analysis (AnalysisResult): The analysis of the current message.
+            crm_data (Optional[dict]): The prospect's CRM record, if one was fetched.
+
+        Returns:
+            Route: The model to use and why.
+        """
+        if analysis.confidence < self.min_confidence:
+            return self._route("synthesize", "large", "low_confidence")
+        lead_score = (crm_data or {}).get("lead_score")
+        if isinstance(lead_score, (int, float)) and lead_score >= self.high_value_lead_score:
+            return self._route("synthesize", "large", "high_value_lead")
+        if analysis.intent in self.large_intents:
+            return self._route("synthesize", "large", "intent")
+        return self._route("synthesize", "small", "default")
+
+    def escalate(self, stage: str, route: Route, reason: str) -> Optional[Route]:
+        """
+        Return the large-model route to retry a stage with, or None if `route` already uses it.
+
+        Args:
+            stage (str): The stage being escalated.
+            route (Route): The route whose output was rejected.
+            reason (str): Why it was rejected, e.g. "invalid_output" or "low_confidence".
+        """
+        if route.tier != "small" or not self.enabled:
+            return None
+        route_escalations_total.inc(stage=stage, reason=reason)
+        return Route(tier="large", model=self.large_model, reason=f"escalated_{reason}")
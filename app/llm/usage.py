@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+
+@dataclass
+class LLMCallUsage:
+    stage: str
+    model: str
+    tier: str
+    prompt_version: str
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    cost_usd: float
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+@dataclass
+class UsageTotals:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    cost_usd: float = 0.0
+    calls: List[LLMCallUsage] = field(default_factory=list)
+    tenant: Optional[str] = None
+    parent: Optional["UsageTotals"] = field(default=None, repr=False)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, call: LLMCallUsage) -> None:
+        self.prompt_tokens += call.prompt_tokens
+        self.completion_tokens += call.completion_tokens
+        self.cached_tokens += call.cached_tokens
+        self.cost_usd += call.cost_usd
+        self.calls.append(call)
+
+    def by_stage(self) -> Dict[str, Dict[str, float]]:
+        """Return the token and cost totals of each stage."""
+        stages: Dict[str, Dict[str, float]] = {}
+        for call in self.calls:
+            totals = stages.setdefault(call.stage, {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "cost_usd": 0.0})
+            totals["prompt_tokens"] += call.prompt_tokens
+            totals["completion_tokens"] += call.completion_tokens
+            totals["cached_tokens"] += call.cached_tokens
+            totals["cost_usd"] += call.cost_usd
+        return stages
+
+
+_current_usage: ContextVar[Optional[UsageTotals]] = ContextVar("current_usage", default=None)
+
+
+@contextmanager
+def track_usage(tenant: Optional[str] = None) -> Iterator[UsageTotals]:
+    """
+    Collect the token usage of every LLM call made inside the `with` block.
+
+    The totals live in a context variable, so concurrent requests each see only their own
+    calls, including calls made from tasks started inside the block. Blocks nest: a call is
+    counted in the innermost block and every enclosing one.
+
+    Args:
+        tenant (Optional[str]): The tenant the usage belongs to; inner blocks inherit it.
+
+    Yields:
+        UsageTotals: The running totals for the block.
+    """
+    parent = _current_usage.get()
+    totals = UsageTotals(tenant=tenant or (parent.tenant if parent else None), parent=parent)
+    token = _current_usage.set(totals)
+    try:
+        yield totals
+    finally:
+        _current_usage.reset(token)
+
+
+def current_tenant() -> Optional[str]:
+    """Return the tenant of the enclosing `track_usage` block, if any."""
+    totals = _current_usage.get()
+    return totals.tenant if totals else None
+
+
+def record_usage(call: LLMCallUsage) -> None:
+    """Add one LLM call's usage to the enclosing `track_usage` blocks, if any."""
+    totals = _current_usage.get()
+    while totals is not None:
+        totals.add(call)
+        totals = totals.parent
@@ -1,17 +1,331 @@
+import argparse
+import atexit
+import gzip
 import json
+import logging
+import os
+import queue
+import random
+import shutil
+import statistics
+import threading
+import time
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.monitoring.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+# Records are written in batches of up to EVENT_LOG_BATCH_SIZE, or after EVENT_LOG_FLUSH_MS at the latest.
+EVENT_LOG_BATCH_SIZE = int(os.getenv("EVENT_LOG_BATCH_SIZE", "512"))
+EVENT_LOG_FLUSH_S = float(os.getenv("EVENT_LOG_FLUSH_MS", "500")) / 1000
+# Records beyond this many waiting to be written are dropped rather than blocking requests.
+EVENT_LOG_MAX_QUEUE = int(os.getenv("EVENT_LOG_MAX_QUEUE", "100000"))
+# The log is rotated when it would exceed EVENT_LOG_MAX_BYTES or is older than EVENT_LOG_ROTATE_INTERVAL_S (0 disables either).
+EVENT_LOG_MAX_BYTES = int(os.getenv("EVENT_LOG_MAX_BYTES", str(100 * 1024 * 1024)))
+EVENT_LOG_ROTATE_INTERVAL_S = float(os.getenv("EVENT_LOG_ROTATE_INTERVAL_S", "86400"))
+# How many compressed archives to keep (0 keeps all).
+EVENT_LOG_BACKUP_COUNT = int(os.getenv("EVENT_LOG_BACKUP_COUNT", "30"))
+# Fraction of events kept; sampled records carry a `sample_rate` field so aggregates can be re-weighted.
+EVENT_LOG_SAMPLE_RATE = float(os.getenv("EVENT_LOG_SAMPLE_RATE", "1.0"))
+# Only these (high-volume) event types are sampled; every other event is always kept.
+EVENT_LOG_SAMPLED_EVENTS = tuple(e for e in os.getenv("EVENT_LOG_SAMPLED_EVENTS", "process").split(",") if e)
+
+event_log_records_total = counter(
+    "event_log_records_total",
+    "Event log records by outcome (written, sampled_out, dropped).",
+    ("outcome",),
+)
+event_log_queue_depth = gauge("event_log_queue_depth", "Event log records waiting to be written.")
+
+_STOP = object()
+
+
+class EventLogger:
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = EVENT_LOG_BATCH_SIZE,
+        flush_interval_s: float = EVENT_LOG_FLUSH_S,
+        max_queue: int = EVENT_LOG_MAX_QUEUE,
+        max_bytes: int = EVENT_LOG_MAX_BYTES,
+        rotate_interval_s: float = EVENT_LOG_ROTATE_INTERVAL_S,
+        backup_count: int = EVENT_LOG_BACKUP_COUNT,
+        sample_rate: float = EVENT_LOG_SAMPLE_RATE,
+        sampled_events: Tuple[str, ...] = EVENT_LOG_SAMPLED_EVENTS,
+    ):
+        """
+        A JSON lines event log written by a background thread.
+
+        `log` only timestamps and enqueues the record, so request handlers never block on file
+        I/O. The writer thread serializes records and appends them in batches, keeping the file
+        open between batches. When the file would exceed `max_bytes` or is older than
+        `rotate_interval_s`, it is renamed to `<path>.<UTC timestamp>` and gzip-compressed in the
+        background, keeping the newest `backup_count` archives.
+
+        Args:
+            path (str): The log file.
+            batch_size (int): Records written per batch at most.
+            flush_interval_s (float): How long a record may wait for its batch to fill.
+            max_queue (int): Records allowed to wait; more are dropped and counted.
+            max_bytes (int): Rotate before the file would exceed this size (0 disables).
+            rotate_interval_s (float): Rotate files older than this (0 disables).
+            backup_count (int): Compressed archives to keep (0 keeps all).
+            sample_rate (float): Fraction of `sampled_events` records to keep.
+            sampled_events (Tuple[str, ...]): The `event` types subject to sampling; others are always kept.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_bytes = max_bytes
+        self.rotate_interval_s = rotate_interval_s
+        self.backup_count = backup_count
+        self.sample_rate = sample_rate
+        self.sampled_events = frozenset(sampled_events)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._compressors: List[threading.Thread] = []
+
+    def log(self, data: dict) -> bool:
+        """
+        Queue one event. The caller's dict is not modified.
+
+        Returns:
+            bool: Whether the event was queued (False if sampled out or the queue is full).
+        """
+        sampled = self.sample_rate < 1.0 and data.get("event") in self.sampled_events
+        if sampled and random.random() >= self.sample_rate:
+            event_log_records_total.inc(outcome="sampled_out")
+            return False
+
+        record = dict(data)
+        record["timestamp"] = datetime.utcnow().isoformat()
+        if sampled:
+            record["sample_rate"] = self.sample_rate
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            event_log_records_total.inc(outcome="dropped")
+            return False
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until every event queued so far is written. Returns False on timeout."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Write everything still queued, close the file and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+        for compressor in self._compressors:
+            compressor.join(timeout)
+        self._compressors = []
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"event-log:{self.path}", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch, markers, stop = [], [], False
+            deadline = time.monotonic() + self.flush_interval_s
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+                # Flush requests and shutdown write what is queued right away; otherwise wait for a full batch.
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait() if markers else self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self._write(batch)
+                except OSError as e:
+                    # Never let a full disk or permission problem kill the writer thread.
+                    logger.error(f"Event log write to '{self.path}' failed: {e}")
+            event_log_queue_depth.set(self._queue.qsize())
+            for marker in markers:
+                marker.set()
+            if stop:
+                self._close_file()
+                return
+
+    def _write(self, batch: List[dict]) -> None:
+        data = "".join(json.dumps(record, default=str) + "\n" for record in batch).encode("utf-8")
+        if self._file is None:
+            self._open()
+        if self._should_rotate(len(data)):
+            self._rotate()
+            self._open()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+        event_log_records_total.inc(len(batch), outcome="written")
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        self._opened_at = os.path.getmtime(self.path) if self._size else time.time()
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _should_rotate(self, incoming: int) -> bool:
+        if not self._size:
+            return False
+        if self.max_bytes and self._size + incoming > self.max_bytes:
+            return True
+        return bool(self.rotate_interval_s) and time.time() - self._opened_at >= self.rotate_interval_s
+
+    def _rotate(self) -> None:
+        self._close_file()
+        archive = f"{self.path}.{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}"
+        os.replace(self.path, archive)
+        compressor = threading.Thread(target=self._compress, args=(archive,), daemon=True)
+        compressor.start()
+        self._compressors = [t for t in self._compressors if t.is_alive()] + [compressor]
+
+    def _compress(self, archive: str) -> None:
+        with open(archive, "rb") as src, gzip.open(archive + ".gz.tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(archive + ".gz.tmp", archive + ".gz")
+        os.remove(archive)
+        if self.backup_count:
+            for old in rotated_files(self.path)[:-self.backup_count]:
+                os.remove(old)
+
+
+def rotated_files(path: str) -> List[str]:
+    """Return the compressed archives of an event log, oldest first."""
+    directory, name = os.path.split(path)
+    directory = directory or "."
+    if not os.path.isdir(directory):
+        return []
+    archives = [f for f in os.listdir(directory) if f.startswith(name + ".") and f.endswith(".gz")]
+    return [os.path.join(directory, f) for f in sorted(archives)]
+
+
+_loggers: Dict[str, EventLogger] = {}
+_loggers_lock = threading.Lock()
+
+
+def get_event_logger(path: str = "logs/events.jsonl") -> EventLogger:
+    """Return the shared EventLogger for a path, creating it on first use."""
+    event_logger = _loggers.get(path)
+    if event_logger is None:
+        with _loggers_lock:
+            event_logger = _loggers.setdefault(path, EventLogger(path))
+    return event_logger
+
 
 def log_event(data: dict, path="logs/events.jsonl"):
     """
-    Logs an event by appending the provided data to a JSON lines file.
+    Logs an event by queueing it for the background writer of a JSON lines file.
 
     Args:
-        data (dict): The event data to be logged. A timestamp will be added to this data.
+        data (dict): The event data to be logged. A copy is timestamped; the dict itself is not modified.
         path (str, optional): The file path where the event should be logged. Defaults to "logs/events.jsonl".
 
-    The function adds a UTC timestamp to the data and writes it to the specified file in JSON lines format.
+    The record is written within EVENT_LOG_FLUSH_MS, or on `flush_event_logs`/`close_event_logs`.
     """
+    get_event_logger(path).log(data)
+
+
+def flush_event_logs(timeout: float = 10.0) -> None:
+    """Block until every queued event of every log is written."""
+    for event_logger in list(_loggers.values()):
+        event_logger.flush(timeout)
+
 
+def close_event_logs(timeout: float = 10.0) -> None:
+    """Write all queued events and stop the writer threads. Called on app shutdown and at exit."""
+    with _loggers_lock:
+        loggers = list(_loggers.values())
+        _loggers.clear()
+    for event_logger in loggers:
+        event_logger.close(timeout)
+
+
+atexit.register(close_event_logs)
+
+
+def _legacy_log_event(data: dict, path: str) -> None:
+    # The previous implementation: open, append one line and close on every call.
     data["timestamp"] = datetime.utcnow().isoformat()
     with open(path, "a") as f:
-        f.write(json.dumps(data) + "\n")
\ No newline at end of file
+        f.write(json.dumps(data) + "\n")
+
+
+def benchmark(events: int = 20000, directory: str = "logs/benchmark") -> Dict[str, Dict[str, float]]:
+    """
+    Compare the latency added to the caller and the end-to-end throughput of the legacy
+    synchronous writer and the background writer.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Per writer, p50/p99 microseconds per call and events/sec
+        until everything is on disk.
+    """
+    os.makedirs(directory, exist_ok=True)
+    event = {"event": "process", "intent": "inquiry", "confidence_score": 0.9, "latency_ms": 1234.5,
+             "stages": {"analyze": 600.1, "synthesize": 630.2}, "prompt_tokens": 812, "completion_tokens": 143}
+    results = {}
+    for name in ("legacy", "background"):
+        path = os.path.join(directory, f"{name}.jsonl")
+        if os.path.exists(path):
+            os.remove(path)
+        event_logger = EventLogger(path, max_bytes=0, rotate_interval_s=0, max_queue=events + 1)
+        timings = []
+        start = time.perf_counter()
+        for _ in range(events):
+            t0 = time.perf_counter()
+            if name == "legacy":
+                _legacy_log_event(dict(event), path)
+            else:
+                event_logger.log(event)
+            timings.append(time.perf_counter() - t0)
+        event_logger.close()
+        elapsed = time.perf_counter() - start
+        timings.sort()
+        results[name] = {
+            "p50_us": round(statistics.median(timings) * 1e6, 2),
+            "p99_us": round(timings[int(len(timings) * 0.99) - 1] * 1e6, 2),
+            "events_per_sec": round(events / elapsed),
+        }
+        os.remove(path)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the event log writers.")
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+    for name, row in benchmark(args.events).items():
+        print(f"{name:>10}: p50 {row['p50_us']}us  p99 {row['p99_us']}us  {row['events_per_sec']} events/sec")
@@ -1,11 +1,44 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api.routes import router
+from app.api.routes import router, job_queue, job_workers, kpi_ingester, kpi_store, session_store
+from app.api.admin import router as admin_router, ADMIN_TOKEN
+from app.api.middleware import ProfilingMiddleware, TracingMiddleware
+from app.monitoring.memory import accounting, format_report
+from app.monitoring.profiling import PROFILING_ENABLED
+from app.logging.logger import close_event_logs
 from fastapi.middleware.cors import CORSMiddleware
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Log the startup memory report, open the job queue and KPI store and start the background job
+    workers and KPI ingester with the app; on shutdown stop them, requeue interrupted jobs, persist
+    sessions, flush the event log and ingest its last events.
+    """
+    logger.info(format_report(accounting.report()))
+    await asyncio.to_thread(job_queue.open)
+    await asyncio.to_thread(kpi_store.open)
+    job_workers.start()
+    kpi_ingester.start()
+    yield
+    await job_workers.stop()
+    await asyncio.to_thread(job_queue.close)
+    session_store.close()
+    close_event_logs()
+    await kpi_ingester.stop()
+    await asyncio.to_thread(kpi_store.close)
+
+
 app = FastAPI(
     title="LLM Sales Agent",
     description="AI-powered assistant for analyzing and responding to sales messages",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS for local testing
@@ -16,5 +49,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(TracingMiddleware)
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, admin_token=ADMIN_TOKEN)
 
 app.include_router(router)
+app.include_router(admin_router)
@@ -15,11 +15,42 @@ class ProcessMessageRequest(BaseModel):
     prospect_id: Optional[str] = None
 
 
+class ProcessMessagesRequest(BaseModel):
+    items: List[ProcessMessageRequest]
+    max_concurrency: Optional[int] = None
+
+
+class CreateSessionRequest(BaseModel):
+    conversation_id: Optional[str] = None
+    prospect_id: Optional[str] = None
+    conversation_history: List[Message] = []
+
+
+class SessionMessageRequest(BaseModel):
+    new_messages: List[Message] = []
+    current_prospect_message: str
+    timestamp: Optional[datetime] = None
+
+
+class SessionResponse(BaseModel):
+    conversation_id: str
+    prospect_id: Optional[str] = None
+    message_count: int
+
+
+class LLMUsage(BaseModel):
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int = 0
+    cost_usd: float
+
+
 class ToolUsageLogEntry(BaseModel):
     tool_name: str
     function: str
     input: dict
     output_summary: str
+    usage: Optional[LLMUsage] = None
 
 
 class InternalAction(BaseModel):
@@ -36,6 +67,12 @@ class AnalysisResult(BaseModel):
     confidence: float
 
 
+class SynthesisResult(BaseModel):
+    response: str
+    next_steps: List[InternalAction]
+    reasoning_trace: Optional[str] = ""
+
+
 class ProcessMessageResponse(BaseModel):
     detailed_analysis: AnalysisResult
     suggested_response_draft: str
@@ -43,3 +80,18 @@ class ProcessMessageResponse(BaseModel):
     tool_usage_log: List[ToolUsageLogEntry]
     confidence_score: float
     reasoning_trace: Optional[str] = None
+
+
+class JobSubmitRequest(BaseModel):
+    request: ProcessMessageRequest
+    priority: int = 0
+    idempotency_key: Optional[str] = None
+    callback_url: Optional[str] = None
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    attempts: int
+    result: Optional[ProcessMessageResponse] = None
+    error: Optional[str] = None
@@ -1,3 +1,16 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.monitoring.sketches import QuantileSketch
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
 def track_kpis(logged_events: list) -> dict:
     """
     Calculates key performance indicators from a list of logged events.
@@ -12,15 +25,314 @@ def track_kpis(logged_events: list) -> dict:
             - 'tool_error_rate': The proportion of events that have a tool error.
             - 'avg_latency': The average latency in milliseconds across all events.
             - 'flag_rate': The proportion of events flagged for human review.
+
+    For logs too large to hold in memory, or for percentiles, use KPIAggregator.
     """
 
     total = len(logged_events)
     if total == 0:
         return {}
 
+    confidence = latency = tool_errors = flags = 0
+    for e in logged_events:
+        confidence += e.get("confidence_score", 0)
+        latency += e.get("latency_ms", 0)
+        tool_errors += 1 if e.get("tool_error") else 0
+        flags += 1 if e.get("action") == "FLAG_FOR_HUMAN_REVIEW" else 0
+
     return {
-        "avg_confidence": sum(e.get("confidence_score", 0) for e in logged_events) / total,
-        "tool_error_rate": sum(1 for e in logged_events if e.get("tool_error")) / total,
-        "avg_latency": sum(e.get("latency_ms", 0) for e in logged_events) / total,
-        "flag_rate": sum(1 for e in logged_events if e.get("action") == "FLAG_FOR_HUMAN_REVIEW") / total
-    }
\ No newline at end of file
+        "avg_confidence": confidence / total,
+        "tool_error_rate": tool_errors / total,
+        "avg_latency": latency / total,
+        "flag_rate": flags / total
+    }
+
+
+def _event_time(event: Dict) -> Optional[float]:
+    timestamp = event.get("timestamp")
+    if not timestamp:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+class KPIAggregator:
+    def __init__(self, window_s: int = 60, max_windows: int = 1440, relative_accuracy: float = 0.01):
+        """
+        Streaming KPIs over processed-message events in constant memory.
+
+        Latency and confidence go into mergeable quantile sketches; tool error and human-review
+        flag counts are kept overall and per fixed time window, keeping only the newest
+        `max_windows` windows. Events logged with a `sample_rate` are weighted by its inverse, so
+        sampled logs still give unbiased rates and percentiles. Aggregators built from different
+        files or workers combine exactly with `merge`.
+
+        Args:
+            window_s (int): The width of a rate window in seconds.
+            max_windows (int): How many windows to keep.
+            relative_accuracy (float): Relative error bound of the percentile sketches.
+        """
+        self.window_s = window_s
+        self.max_windows = max_windows
+        self.latency_ms = QuantileSketch(relative_accuracy)
+        self.confidence = QuantileSketch(relative_accuracy)
+        self.events = 0.0
+        self.tool_errors = 0.0
+        self.flags = 0.0
+        # window start (epoch seconds) -> [events, tool errors, flags]
+        self.windows: Dict[int, List[float]] = {}
+
+    def add(self, event: Dict) -> None:
+        """Add one event (typically a "process" event from the event log)."""
+        weight = 1.0 / event.get("sample_rate", 1.0)
+        tool_error = weight if event.get("tool_error") else 0.0
+        flag = weight if event.get("action") == "FLAG_FOR_HUMAN_REVIEW" else 0.0
+        self.events += weight
+        self.tool_errors += tool_error
+        self.flags += flag
+        if "latency_ms" in event:
+            self.latency_ms.add(event["latency_ms"], weight)
+        if "confidence_score" in event:
+            self.confidence.add(event["confidence_score"], weight)
+
+        event_time = _event_time(event)
+        if event_time is not None:
+            self._add_to_window(int(event_time // self.window_s * self.window_s), [weight, tool_error, flag])
+
+    def _add_to_window(self, start: int, counts: List[float]) -> None:
+        window = self.windows.get(start)
+        if window is None:
+            if len(self.windows) >= self.max_windows and start < min(self.windows):
+                return
+            window = self.windows[start] = [0.0, 0.0, 0.0]
+            while len(self.windows) > self.max_windows:
+                del self.windows[min(self.windows)]
+        for i, value in enumerate(counts):
+            window[i] += value
+
+    def merge(self, other: "KPIAggregator") -> None:
+        """Fold another aggregator's events into this one."""
+        if other.window_s != self.window_s:
+            raise ValueError("Cannot merge aggregators with different window sizes.")
+        self.latency_ms.merge(other.latency_ms)
+        self.confidence.merge(other.confidence)
+        self.events += other.events
+        self.tool_errors += other.tool_errors
+        self.flags += other.flags
+        for start, counts in other.windows.items():
+            self._add_to_window(start, counts)
+
+    def summary(self, last_windows: Optional[int] = None) -> Dict:
+        """
+        Return the KPIs: totals and rates, latency and confidence percentiles, and per-window rates.
+
+        Args:
+            last_windows (Optional[int]): Only report the newest this many windows.
+        """
+        if not self.events:
+            return {}
+
+        def percentiles(sketch: QuantileSketch, digits: int) -> Dict[str, Optional[float]]:
+            values = {f"p{round(q * 100)}": sketch.quantile(q) for q in QUANTILES}
+            values["max"] = sketch.max if sketch.count else None
+            return {key: round(value, digits) if value is not None else None for key, value in values.items()}
+
+        windows = sorted(self.windows.items())
+        if last_windows:
+            windows = windows[-last_windows:]
+        return {
+            "events": round(self.events),
+            "avg_confidence": round(self.confidence.mean, 4) if self.confidence.count else None,
+            "avg_latency": round(self.latency_ms.mean, 1) if self.latency_ms.count else None,
+            "tool_error_rate": round(self.tool_errors / self.events, 4),
+            "flag_rate": round(self.flags / self.events, 4),
+            "latency_ms": percentiles(self.latency_ms, 1),
+            "confidence": percentiles(self.confidence, 3),
+            "windows": [
+                {
+                    "start": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+                    "events": round(count),
+                    "tool_error_rate": round(errors / count, 4),
+                    "flag_rate": round(flags / count, 4),
+                }
+                for start, (count, errors, flags) in windows
+            ],
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "window_s": self.window_s,
+            "max_windows": self.max_windows,
+            "latency_ms": self.latency_ms.to_dict(),
+            "confidence": self.confidence.to_dict(),
+            "events": self.events,
+            "tool_errors": self.tool_errors,
+            "flags": self.flags,
+            "windows": {str(start): counts for start, counts in self.windows.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "KPIAggregator":
+        aggregator = cls(data["window_s"], data["max_windows"])
+        aggregator.latency_ms = QuantileSketch.from_dict(data["latency_ms"])
+        aggregator.confidence = QuantileSketch.from_dict(data["confidence"])
+        aggregator.events = data["events"]
+        aggregator.tool_errors = data["tool_errors"]
+        aggregator.flags = data["flags"]
+        aggregator.windows = {int(start): counts for start, counts in data["windows"].items()}
+        return aggregator
+
+
+class EventLogReader:
+    def __init__(self, path: str = "logs/events.jsonl", head: Optional[str] = None, offset: int = 0, last_archive: str = ""):
+        """
+        Reads an event log incrementally, following it across rotations.
+
+        The position is the file being read, identified by a hash of its first line (inodes
+        are reused once archives are compressed), the byte offset reached in it, and the newest
+        archive already read. Each read goes through the archives created since, then the active
+        file, resuming the one whose first line matches at the saved offset and reading the others
+        from the start. Only complete lines are consumed, so a line being written is picked up next time.
+
+        Args:
+            path (str): The active event log.
+            head (Optional[str]): The first-line hash of the file at the saved position.
+            offset (int): Bytes of that file already read.
+            last_archive (str): The name of the newest archive already read ("" for none).
+        """
+        self.path = path
+        self.head = head
+        self.offset = offset
+        self.last_archive = last_archive
+
+    @classmethod
+    def at_end(cls, path: str = "logs/events.jsonl") -> "EventLogReader":
+        """Return a reader positioned at the current end of the log, which only yields events written from now on."""
+        archives = _archive_names(path)
+        reader = cls(path, last_archive=archives[-1] if archives else "")
+        try:
+            with open(path, "rb") as f:
+                reader.head = _head(f)
+                reader.offset = f.seek(0, os.SEEK_END)
+        except FileNotFoundError:
+            pass
+        return reader
+
+    def position(self) -> Dict:
+        return {"head": self.head, "offset": self.offset, "last_archive": self.last_archive}
+
+    def read(self) -> Iterator[Dict]:
+        """Yield every complete event written since the last read, in order."""
+        # Open the active file before listing archives: if it is rotated in between, it shows up
+        # among the archives and is read once, from there.
+        try:
+            active = open(self.path, "rb")
+        except FileNotFoundError:
+            active = None
+        archives = [a for a in _archive_names(self.path) if a > self.last_archive]
+
+        files = [(archive, _open_archive(self.path, archive)) for archive in archives]
+        active_head = _head(active) if active else None
+        if active and not (active_head and any(_head(f) == active_head for _, f in files)):
+            files.append((None, active))
+        elif active:
+            active.close()
+
+        for archive, f in files:
+            head = _head(f)
+            offset = self.offset if head is not None and head == self.head else 0
+            self.head, self.offset = head, offset
+            for event, size in _read_lines(f, offset):
+                self.offset += size
+                yield event
+            if archive is not None:
+                self.last_archive = archive
+
+
+def _head(f) -> Optional[str]:
+    # A hash of the file's first complete line, or None if it has none yet.
+    f.seek(0)
+    line = f.readline()
+    return hashlib.sha1(line).hexdigest() if line.endswith(b"\n") else None
+
+
+def _archive_names(path: str) -> List[str]:
+    # Archives are "<path>.<timestamp>" while being compressed and "<path>.<timestamp>.gz" after.
+    directory, name = os.path.split(path)
+    directory = directory or "."
+    if not os.path.isdir(directory):
+        return []
+    stems = {f[:-3] if f.endswith(".gz") else f for f in os.listdir(directory)
+             if f.startswith(name + ".") and not f.endswith(".tmp")}
+    return sorted(stems)
+
+
+def _open_archive(path: str, archive: str):
+    raw = os.path.join(os.path.dirname(path), archive)
+    try:
+        return open(raw, "rb")
+    except FileNotFoundError:
+        return gzip.open(raw + ".gz", "rb")
+
+
+def _read_lines(f, offset: int) -> Iterator[Tuple[Dict, int]]:
+    # Yields (event, bytes consumed) for each complete line; unparseable lines are skipped but consumed.
+    with f:
+        f.seek(offset)
+        skipped = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                skipped += len(line)
+                continue
+            yield event, skipped + len(line)
+            skipped = 0
+
+
+def update_from_log(path: str = "logs/events.jsonl", checkpoint: str = "logs/kpis.checkpoint.json", window_s: int = 60) -> KPIAggregator:
+    """
+    Fold events written since the last run into the aggregate saved in `checkpoint`.
+
+    The aggregate and the read position are saved together, so a crash between runs can neither
+    double count nor skip events.
+
+    Returns:
+        KPIAggregator: The updated aggregate.
+    """
+    state = None
+    if os.path.exists(checkpoint):
+        with open(checkpoint, "r") as f:
+            state = json.load(f)
+
+    aggregator = KPIAggregator.from_dict(state["aggregate"]) if state else KPIAggregator(window_s)
+    reader = EventLogReader(path, **state["position"]) if state else EventLogReader(path)
+    for event in reader.read():
+        if event.get("event") == "process":
+            aggregator.add(event)
+
+    os.makedirs(os.path.dirname(checkpoint) or ".", exist_ok=True)
+    with open(checkpoint + ".tmp", "w") as f:
+        json.dump({"position": reader.position(), "aggregate": aggregator.to_dict()}, f)
+    os.replace(checkpoint + ".tmp", checkpoint)
+    return aggregator
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally aggregate KPIs from the event log.")
+    parser.add_argument("--events", default="logs/events.jsonl", help="The active event log; rotated archives are found next to it.")
+    parser.add_argument("--checkpoint", default="logs/kpis.checkpoint.json", help="Where the aggregate and read position are kept.")
+    parser.add_argument("--window", type=int, default=60, help="Rate window in seconds (for a new checkpoint).")
+    parser.add_argument("--last-windows", type=int, default=10, help="How many recent windows to print.")
+    parser.add_argument("--merge", nargs="*", default=[], help="Other checkpoints (e.g. from other workers) to merge into the report.")
+    args = parser.parse_args()
+
+    aggregate = update_from_log(args.events, args.checkpoint, args.window)
+    for other in args.merge:
+        with open(other, "r") as f:
+            aggregate.merge(KPIAggregator.from_dict(json.load(f)["aggregate"]))
+    print(json.dumps(aggregate.summary(args.last_windows), indent=2))
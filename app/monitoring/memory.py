@@ -0,0 +1,291 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from app.monitoring.metrics import gauge
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# Dynamic components (e.g. sessions) are re-measured at most this often when /metrics is scraped.
+MEMORY_REFRESH_S = float(os.getenv("MEMORY_REFRESH_S", "60"))
+# Start tracemalloc at startup (MEMORY_TRACEMALLOC=1) with this many frames per allocation.
+MEMORY_TRACEMALLOC = os.getenv("MEMORY_TRACEMALLOC", "0") == "1"
+MEMORY_TRACEMALLOC_FRAMES = int(os.getenv("MEMORY_TRACEMALLOC_FRAMES", "1"))
+# tracemalloc snapshots kept for diffing; the oldest is dropped beyond this.
+MEMORY_MAX_SNAPSHOTS = int(os.getenv("MEMORY_MAX_SNAPSHOTS", "5"))
+
+memory_component_bytes = gauge("memory_component_bytes", "Estimated memory held by each application component.", ("component",))
+process_resident_memory_bytes = gauge("process_resident_memory_bytes", "Resident set size of the process.")
+
+_TRACEMALLOC_NOISE = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes() -> Optional[int]:
+    """Return the process's current resident set size, or None if it cannot be read."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if psutil:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+# Not followed by deep_sizeof: shared program structure and event loops rather than data.
+_NOT_FOLLOWED = (
+    type, types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType, asyncio.AbstractEventLoop,
+)
+
+
+def deep_sizeof(obj, max_objects: int = 10_000_000) -> int:
+    """
+    Estimate the bytes held by an object graph: the object, and everything reachable through
+    containers and instance attributes, each counted once.
+
+    Numpy arrays count their data buffer. Modules, classes, functions and event loops are not followed.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < max_objects:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _NOT_FOLLOWED):
+            continue
+        seen.add(id(item))
+        nbytes = getattr(item, "nbytes", None)
+        if isinstance(nbytes, int) and hasattr(item, "dtype"):
+            total += sys.getsizeof(item) + (0 if getattr(item, "base", None) is None else nbytes)
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__"):
+            stack.append(vars(item))
+        elif hasattr(item, "__slots__"):
+            stack.extend(getattr(item, slot) for slot in item.__slots__ if hasattr(item, slot))
+    return total
+
+
+def torch_module_bytes(module) -> int:
+    """Bytes of a torch module's parameters and buffers (e.g. SentenceTransformer weights)."""
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def faiss_index_bytes(index) -> int:
+    """Bytes of the vectors stored in a FAISS index."""
+    try:
+        return int(index.sa_code_size()) * int(index.ntotal)
+    except (AttributeError, RuntimeError):
+        import faiss
+        return int(faiss.serialize_index(index).nbytes)
+
+
+class MemoryAccounting:
+    def __init__(self):
+        """
+        Per-component memory estimates and the process RSS.
+
+        Components are registered with a function that returns their size in bytes. Static ones
+        (model weights, indexes, loaded data) are measured once; dynamic ones (sessions, caches)
+        are re-measured by `refresh` when older than MEMORY_REFRESH_S, so a /metrics scrape
+        rarely walks large object graphs.
+        """
+        self._components: "OrderedDict[str, tuple]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._measured_at = 0.0
+        self._lock = threading.Lock()
+
+    def register(self, name: str, measure: Callable[[], int], static: bool = True) -> None:
+        self._components[name] = (measure, static)
+        self._sizes.pop(name, None)
+
+    def refresh(self, max_age_s: float = MEMORY_REFRESH_S) -> Dict[str, int]:
+        """Measure components that are due (never-measured static ones, stale dynamic ones) and update the gauges."""
+        with self._lock:
+            stale = time.monotonic() - self._measured_at >= max_age_s
+            for name, (measure, static) in self._components.items():
+                if name in self._sizes and (static or not stale):
+                    continue
+                try:
+                    self._sizes[name] = int(measure())
+                except Exception as e:
+                    logger.warning(f"Could not measure memory of '{name}': {e}")
+                    self._sizes[name] = 0
+                memory_component_bytes.set(self._sizes[name], component=name)
+            if stale:
+                self._measured_at = time.monotonic()
+            rss = rss_bytes()
+            if rss is not None:
+                process_resident_memory_bytes.set(rss)
+            return dict(self._sizes)
+
+    def report(self, max_age_s: float = MEMORY_REFRESH_S) -> Dict:
+        """
+        Return RSS, the per-component sizes and the remainder not attributed to any component
+        (interpreter, libraries, allocator overhead).
+        """
+        sizes = self.refresh(max_age_s)
+        rss = rss_bytes()
+        report = {"rss_bytes": rss, "components": sizes}
+        if rss is not None:
+            report["unattributed_bytes"] = rss - sum(sizes.values())
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            report["tracemalloc"] = {"current_bytes": current, "peak_bytes": peak}
+        return report
+
+
+def format_report(report: Dict) -> str:
+    """Format a memory report as text lines, largest component first."""
+    def mb(value: Optional[int]) -> str:
+        return f"{value / 2**20:9.1f} MB" if value is not None else "        n/a"
+
+    lines = [f"Memory: RSS {mb(report['rss_bytes']).strip()}"]
+    for name, size in sorted(report["components"].items(), key=lambda item: -item[1]):
+        lines.append(f"  {name:<20} {mb(size)}")
+    if "unattributed_bytes" in report:
+        lines.append(f"  {'(unattributed)':<20} {mb(report['unattributed_bytes'])}")
+    return "\n".join(lines)
+
+
+def register_app_components(accounting: MemoryAccounting, orchestrator, session_store) -> None:
+    """Register the app's large in-memory structures: embedding model, KB, FAISS index, CRM data, classifier and sessions."""
+    tool = orchestrator.tool
+    if getattr(tool, "model", None) is not None:
+        accounting.register("embedding_model", lambda: torch_module_bytes(tool.model))
+    if getattr(tool, "doc_embeddings", None) is not None:
+        accounting.register("kb_embeddings", lambda: tool.doc_embeddings.nbytes)
+    if getattr(tool, "index", None) is not None:
+        accounting.register("faiss_index", lambda: faiss_index_bytes(tool.index))
+    accounting.register("kb_docs", lambda: deep_sizeof([getattr(tool, "kb_docs", []), getattr(tool, "doc_texts", [])]))
+    accounting.register("crm_data", lambda: deep_sizeof(getattr(tool, "crm_data", {})))
+    if orchestrator.intent_classifier is not None:
+        classifier = orchestrator.intent_classifier
+        accounting.register(
+            "intent_classifier",
+            lambda: classifier.embeddings.nbytes + deep_sizeof([classifier.examples, classifier.intents, classifier.sentiments]),
+        )
+    # `refresh` runs in a worker thread; walk a snapshot so the loop can keep adding and evicting sessions.
+    accounting.register("sessions", lambda: deep_sizeof(session_store.snapshot()), static=False)
+
+
+class SnapshotStore:
+    def __init__(self, max_snapshots: int = MEMORY_MAX_SNAPSHOTS):
+        """
+        Named tracemalloc snapshots, kept in memory for diffing against each other or the present.
+
+        tracemalloc only sees allocations made after it starts, and slows allocation-heavy code
+        while running, so it is started on demand (or at startup with MEMORY_TRACEMALLOC=1).
+        """
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, frames: int = MEMORY_TRACEMALLOC_FRAMES) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        """Stop tracing and drop all snapshots."""
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+
+    def take(self, label: str = "") -> Dict:
+        """
+        Take and keep a snapshot.
+
+        Raises:
+            RuntimeError: If tracemalloc is not tracing.
+        """
+        snapshot = _snapshot()
+        info = {
+            "id": uuid.uuid4().hex[:8],
+            "label": label,
+            "taken_at": datetime.utcnow().isoformat(),
+            "traced_bytes": sum(stat.size for stat in snapshot.statistics("filename")),
+        }
+        with self._lock:
+            self._snapshots[info["id"]] = {"info": info, "snapshot": snapshot}
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return info
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [entry["info"] for entry in self._snapshots.values()]
+
+    def diff(self, older: str, newer: Optional[str] = None, group_by: str = "lineno", top: int = 20) -> Optional[Dict]:
+        """
+        Compare two snapshots, or one snapshot against the present when `newer` is None.
+
+        Args:
+            older (str): The ID of the baseline snapshot.
+            newer (Optional[str]): The ID of the later snapshot.
+            group_by (str): "lineno", "filename" or "traceback".
+            top (int): How many of the largest growths to return.
+
+        Returns:
+            Optional[Dict]: The total growth and the top allocation sites by size difference, or
+            None if a snapshot ID is unknown.
+
+        Raises:
+            RuntimeError: If `newer` is None and tracemalloc is not tracing.
+        """
+        with self._lock:
+            base = self._snapshots.get(older)
+            later = self._snapshots.get(newer) if newer else None
+        if base is None or (newer and later is None):
+            return None
+        current = later["snapshot"] if later else _snapshot()
+        stats = current.compare_to(base["snapshot"], group_by)
+        return {
+            "older": base["info"],
+            "newer": later["info"] if later else "now",
+            "size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "top": [
+                {
+                    "location": str(stat.traceback) if group_by != "traceback" else stat.traceback.format(),
+                    "size_diff_bytes": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                    "size_bytes": stat.size,
+                }
+                for stat in stats[:top]
+            ],
+        }
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running; start it first.")
+    return tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_NOISE)
+
+
+accounting = MemoryAccounting()
+snapshots = SnapshotStore()
+if MEMORY_TRACEMALLOC:
+    snapshots.start()
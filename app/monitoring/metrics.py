@@ -0,0 +1,295 @@
+import bisect
+import threading
+from typing import Dict, List, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labelnames: Tuple[str, ...] = ()):
+        """
+        A monotonically increasing counter, optionally split by label values.
+
+        Args:
+            name (str): The metric name, e.g. "llm_structured_output_total".
+            description (str): A one-line human readable description.
+            labelnames (Tuple[str, ...]): The label names every sample must provide.
+        """
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        try:
+            return tuple([str(labels[name]) for name in self.labelnames])
+        except KeyError:
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}") from None
+
+    def labels(self, **labels) -> "BoundMetric":
+        """
+        Return the metric bound to fixed label values.
+
+        Hot paths that record the same label values over and over should bind once and reuse the
+        result, which skips validating and building the label key on every call.
+        """
+        return BoundMetric(self, self._key(labels))
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """
+        Increment the counter for the given label values.
+
+        Args:
+            amount (float): The amount to add. Must not be negative.
+            **labels: One keyword per label name.
+        """
+        if amount < 0:
+            raise ValueError("Counters can only increase.")
+        self._inc_key(self._key(labels), amount)
+
+    def _inc_key(self, key: Tuple[str, ...], amount: float) -> None:
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """Return the current value for the given label values (0 if never incremented)."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        """Return every (labels, value) pair recorded so far."""
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Gauge:
+    def __init__(self, name: str, description: str, labelnames: Tuple[str, ...] = ()):
+        """
+        A value that can go up and down, e.g. a queue depth or the number of in-flight requests.
+
+        Args:
+            name (str): The metric name, e.g. "job_queue_depth".
+            description (str): A one-line human readable description.
+            labelnames (Tuple[str, ...]): The label names every sample must provide.
+        """
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    _key = Counter._key
+    _inc_key = Counter._inc_key
+    labels = Counter.labels
+    value = Counter.value
+    samples = Counter.samples
+
+    def set(self, value: float, **labels) -> None:
+        """Set the gauge to `value` for the given label values."""
+        self._set_key(self._key(labels), value)
+
+    def _set_key(self, key: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Add `amount` (which may be negative) to the gauge."""
+        self._inc_key(self._key(labels), amount)
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        """Subtract `amount` from the gauge."""
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        """
+        Counts observations into fixed upper-bound buckets and tracks their sum and count.
+
+        Args:
+            name (str): The metric name, e.g. "llm_call_latency_seconds".
+            description (str): A one-line human readable description.
+            labelnames (Tuple[str, ...]): The label names every observation must provide.
+            buckets (Tuple[float, ...]): Sorted bucket upper bounds; +Inf is implicit.
+        """
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    _key = Counter._key
+    labels = Counter.labels
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        Record one observation.
+
+        Args:
+            value (float): The observed value, e.g. a latency in seconds.
+            **labels: One keyword per label name.
+        """
+        self._observe_key(self._key(labels), value)
+
+    def _observe_key(self, key: Tuple[str, ...], value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # One slot per bucket, one for +Inf, then sum and count.
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 3)
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self) -> List[Tuple[Dict[str, str], Dict[str, object]]]:
+        """Return every (labels, {"buckets", "sum", "count"}) pair; bucket counts are cumulative."""
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+
+        samples = []
+        for key, state in items:
+            cumulative, running = [], 0.0
+            for count in state[:-2]:
+                running += count
+                cumulative.append(running)
+            bounds = list(self.buckets) + [float("inf")]
+            samples.append((
+                dict(zip(self.labelnames, key)),
+                {"buckets": list(zip(bounds, cumulative)), "sum": state[-2], "count": state[-1]},
+            ))
+        return samples
+
+
+class BoundMetric:
+    __slots__ = ("metric", "key", "_monotonic")
+
+    def __init__(self, metric, key: Tuple[str, ...]):
+        """A metric with its label values fixed, as returned by `labels()`."""
+        self.metric = metric
+        self.key = key
+        self._monotonic = isinstance(metric, Counter)
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0 and self._monotonic:
+            raise ValueError("Counters can only increase.")
+        self.metric._inc_key(self.key, amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.metric._inc_key(self.key, -amount)
+
+    def set(self, value: float) -> None:
+        self.metric._set_key(self.key, value)
+
+    def observe(self, value: float) -> None:
+        self.metric._observe_key(self.key, value)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Holds every metric created by the application, keyed by name.
+
+        Metrics are created through the module level helpers (e.g. `counter`), which
+        return the already registered instance when called again with the same name,
+        so modules can declare their metrics at import time without coordination.
+        """
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, cls, name: str, description: str, labelnames: Tuple[str, ...] = (), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, description, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' is already registered as {type(metric).__name__}.")
+            return metric
+
+    def metrics(self) -> List[object]:
+        """Return all registered metrics in registration order."""
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self) -> Dict[str, list]:
+        """Return a plain dict of metric name to its samples, for logging or tests."""
+        return {metric.name: metric.samples() for metric in self.metrics()}
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, description: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+    """Get or create a Counter in the global registry."""
+    return REGISTRY.get_or_create(Counter, name, description, labelnames)
+
+
+def gauge(name: str, description: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+    """Get or create a Gauge in the global registry."""
+    return REGISTRY.get_or_create(Gauge, name, description, labelnames)
+
+
+def histogram(
+    name: str, description: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+) -> Histogram:
+    """Get or create a Histogram in the global registry."""
+    return REGISTRY.get_or_create(Histogram, name, description, labelnames, buckets=buckets)
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_METRIC_TYPES = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}
+
+
+def _escape(value: str, quotes: bool = True) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quotes else value
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render_prometheus(registry: MetricsRegistry = REGISTRY) -> str:
+    """
+    Render every metric in the Prometheus text exposition format (version 0.0.4).
+
+    Args:
+        registry (MetricsRegistry): The registry to render.
+
+    Returns:
+        str: The exposition text, ready to be served from a `/metrics` endpoint.
+    """
+    lines = []
+    for metric in registry.metrics():
+        lines.append(f"# HELP {metric.name} {_escape(metric.description, quotes=False)}")
+        lines.append(f"# TYPE {metric.name} {_METRIC_TYPES[type(metric)]}")
+        for labels, value in metric.samples():
+            if isinstance(metric, Histogram):
+                for bound, count in value["buckets"]:
+                    bucket_labels = dict(labels, le=_format_value(bound))
+                    lines.append(f"{metric.name}_bucket{_format_labels(bucket_labels)} {_format_value(count)}")
+                lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+                lines.append(f"{metric.name}_count{_format_labels(labels)} {_format_value(value['count'])}")
+            else:
+                lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,289 @@
+import argparse
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.monitoring.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+# Profiling is off unless PROFILING_ENABLED=1: the middleware is not installed and the admin endpoints 404.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "logs/profiles")
+# Sampling interval bounds: the sampler thread never wakes more often than the minimum.
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+PROFILE_MIN_INTERVAL_MS = float(os.getenv("PROFILE_MIN_INTERVAL_MS", "1"))
+# Upper bound on any profile's duration; a sampler still running after it stops by itself.
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# Deepest stack kept per sample.
+PROFILE_MAX_DEPTH = int(os.getenv("PROFILE_MAX_DEPTH", "128"))
+
+PROFILE_MODES = ("cprofile", "sample")
+
+profiles_total = counter("profiles_total", "Profiles taken, by kind (cprofile, sample, process) and outcome.", ("kind", "outcome"))
+
+# One profile at a time: cProfile cannot run twice in a thread, and overlapping samplers would double the overhead.
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already running."""
+
+
+# Frame labels per code object, so a sample costs a dict lookup per frame.
+_labels: Dict[object, str] = {}
+
+
+def _frame_label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        # Paths are shown relative to the longest matching import root (the app, site-packages, the stdlib).
+        filename = code.co_filename
+        roots = [root for root in [os.getcwd(), *sys.path] if root and filename.startswith(root + os.sep)]
+        if roots:
+            filename = os.path.relpath(filename, max(roots, key=len))
+        name = getattr(code, "co_qualname", code.co_name)
+        label = _labels[code] = f"{name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+    return label
+
+
+class StackSampler:
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, max_seconds: float = PROFILE_MAX_SECONDS):
+        """
+        A statistical profiler that samples the stacks of every Python thread from a background thread.
+
+        Every `interval_ms` it reads `sys._current_frames()` and counts each thread's stack,
+        outermost frame first, as a collapsed stack ("thread;frame;frame"), the input format of
+        flamegraph.pl and speedscope. The profiled code is never instrumented, so the overhead is
+        one stack walk per thread per interval, bounded by the minimum interval, the maximum depth
+        and `max_seconds`, after which sampling stops by itself.
+
+        Args:
+            interval_ms (float): Time between samples (at least PROFILE_MIN_INTERVAL_MS).
+            max_seconds (float): Stop sampling after this long even if `stop` is never called.
+        """
+        self.interval_s = max(interval_ms, PROFILE_MIN_INTERVAL_MS) / 1000
+        self.max_seconds = min(max_seconds, PROFILE_MAX_SECONDS)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def __enter__(self) -> "StackSampler":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval_s) and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < PROFILE_MAX_DEPTH:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, str(thread_id)).replace(";", ":"))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Return the samples as collapsed stacks, one "stack count" line each."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_path(kind: str) -> str:
+    """Return a new, unique file path in PROFILE_DIR for a profile of this kind."""
+    suffix = ".prof" if kind == "cprofile" else ".collapsed"
+    return os.path.join(PROFILE_DIR, f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{kind}-{uuid.uuid4().hex[:8]}{suffix}")
+
+
+def _write(path: str, data: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write(data)
+
+
+class RequestProfile:
+    def __init__(self, mode: str, path: str):
+        """
+        Profiles one request, as a context manager around the request handling.
+
+        "cprofile" runs the deterministic profiler on the event loop thread and saves pstats
+        (open with `python -m pstats`, snakeviz or flameprof); it only sees code on that thread,
+        not work sent to thread pools. "sample" runs a StackSampler over all threads and saves
+        collapsed stacks. Either way, other requests served concurrently by the same worker
+        show up too, so profile on a quiet worker or compare against a whole-process sample.
+
+        Raises:
+            ProfilerBusy: On start, if another profile is already running or the profiler cannot
+                be started.
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'; choose from {PROFILE_MODES}.")
+        self.mode = mode
+        self.path = path
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+
+    def start(self) -> "RequestProfile":
+        if not _profile_lock.acquire(blocking=False):
+            profiles_total.inc(kind=self.mode, outcome="busy")
+            raise ProfilerBusy("Another profile is running.")
+        try:
+            if self.mode == "cprofile":
+                self._profile = cProfile.Profile()
+                self._profile.enable()
+            else:
+                self._sampler = StackSampler().start()
+        except Exception as e:
+            # e.g. another profiler (a debugger, coverage) already owns the profiling hook.
+            self._profile = self._sampler = None
+            _profile_lock.release()
+            profiles_total.inc(kind=self.mode, outcome="failed")
+            raise ProfilerBusy(f"Could not start the {self.mode} profiler: {e}") from e
+        return self
+
+    def stop(self) -> None:
+        """Stop profiling and save the profile."""
+        try:
+            if self._profile is not None:
+                self._profile.disable()
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._profile.dump_stats(self.path)
+            else:
+                _write(self.path, self._sampler.stop().collapsed())
+            profiles_total.inc(kind=self.mode, outcome="written")
+        except OSError as e:
+            logger.error(f"Could not write profile '{self.path}': {e}")
+        finally:
+            _profile_lock.release()
+
+    def __enter__(self) -> "RequestProfile":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class RequestProfileTrigger:
+    def __init__(self):
+        """Arms per-request profiles from the admin endpoint: the next `count` requests are profiled without a header."""
+        self._armed: List[str] = []
+        self._lock = threading.Lock()
+
+    def arm(self, mode: str, count: int = 1) -> None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'; choose from {PROFILE_MODES}.")
+        with self._lock:
+            self._armed = [mode] * count
+
+    def take(self) -> Optional[str]:
+        """Return the mode to profile the current request with, if any is armed."""
+        if not self._armed:
+            return None
+        with self._lock:
+            return self._armed.pop() if self._armed else None
+
+
+request_trigger = RequestProfileTrigger()
+
+
+def sample_process(seconds: float, interval_ms: float = PROFILE_INTERVAL_MS) -> Dict:
+    """
+    Sample every thread of the process for `seconds` (blocking; run it in a worker thread).
+
+    Returns:
+        Dict: The collapsed stack file written and the number of samples.
+
+    Raises:
+        ProfilerBusy: If another profile is already running.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        profiles_total.inc(kind="process", outcome="busy")
+        raise ProfilerBusy("Another profile is running.")
+    try:
+        sampler = StackSampler(interval_ms, seconds).start()
+        time.sleep(min(seconds, PROFILE_MAX_SECONDS))
+        sampler.stop()
+        path = profile_path("process")
+        _write(path, sampler.collapsed())
+        profiles_total.inc(kind="process", outcome="written")
+        return {"file": os.path.basename(path), "samples": sampler.samples, "stacks": len(sampler.stacks)}
+    finally:
+        _profile_lock.release()
+
+
+def list_profiles() -> List[Dict]:
+    """Return the saved profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return [
+        {"file": name, "bytes": os.path.getsize(os.path.join(PROFILE_DIR, name))}
+        for name in sorted(os.listdir(PROFILE_DIR), reverse=True)
+        if name.endswith((".prof", ".collapsed"))
+    ]
+
+
+def resolve_profile(name: str) -> Optional[str]:
+    """Return the path of a saved profile by file name, or None (names with directories are rejected)."""
+    if os.path.basename(name) != name or not name.endswith((".prof", ".collapsed")):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+def benchmark(seconds: float = 2.0, interval_ms: float = PROFILE_INTERVAL_MS) -> Dict[str, float]:
+    """
+    Measure the slowdown a StackSampler causes on a CPU-bound loop.
+
+    Returns:
+        Dict[str, float]: Iterations per second without and with sampling, and the overhead in percent.
+    """
+    def spin(duration: float) -> float:
+        count, end = 0, time.perf_counter() + duration
+        while time.perf_counter() < end:
+            sum(range(100))
+            count += 1
+        return count / duration
+
+    baseline = spin(seconds)
+    with StackSampler(interval_ms) as sampler:
+        sampled = spin(seconds)
+    return {
+        "baseline_iter_per_sec": round(baseline),
+        "sampled_iter_per_sec": round(sampled),
+        "samples": sampler.samples,
+        "overhead_pct": round((baseline - sampled) / baseline * 100, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the overhead of the stack sampler.")
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--interval-ms", type=float, default=PROFILE_INTERVAL_MS)
+    args = parser.parse_args()
+    for key, value in benchmark(args.seconds, args.interval_ms).items():
+        print(f"{key}: {value}")
@@ -1,14 +1,345 @@
-from app.monitoring.kpis import track_kpis
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional, Sequence
 
-# Simulated logs
-logs = [
-    {"confidence_score": 0.9, "latency_ms": 420, "tool_error": False},
-    {"confidence_score": 0.75, "latency_ms": 370, "tool_error": True, "action": "FLAG_FOR_HUMAN_REVIEW"},
-    ...
-]
+import httpx
 
-metrics = track_kpis(logs)
+from app.core.intent_classifier import GOLDEN_LABELS
+from app.evaluation.golden_dataset import GOLDEN_DATASET
+from app.models.enums import Intent, Sentiment
+from app.monitoring.kpis import EventLogReader
 
-print("=== KPI Metrics ===")
-for k, v in metrics.items():
-    print(f"{k}: {v:.2f}")
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+ARRIVAL_MODES = ("constant", "poisson", "burst")
+PERCENTILES = (0.5, 0.95, 0.99, 0.999)
+REQUEST_FIELDS = ("conversation_history", "current_prospect_message", "prospect_id")
+
+
+class FakeLLMError(Exception):
+    """An injected LLM failure."""
+
+
+class FakeLLMClient:
+    def __init__(
+        self,
+        latency_ms: float = 300.0,
+        jitter: float = 0.3,
+        error_rate: float = 0.0,
+        dataset: Sequence[Dict] = GOLDEN_DATASET,
+        seed: Optional[int] = None,
+    ):
+        """
+        An offline stand-in for the OpenAI client, shaped like `client.chat.completions.create`.
+
+        Analysis and synthesis prompts are answered with the ground truth of the golden dataset
+        example whose message appears in the prompt (or a generic answer), after a log-normally
+        distributed delay. Token usage is estimated from the text lengths, so cost and quota
+        accounting behave as they would against the real API.
+
+        Args:
+            latency_ms (float): Median latency of a completion.
+            jitter (float): Sigma of the log-normal latency distribution (0 for a fixed latency).
+            error_rate (float): Fraction of calls that raise FakeLLMError.
+            dataset (Sequence[Dict]): Examples with `current_prospect_message` and `ground_truth`.
+            seed (Optional[int]): Seed for latencies and injected errors.
+        """
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.examples = {example["current_prospect_message"]: example["ground_truth"] for example in dataset}
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model: str, messages: List[Dict], **kwargs) -> SimpleNamespace:
+        self.calls += 1
+        await asyncio.sleep(self.latency_ms * self._rng.lognormvariate(0, self.jitter) / 1000)
+        if self._rng.random() < self.error_rate:
+            raise FakeLLMError("Injected LLM failure.")
+
+        prompt = "\n".join(message["content"] for message in messages)
+        truth = next((truth for message, truth in self.examples.items() if message in prompt), None)
+        if "Analyze the following message" in prompt:
+            # Answer with the coarse labels the pipeline routes on, so golden replays exercise the
+            # same stages (e.g. the knowledge base lookup for inquiries) as real traffic.
+            intent, sentiment = GOLDEN_LABELS.get(truth["intent"] if truth else None, (Intent.INQUIRY, Sentiment.NEUTRAL))
+            content = {
+                "intent": intent.value,
+                "sentiment": sentiment.value,
+                "entities": truth["entities"] if truth else [],
+                "confidence": 0.9,
+            }
+        else:
+            content = {
+                "response": truth["suggested_response_draft"] if truth else "Thanks for reaching out! Happy to help.",
+                "next_steps": truth["internal_next_steps"] if truth else [{"action": "NO_ACTION", "details": {}}],
+                "reasoning_trace": "Simulated response.",
+            }
+        text = json.dumps(content)
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(text) // 4, prompt_tokens_details=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=usage)
+
+
+def load_workload(recorded_path: Optional[str] = None, include_golden: bool = True) -> List[Dict]:
+    """
+    Build the request bodies to replay.
+
+    Args:
+        recorded_path (Optional[str]): A JSON lines file of recorded `/process_message` request
+            bodies (or objects with the body under "request").
+        include_golden (bool): Whether to include the golden dataset conversations.
+
+    Returns:
+        List[Dict]: Request bodies, golden dataset first.
+    """
+    workload = []
+    if include_golden:
+        workload += [{field: example[field] for field in REQUEST_FIELDS} for example in GOLDEN_DATASET]
+    if recorded_path:
+        with open(recorded_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    workload.append(record.get("request", record))
+    if not workload:
+        raise ValueError("The workload is empty.")
+    return workload
+
+
+def request_body(workload: Sequence[Dict], index: int, vary: bool = True) -> Dict:
+    """
+    Return the body of the `index`-th request sent, cycling through the workload.
+
+    With `vary`, the prospect message gets a per-request suffix. The pipeline coalesces identical
+    in-flight requests, so replaying the same few bodies in bursts would otherwise measure
+    the coalescing rather than the pipeline.
+    """
+    body = workload[index % len(workload)]
+    if not vary or "current_prospect_message" not in body:
+        return body
+    return dict(body, current_prospect_message=f"{body['current_prospect_message']} (request {index})")
+
+
+def arrival_offsets(mode: str, rate: float, count: int, burst_size: int = 10, seed: Optional[int] = None) -> List[float]:
+    """
+    Return the send time of each request, in seconds from the start, for an open-loop run.
+
+    Args:
+        mode (str): "constant" (evenly spaced), "poisson" (exponential gaps) or "burst"
+            (`burst_size` requests at once, with bursts spaced to keep the mean rate).
+        rate (float): Mean arrival rate in requests per second.
+        count (int): Number of requests.
+        burst_size (int): Requests per burst in "burst" mode.
+        seed (Optional[int]): Seed for Poisson arrivals.
+    """
+    if mode not in ARRIVAL_MODES:
+        raise ValueError(f"Unknown arrival mode '{mode}'; choose from {ARRIVAL_MODES}.")
+    if rate <= 0:
+        raise ValueError("The arrival rate must be positive.")
+    if mode == "constant":
+        return [i / rate for i in range(count)]
+    if mode == "burst":
+        return [(i // burst_size) * burst_size / rate for i in range(count)]
+    rng = random.Random(seed)
+    offsets, t = [], 0.0
+    for _ in range(count):
+        offsets.append(t)
+        t += rng.expovariate(rate)
+    return offsets
+
+
+@dataclass
+class RequestResult:
+    trace_id: str
+    latency_ms: float
+    status: Optional[int]
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status is not None and self.status < 400
+
+
+async def _send(client: httpx.AsyncClient, body: Dict, scheduled: float, headers: Dict[str, str]) -> RequestResult:
+    # Latency counts from the scheduled send time, so a backlog on the client side is not hidden
+    # (no coordinated omission); in closed loop the scheduled time is the actual send time.
+    trace_id = uuid.uuid4().hex
+    headers = dict(headers, traceparent=f"00-{trace_id}-{uuid.uuid4().hex[:16]}-01")
+    try:
+        response = await client.post("/process_message", json=body, headers=headers)
+        status, error = response.status_code, None
+    except httpx.HTTPError as e:
+        status, error = None, type(e).__name__
+    return RequestResult(trace_id, (time.perf_counter() - scheduled) * 1000, status, error)
+
+
+async def run_open_loop(
+    client: httpx.AsyncClient,
+    workload: Sequence[Dict],
+    offsets: Sequence[float],
+    headers: Optional[Dict[str, str]] = None,
+    vary: bool = True,
+) -> List[RequestResult]:
+    """Send workload requests (cycled, see `request_body`) at the given offsets, regardless of how fast responses come back."""
+    start = time.perf_counter()
+    tasks = []
+    for i, offset in enumerate(offsets):
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(_send(client, request_body(workload, i, vary), start + offset, headers or {})))
+    return list(await asyncio.gather(*tasks))
+
+
+async def run_closed_loop(
+    client: httpx.AsyncClient,
+    workload: Sequence[Dict],
+    concurrency: int,
+    count: int,
+    duration_s: Optional[float] = None,
+    headers: Optional[Dict[str, str]] = None,
+    vary: bool = True,
+) -> List[RequestResult]:
+    """Keep `concurrency` requests in flight until `count` are sent or `duration_s` has passed."""
+    deadline = time.perf_counter() + duration_s if duration_s else math.inf
+    results: List[RequestResult] = []
+    sent = 0
+
+    async def user():
+        nonlocal sent
+        while sent < count and time.perf_counter() < deadline:
+            body = request_body(workload, sent, vary)
+            sent += 1
+            results.append(await _send(client, body, time.perf_counter(), headers or {}))
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return results
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    values = sorted(values)
+    report = {}
+    for q in PERCENTILES:
+        key = f"p{q * 100:g}".replace(".", "_")
+        report[key] = round(values[min(len(values) - 1, math.ceil(q * len(values)) - 1)], 1) if values else None
+    report["max"] = round(values[-1], 1) if values else None
+    return report
+
+
+def build_report(results: Sequence[RequestResult], elapsed_s: float, stage_events: Iterable[Dict] = ()) -> Dict:
+    """
+    Summarize a run.
+
+    Args:
+        results (Sequence[RequestResult]): One result per request sent.
+        elapsed_s (float): Wall time of the run.
+        stage_events (Iterable[Dict]): "process" events from the server's event log; those whose
+            `trace_id` belongs to this run give the per-stage timings.
+
+    Returns:
+        Dict: Request counts, throughput, latency percentiles of successful requests, errors by
+        status code or exception, and latency percentiles per pipeline stage.
+    """
+    ok = [r for r in results if r.ok]
+    errors = Counter(r.error or str(r.status) for r in results if not r.ok)
+    trace_ids = {r.trace_id for r in results}
+    stages: Dict[str, List[float]] = {}
+    for event in stage_events:
+        if event.get("trace_id") in trace_ids:
+            for stage, duration_ms in (event.get("stages") or {}).items():
+                stages.setdefault(stage, []).append(duration_ms)
+    return {
+        "requests": len(results),
+        "succeeded": len(ok),
+        "elapsed_s": round(elapsed_s, 3),
+        "throughput_rps": round(len(ok) / elapsed_s, 2) if elapsed_s else 0.0,
+        "latency_ms": _percentiles([r.latency_ms for r in ok]),
+        "errors": dict(errors.most_common()),
+        "stages_ms": {stage: _percentiles(values) for stage, values in sorted(stages.items())},
+    }
+
+
+def format_report(report: Dict) -> str:
+    """Format a report as text."""
+    latency = "  ".join(f"{k} {v}" for k, v in report["latency_ms"].items())
+    lines = [
+        f"requests: {report['requests']}  succeeded: {report['succeeded']}  elapsed: {report['elapsed_s']}s"
+        f"  throughput: {report['throughput_rps']} req/s",
+        f"latency ms: {latency}",
+        "errors: " + (", ".join(f"{k} x{v}" for k, v in report["errors"].items()) or "none"),
+    ]
+    for stage, values in report["stages_ms"].items():
+        lines.append(f"  {stage:>12}: " + "  ".join(f"{k} {v}" for k, v in values.items()))
+    return "\n".join(lines)
+
+
+async def _main(args) -> Dict:
+    workload = load_workload(args.recorded, include_golden=not args.no_golden)
+    headers = {"X-API-Key": args.api_key} if args.api_key else {}
+    vary = not args.identical
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        # Serve the app in-process against the fake LLM: no network, no API key, no model downloads.
+        os.environ.setdefault("OPENAI_API_KEY", "offline")
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        import app.core.llm_orchestrator as llm_orchestrator
+        from app.main import app
+
+        llm_orchestrator.client = FakeLLMClient(args.llm_latency_ms, args.llm_jitter, args.llm_error_rate, seed=args.seed)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=args.timeout)
+
+    events_path = args.events or (None if args.url else "logs/events.jsonl")
+    reader = EventLogReader.at_end(events_path) if events_path else None
+
+    start = time.perf_counter()
+    async with client:
+        if args.concurrency:
+            results = await run_closed_loop(client, workload, args.concurrency, args.requests, args.duration, headers, vary)
+        else:
+            offsets = arrival_offsets(args.mode, args.rate, args.requests, args.burst_size, args.seed)
+            results = await run_open_loop(client, workload, offsets, headers, vary)
+    elapsed = time.perf_counter() - start
+
+    if reader and not args.url:
+        from app.logging.logger import flush_event_logs
+        flush_event_logs()
+    return build_report(results, elapsed, reader.read() if reader else ())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test /process_message by replaying the golden dataset and recorded requests.")
+    parser.add_argument("--url", help="Base URL of a running server; by default the app runs in-process against a fake LLM.")
+    parser.add_argument("--recorded", help="JSON lines file of recorded request bodies to replay.")
+    parser.add_argument("--no-golden", action="store_true", help="Only replay the recorded requests.")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests to send.")
+    parser.add_argument("--mode", choices=ARRIVAL_MODES, default="poisson", help="Open-loop arrival process.")
+    parser.add_argument("--rate", type=float, default=10.0, help="Open-loop mean arrival rate (requests/sec).")
+    parser.add_argument("--burst-size", type=int, default=20, help="Requests per burst in burst mode.")
+    parser.add_argument("--concurrency", type=int, default=0, help="Run closed-loop with this many concurrent users instead.")
+    parser.add_argument("--duration", type=float, help="Stop a closed-loop run after this many seconds.")
+    parser.add_argument("--api-key", help="Send requests with this API key (X-API-Key), which selects the tenant.")
+    parser.add_argument("--identical", action="store_true", help="Replay bodies unchanged, so concurrent repeats are coalesced.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds.")
+    parser.add_argument("--events", help="Server event log to read per-stage timings from (default: the in-process log).")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="Fake LLM median latency.")
+    parser.add_argument("--llm-jitter", type=float, default=0.3, help="Fake LLM log-normal latency sigma.")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of fake LLM calls that fail.")
+    parser.add_argument("--seed", type=int, help="Seed for arrivals and the fake LLM.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+
+    report = asyncio.run(_main(args))
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
@@ -0,0 +1,341 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.monitoring.kpis import EventLogReader, _event_time
+from app.monitoring.sketches import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+KPI_STORE_PATH = os.getenv("KPI_STORE_PATH", "data/kpis.sqlite3")
+# How long each resolution is kept; 0 keeps it forever.
+KPI_RETENTION_DAYS = {
+    "minute": float(os.getenv("KPI_MINUTE_RETENTION_DAYS", "7")),
+    "hour": float(os.getenv("KPI_HOUR_RETENTION_DAYS", "180")),
+    "day": float(os.getenv("KPI_DAY_RETENTION_DAYS", "0")),
+}
+# Seconds between background ingestions of the event log (0 disables).
+KPI_INGEST_INTERVAL_S = float(os.getenv("KPI_INGEST_INTERVAL_S", "60"))
+
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+DIMENSIONS = ("intent", "model", "tenant", "prompt_version")
+# Additive measures summed across rollup rows.
+MEASURES = (
+    "requests", "tool_errors", "flags", "latency_sum", "confidence_sum",
+    "prompt_tokens", "completion_tokens", "cached_tokens", "cost_usd",
+)
+# Percentile sketches in rollups use a coarser accuracy than the in-memory aggregator to stay small.
+SKETCH_ACCURACY = 0.02
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    {", ".join(f"{d} TEXT NOT NULL" for d in DIMENSIONS)},
+    {", ".join(f"{m} REAL NOT NULL DEFAULT 0" for m in MEASURES)},
+    latency_sketch TEXT,
+    PRIMARY KEY (resolution, bucket, {", ".join(DIMENSIONS)})
+);
+CREATE TABLE IF NOT EXISTS ingest_state (
+    source TEXT PRIMARY KEY,
+    position TEXT NOT NULL
+);
+"""
+
+
+def _dimensions(event: Dict) -> Tuple[str, ...]:
+    models = event.get("models")
+    values = {
+        "intent": event.get("intent"),
+        "model": "+".join(models) if models else None,
+        "tenant": event.get("tenant"),
+        "prompt_version": event.get("prompt_version"),
+    }
+    return tuple(str(values[d]) if values[d] is not None else "none" for d in DIMENSIONS)
+
+
+def _aggregate(events: Iterable[Dict]) -> Tuple[Dict[Tuple, Dict], int]:
+    # Sum events into one row per (resolution, bucket, dimensions); sampled events are re-weighted.
+    rows: Dict[Tuple, Dict] = {}
+    count = 0
+    for event in events:
+        event_time = _event_time(event)
+        if event_time is None:
+            continue
+        count += 1
+        weight = 1.0 / event.get("sample_rate", 1.0)
+        dims = _dimensions(event)
+        for resolution, width in RESOLUTIONS.items():
+            key = (resolution, int(event_time // width * width)) + dims
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = dict.fromkeys(MEASURES, 0.0)
+                row["latency_sketch"] = QuantileSketch(SKETCH_ACCURACY)
+            row["requests"] += weight
+            row["tool_errors"] += weight if event.get("tool_error") else 0.0
+            row["flags"] += weight if event.get("action") == "FLAG_FOR_HUMAN_REVIEW" else 0.0
+            row["latency_sum"] += event.get("latency_ms", 0.0) * weight
+            row["confidence_sum"] += event.get("confidence_score", 0.0) * weight
+            for measure in ("prompt_tokens", "completion_tokens", "cached_tokens", "cost_usd"):
+                row[measure] += event.get(measure, 0) * weight
+            if "latency_ms" in event:
+                row["latency_sketch"].add(event["latency_ms"], weight)
+    return rows, count
+
+
+class TimeSeriesStore:
+    def __init__(self, path: str = KPI_STORE_PATH):
+        """
+        Per-minute, per-hour and per-day KPI rollups of processed messages, stored in SQLite.
+
+        Each event is added to one row per resolution, keyed by the bucket start and the
+        dimensions (intent, model, tenant, prompt version). Rows hold additive measures (request,
+        error and flag counts, latency and confidence sums, tokens, cost) plus a mergeable latency
+        sketch, so any range can be answered from the coarsest rollup that fits instead of
+        rescanning raw logs. Old minute and hour rows are pruned by retention.
+
+        The database is opened by `open`, not on construction, so importing the app does not
+        create or touch the store.
+
+        Args:
+            path (str): The SQLite database file (":memory:" for tests).
+        """
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def open(self) -> "TimeSeriesStore":
+        """Open (and if needed create) the database."""
+        if self._conn is not None:
+            return self
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent ingesters (other workers or
+        # processes) run one at a time and each sees the position saved by the previous one.
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                self._prune()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def ingest(self, events: Iterable[Dict]) -> int:
+        """
+        Add events to the rollups. Events are pre-aggregated in memory and written in one transaction.
+
+        Returns:
+            int: The number of events ingested.
+        """
+        rows, count = _aggregate(events)
+        with self._transaction():
+            self._write_rows(rows)
+        return count
+
+    def ingest_log(self, path: str = "logs/events.jsonl") -> int:
+        """
+        Ingest the "process" events written to an event log since the last call.
+
+        The log's read position is kept in the store and saved in the same transaction as the
+        rollups, so ingestion resumes exactly where it stopped and never counts an event twice.
+
+        Returns:
+            int: The number of events ingested.
+        """
+        source = f"log:{os.path.abspath(path)}"
+        with self._transaction():
+            row = self._conn.execute("SELECT position FROM ingest_state WHERE source = ?", (source,)).fetchone()
+            reader = EventLogReader(path, **json.loads(row[0])) if row else EventLogReader(path)
+            rows, count = _aggregate(event for event in reader.read() if event.get("event") == "process")
+            self._write_rows(rows)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingest_state (source, position) VALUES (?, ?)", (source, json.dumps(reader.position()))
+            )
+        return count
+
+    def _write_rows(self, rows: Dict[Tuple, Dict]) -> None:
+        key_columns = ("resolution", "bucket") + DIMENSIONS
+        where = " AND ".join(f"{c} = ?" for c in key_columns)
+        upsert = (
+            f"INSERT INTO rollups ({', '.join(key_columns + MEASURES)}, latency_sketch)"
+            f" VALUES ({', '.join('?' * (len(key_columns) + len(MEASURES) + 1))})"
+            f" ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET "
+            + ", ".join(f"{m} = {m} + excluded.{m}" for m in MEASURES)
+            + ", latency_sketch = excluded.latency_sketch"
+        )
+        for key, row in rows.items():
+            sketch = row.pop("latency_sketch")
+            existing = self._conn.execute(f"SELECT latency_sketch FROM rollups WHERE {where}", key).fetchone()
+            if existing and existing[0]:
+                merged = QuantileSketch.from_dict(json.loads(existing[0]))
+                merged.merge(sketch)
+                sketch = merged
+            values = [row[m] for m in MEASURES]
+            self._conn.execute(upsert, list(key) + values + [json.dumps(sketch.to_dict(), separators=(",", ":"))])
+
+    def _prune(self) -> None:
+        now = time.time()
+        for resolution, days in KPI_RETENTION_DAYS.items():
+            if days:
+                self._conn.execute(
+                    "DELETE FROM rollups WHERE resolution = ? AND bucket < ?", (resolution, now - days * 86400)
+                )
+
+    def query(
+        self,
+        start: float,
+        end: float,
+        resolution: str = "auto",
+        group_by: Sequence[str] = (),
+        filters: Optional[Dict[str, str]] = None,
+    ) -> Dict:
+        """
+        Return KPIs per time bucket between `start` and `end` (epoch seconds, end exclusive).
+
+        Args:
+            start (float): Range start.
+            end (float): Range end.
+            resolution (str): "minute", "hour", "day", or "auto" to pick the finest resolution
+                that yields at most about 500 buckets.
+            group_by (Sequence[str]): Dimensions to split each bucket by.
+            filters (Optional[Dict[str, str]]): Dimension values to restrict to.
+
+        Returns:
+            Dict: The resolution used and a list of points with request counts, rates, average and
+            percentile latency, average confidence, tokens and cost.
+        """
+        if resolution == "auto":
+            resolution = next((r for r, width in RESOLUTIONS.items() if (end - start) / width <= 500), "day")
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution '{resolution}'.")
+        for dimension in list(group_by) + list(filters or {}):
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension '{dimension}'; choose from {DIMENSIONS}.")
+
+        width = RESOLUTIONS[resolution]
+        clauses = ["resolution = ?", "bucket >= ?", "bucket < ?"]
+        params: List = [resolution, int(start // width * width), end]
+        for dimension, value in (filters or {}).items():
+            clauses.append(f"{dimension} = ?")
+            params.append(value)
+        columns = ["bucket", *group_by, *(f"SUM({m})" for m in MEASURES), "GROUP_CONCAT(latency_sketch, '\n')"]
+        sql = (
+            f"SELECT {', '.join(columns)} FROM rollups WHERE {' AND '.join(clauses)}"
+            f" GROUP BY {', '.join(['bucket', *group_by])} ORDER BY bucket"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        points = []
+        for row in rows:
+            bucket, dims = row[0], row[1:1 + len(group_by)]
+            totals = dict(zip(MEASURES, row[1 + len(group_by):-1]))
+            sketch = QuantileSketch(SKETCH_ACCURACY)
+            for serialized in (row[-1] or "").split("\n"):
+                if serialized:
+                    sketch.merge(QuantileSketch.from_dict(json.loads(serialized)))
+            points.append(_point(bucket, dict(zip(group_by, dims)), totals, sketch))
+        return {"resolution": resolution, "points": points}
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.close()
+        self._conn = None
+
+
+class TimeSeriesIngester:
+    def __init__(self, store: TimeSeriesStore, path: str = "logs/events.jsonl", interval_s: float = KPI_INGEST_INTERVAL_S):
+        """
+        Periodically ingests the event log into a TimeSeriesStore in the background.
+
+        Args:
+            store (TimeSeriesStore): The store to feed.
+            path (str): The event log.
+            interval_s (float): Seconds between ingestions (0 disables the ingester).
+        """
+        self.store = store
+        self.path = path
+        self.interval_s = interval_s
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval_s > 0:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """Stop the ingester after one last ingestion, so rollups include events flushed at shutdown."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.ingest()
+
+    async def ingest(self) -> int:
+        try:
+            return await asyncio.to_thread(self.store.ingest_log, self.path)
+        except Exception as e:
+            logger.error(f"KPI ingestion from '{self.path}' failed: {e}")
+            return 0
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_s)
+            await self.ingest()
+
+
+def _point(bucket: int, dims: Dict[str, str], totals: Dict[str, float], sketch: QuantileSketch) -> Dict:
+    requests = totals["requests"]
+
+    def latency(q: float) -> Optional[float]:
+        value = sketch.quantile(q)
+        return round(value, 1) if value is not None else None
+
+    return {
+        "start": datetime.fromtimestamp(bucket, timezone.utc).isoformat(),
+        **dims,
+        "requests": round(requests),
+        "avg_latency_ms": round(totals["latency_sum"] / requests, 1),
+        "p50_latency_ms": latency(0.5),
+        "p95_latency_ms": latency(0.95),
+        "p99_latency_ms": latency(0.99),
+        "avg_confidence": round(totals["confidence_sum"] / requests, 4),
+        "tool_error_rate": round(totals["tool_errors"] / requests, 4),
+        "flag_rate": round(totals["flags"] / requests, 4),
+        "prompt_tokens": round(totals["prompt_tokens"]),
+        "completion_tokens": round(totals["completion_tokens"]),
+        "cached_tokens": round(totals["cached_tokens"]),
+        "cost_usd": round(totals["cost_usd"], 6),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the event log into the KPI rollup store.")
+    parser.add_argument("--events", default="logs/events.jsonl")
+    parser.add_argument("--store", default=KPI_STORE_PATH)
+    args = parser.parse_args()
+
+    store = TimeSeriesStore(args.store).open()
+    start = time.perf_counter()
+    ingested = store.ingest_log(args.events)
+    print(f"Ingested {ingested} events in {time.perf_counter() - start:.2f}s.")
@@ -0,0 +1,183 @@
+import argparse
+import re
+import time
+from contextvars import ContextVar
+from random import getrandbits
+from typing import Dict, List, Optional, Tuple
+
+from app.monitoring.metrics import counter, gauge, histogram
+
+stage_latency_seconds = histogram(
+    "stage_latency_seconds",
+    "Latency of each request pipeline stage (analyze, crm_fetch, kb_encode, kb_search, synthesize, serialization).",
+    ("stage",),
+)
+stage_in_flight = gauge("stage_in_flight", "Spans currently open per stage.", ("stage",))
+stage_errors_total = counter("stage_errors_total", "Spans that ended with an exception, per stage and exception type.", ("stage", "error"))
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+# Per stage, the in-flight gauge and latency histogram already bound to its label.
+_stage_metrics: Dict[str, tuple] = {}
+
+
+def _metrics_for(stage: str) -> tuple:
+    metrics = _stage_metrics.get(stage)
+    if metrics is None:
+        metrics = _stage_metrics[stage] = (stage_in_flight.labels(stage=stage), stage_latency_seconds.labels(stage=stage))
+    return metrics
+
+
+class Span:
+    __slots__ = (
+        "name", "trace_id", "sampled", "attributes", "start_ns", "duration_ns",
+        "error", "children", "_span_id", "_parent_id", "_parent", "_token", "_metrics",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool, parent: Optional["Span"]):
+        """
+        A timed section of a request, identified like an OpenTelemetry span.
+
+        Use it as a context manager (sync or inside async code): entering starts the clock and
+        makes it the current span, exiting records the stage latency histogram, the in-flight
+        gauge and, on an exception, the error counter. Finished child spans are kept on their
+        parent as (name, duration_ms) pairs, giving a per-stage breakdown of the request.
+        """
+        self.name = name
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.attributes: Optional[Dict[str, object]] = None
+        self.duration_ns = 0
+        self.error: Optional[str] = None
+        self.children: List[Tuple[str, float]] = []
+        self._span_id: Optional[str] = None
+        self._parent_id = parent_id
+        self._parent = parent
+
+    def __enter__(self) -> "Span":
+        self._metrics = _metrics_for(self.name)
+        self._metrics[0].inc()
+        self._token = _current_span.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration_ns = time.perf_counter_ns() - self.start_ns
+        _current_span.reset(self._token)
+        in_flight, latency = self._metrics
+        in_flight.dec()
+        latency.observe(self.duration_ns / 1e9)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+            stage_errors_total.inc(stage=self.name, error=self.error)
+        if self._parent is not None:
+            self._parent.children.append((self.name, self.duration_ns / 1e6))
+
+    @property
+    def span_id(self) -> str:
+        # IDs are generated on first use: most spans are never propagated or exported.
+        if self._span_id is None:
+            self._span_id = f"{getrandbits(64):016x}"
+        return self._span_id
+
+    @property
+    def parent_id(self) -> Optional[str]:
+        return self._parent.span_id if self._parent is not None else self._parent_id
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration_ns / 1e6
+
+    def set_attribute(self, key: str, value: object) -> None:
+        if self.attributes is None:
+            self.attributes = {}
+        self.attributes[key] = value
+
+    def stage_breakdown(self) -> Dict[str, float]:
+        """Return the total milliseconds spent in each direct child stage."""
+        stages: Dict[str, float] = {}
+        for name, duration_ms in self.children:
+            stages[name] = round(stages.get(name, 0.0) + duration_ms, 3)
+        return stages
+
+    def traceparent(self) -> str:
+        """Return this span's W3C `traceparent` header value, for propagating the trace downstream."""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """
+    Parse a W3C `traceparent` header.
+
+    Returns:
+        Optional[Tuple[str, str, bool]]: (trace_id, parent span_id, sampled), or None if the
+        header is missing or malformed.
+    """
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def span(name: str, traceparent: Optional[str] = None) -> Span:
+    """
+    Create a span for a pipeline stage, as a child of the current span if there is one.
+
+    Without a current span a new trace is started, continuing the remote trace from a
+    `traceparent` header when one is given.
+
+    Args:
+        name (str): The stage name, used as the metric label.
+        traceparent (Optional[str]): An incoming W3C `traceparent` header, for root spans.
+
+    Returns:
+        Span: The span, to be used as a context manager.
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        return Span(name, parent.trace_id, None, parent.sampled, parent)
+    remote = parse_traceparent(traceparent)
+    if remote:
+        return Span(name, remote[0], remote[1], remote[2], None)
+    return Span(name, f"{getrandbits(128):032x}", None, True, None)
+
+
+def current_span() -> Optional[Span]:
+    """Return the innermost open span of the current request, if any."""
+    return _current_span.get()
+
+
+def benchmark(repeat: int = 100000) -> Dict[str, float]:
+    """
+    Measure the overhead of opening and closing a span, with and without a parent.
+
+    Returns:
+        Dict[str, float]: Microseconds per span.
+    """
+    results = {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with span("benchmark_root"):
+            pass
+    results["root_span_us"] = round((time.perf_counter() - start) / repeat * 1e6, 3)
+
+    with span("benchmark_root") as root:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            with span("benchmark_child"):
+                pass
+        results["child_span_us"] = round((time.perf_counter() - start) / repeat * 1e6, 3)
+        root.children.clear()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure tracing span overhead.")
+    parser.add_argument("--repeat", type=int, default=100000)
+    args = parser.parse_args()
+    for key, value in benchmark(args.repeat).items():
+        print(f"{key}: {value}")
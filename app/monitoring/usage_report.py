@@ -0,0 +1,94 @@
+import argparse
+import json
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from app.monitoring.kpis import EventLogReader
+
+logger = logging.getLogger(__name__)
+
+GROUP_FIELDS = ("day", "intent", "tenant", "prompt_version")
+
+
+def read_process_events(path: str = "logs/events.jsonl") -> Iterable[Dict]:
+    """Yield the "process" events of an event log and its rotated archives, oldest first, skipping unparseable lines."""
+    for event in EventLogReader(path).read():
+        if event.get("event") == "process":
+            yield event
+
+
+def _group_value(event: Dict, field: str) -> str:
+    if field == "day":
+        return (event.get("timestamp") or "")[:10] or "unknown"
+    value = event.get(field)
+    return str(value) if value is not None else "none"
+
+
+def aggregate_usage(events: Iterable[Dict], group_by: Sequence[str] = ("day", "intent")) -> List[Dict]:
+    """
+    Aggregate token usage and cost of processed messages.
+
+    Events logged with a `sample_rate` are weighted by its inverse, so sampled logs report
+    estimated totals rather than only the kept fraction.
+
+    Args:
+        events (Iterable[Dict]): "process" events, as logged by the orchestrator.
+        group_by (Sequence[str]): Fields to group by, from GROUP_FIELDS.
+
+    Returns:
+        List[Dict]: One row per group, sorted by group, with request count, token totals,
+        cost and per-request averages.
+    """
+    for field in group_by:
+        if field not in GROUP_FIELDS:
+            raise ValueError(f"Cannot group by '{field}'; choose from {GROUP_FIELDS}.")
+
+    groups: Dict[Tuple[str, ...], Dict[str, float]] = defaultdict(
+        lambda: {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "cost_usd": 0.0}
+    )
+    for event in events:
+        weight = 1.0 / event.get("sample_rate", 1.0)
+        totals = groups[tuple(_group_value(event, field) for field in group_by)]
+        totals["requests"] += weight
+        totals["prompt_tokens"] += weight * event.get("prompt_tokens", 0)
+        totals["completion_tokens"] += weight * event.get("completion_tokens", 0)
+        totals["cached_tokens"] += weight * event.get("cached_tokens", 0)
+        totals["cost_usd"] += weight * event.get("cost_usd", 0.0)
+
+    rows = []
+    for key in sorted(groups):
+        totals = groups[key]
+        requests = totals["requests"]
+        rows.append({
+            **dict(zip(group_by, key)),
+            **{name: round(value) for name, value in totals.items() if name != "cost_usd"},
+            "cost_usd": round(totals["cost_usd"], 6),
+            "avg_prompt_tokens": round(totals["prompt_tokens"] / requests, 1),
+            "avg_completion_tokens": round(totals["completion_tokens"] / requests, 1),
+            "avg_cost_usd": round(totals["cost_usd"] / requests, 6),
+            "cache_hit_rate": round(totals["cached_tokens"] / totals["prompt_tokens"], 3) if totals["prompt_tokens"] else 0.0,
+        })
+    return rows
+
+
+def format_table(rows: List[Dict]) -> str:
+    """Format report rows as a fixed-width text table."""
+    if not rows:
+        return "No processed messages found."
+    columns = list(rows[0])
+    widths = {c: max(len(c), *(len(str(row[c])) for row in rows)) for c in columns}
+    lines = ["  ".join(c.ljust(widths[c]) for c in columns)]
+    lines += ["  ".join(str(row[c]).ljust(widths[c]) for c in columns) for row in rows]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report LLM token usage and cost from the event log.")
+    parser.add_argument("--events", default="logs/events.jsonl", help="Path to the JSONL event log.")
+    parser.add_argument("--by", default="day,intent", help=f"Comma-separated group fields from {GROUP_FIELDS}.")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table.")
+    args = parser.parse_args()
+
+    report = aggregate_usage(read_process_events(args.events), args.by.split(","))
+    print(json.dumps(report, indent=2) if args.json else format_table(report))
@@ -0,0 +1,70 @@
+import argparse
+import os
+import sys
+
+# Benchmarks never reach the network: the embedding model is used only if it is already cached.
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+
+from benchmarks import harness, hot_paths  # noqa: E402,F401  (hot_paths registers the benchmarks)
+
+DEFAULT_BASELINE = "benchmarks/baselines/baseline.json"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Micro-benchmarks of the hot paths.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_options(p):
+        p.add_argument("-k", "--filter", action="append", help="Only run benchmarks matching this shell pattern (repeatable).")
+        p.add_argument("--rounds", type=int, default=7, help="Timed rounds per benchmark.")
+        p.add_argument("--min-round-ms", type=float, default=50.0, help="Minimum duration of a round.")
+
+    run = sub.add_parser("run", help="Run the benchmarks and optionally save the results as a baseline.")
+    add_run_options(run)
+    run.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, help=f"Write the results as JSON (default {DEFAULT_BASELINE}).")
+
+    compare = sub.add_parser("compare", help="Run (or load) results and fail if any benchmark regressed against a baseline.")
+    add_run_options(compare)
+    compare.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results JSON.")
+    compare.add_argument("--current", help="Compare these saved results instead of running the benchmarks.")
+    compare.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown as a fraction (0.2 = 20%%).")
+
+    sub.add_parser("list", help="List the benchmarks.")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        print("\n".join(harness.REGISTRY))
+        return 0
+
+    if args.command == "compare" and not os.path.exists(args.baseline):
+        print(f"No baseline found at {args.baseline}; run `python -m benchmarks run --save` first.", file=sys.stderr)
+        return 2
+
+    if args.command == "compare" and args.current:
+        current = harness.load(args.current)
+    else:
+        current = harness.run(args.filter, args.rounds, args.min_round_ms / 1000)
+
+    if args.command == "run":
+        if args.save:
+            harness.save(current, args.save)
+            print(f"Saved {len(current['results'])} results to {args.save}.")
+        return 0
+
+    baseline = harness.load(args.baseline)
+    if baseline["meta"].get("machine") != current["meta"].get("machine") or baseline["meta"].get("python") != current["meta"].get("python"):
+        print("Warning: baseline was recorded on a different machine or Python version.", file=sys.stderr)
+    rows = harness.compare(baseline, current, args.threshold)
+    if args.filter:
+        rows = [row for row in rows if row["status"] != "missing"]
+    print(harness.format_comparison(rows))
+    regressed = [row["name"] for row in rows if row["status"] == "regressed"]
+    if regressed:
+        print(f"\n{len(regressed)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
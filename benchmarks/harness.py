@@ -0,0 +1,166 @@
+import fnmatch
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# A benchmark's setup returns the zero-argument callable to time, or raises Skip.
+Setup = Callable[[], Callable[[], object]]
+
+
+class Skip(Exception):
+    """Raised by a benchmark's setup when it cannot run here (e.g. the embedding model is unavailable)."""
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Setup
+
+
+REGISTRY: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str):
+    """Register a setup function under `name`; its return value is the operation to time."""
+    def register(setup: Setup) -> Setup:
+        REGISTRY[name] = Benchmark(name, setup)
+        return setup
+    return register
+
+
+def measure(fn: Callable[[], object], rounds: int = 7, min_round_s: float = 0.05) -> Dict[str, float]:
+    """
+    Time `fn` like timeit: calibrate a loop count so a round takes at least `min_round_s`, then
+    time `rounds` rounds with the garbage collector off.
+
+    Returns:
+        Dict[str, float]: Nanoseconds per call (median and min over rounds), the spread of the
+        rounds as a fraction of the median, and the loop and round counts.
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - start >= min_round_s or loops >= 1 << 24:
+            break
+        loops *= 2
+
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter_ns()
+            for _ in range(loops):
+                fn()
+            timings.append((time.perf_counter_ns() - start) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    median = statistics.median(timings)
+    return {
+        "median_ns": round(median, 1),
+        "min_ns": round(min(timings), 1),
+        "spread": round((max(timings) - min(timings)) / median, 3) if median else 0.0,
+        "loops": loops,
+        "rounds": rounds,
+    }
+
+
+def run(patterns: Optional[List[str]] = None, rounds: int = 7, min_round_s: float = 0.05, log=print) -> Dict:
+    """
+    Run the registered benchmarks whose names match any of `patterns` (shell-style; all by default).
+
+    Returns:
+        Dict: Machine metadata, per-benchmark results and skipped benchmarks with the reason.
+    """
+    results, skipped = {}, {}
+    for name, case in REGISTRY.items():
+        if patterns and not any(fnmatch.fnmatch(name, p) for p in patterns):
+            continue
+        try:
+            fn = case.setup()
+        except Skip as e:
+            skipped[name] = str(e)
+            log(f"{name:<40} skipped: {e}")
+            continue
+        results[name] = measure(fn, rounds, min_round_s)
+        log(f"{name:<40} {_format_ns(results[name]['median_ns']):>12}  ±{results[name]['spread']:.0%}")
+    return {"meta": machine_info(), "results": results, "skipped": skipped}
+
+
+def machine_info() -> Dict:
+    return {
+        "created": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "argv": sys.argv[1:],
+    }
+
+
+def save(report: Dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load(path: str) -> Dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = 0.2) -> List[Dict]:
+    """
+    Compare two reports benchmark by benchmark.
+
+    A benchmark regresses when its median time per call grew by more than `threshold` (0.2 = 20%)
+    over the baseline. Benchmarks present in only one report are listed with status "new" or "missing".
+
+    Returns:
+        List[Dict]: One row per benchmark with both medians, the ratio and a status
+        ("ok", "faster", "regressed", "new" or "missing").
+    """
+    rows = []
+    base, cur = baseline["results"], current["results"]
+    for name in sorted(set(base) | set(cur)):
+        if name not in cur:
+            rows.append({"name": name, "baseline_ns": base[name]["median_ns"], "current_ns": None, "ratio": None, "status": "missing"})
+            continue
+        if name not in base:
+            rows.append({"name": name, "baseline_ns": None, "current_ns": cur[name]["median_ns"], "ratio": None, "status": "new"})
+            continue
+        ratio = cur[name]["median_ns"] / base[name]["median_ns"]
+        status = "regressed" if ratio > 1 + threshold else "faster" if ratio < 1 / (1 + threshold) else "ok"
+        rows.append({"name": name, "baseline_ns": base[name]["median_ns"], "current_ns": cur[name]["median_ns"],
+                     "ratio": round(ratio, 3), "status": status})
+    return rows
+
+
+def format_comparison(rows: List[Dict]) -> str:
+    lines = [f"{'benchmark':<40} {'baseline':>12} {'current':>12} {'ratio':>7}  status"]
+    for row in rows:
+        lines.append(
+            f"{row['name']:<40} {_format_ns(row['baseline_ns']):>12} {_format_ns(row['current_ns']):>12}"
+            f" {row['ratio'] if row['ratio'] is not None else '-':>7}  {row['status']}"
+        )
+    return "\n".join(lines)
+
+
+def _format_ns(ns: Optional[float]) -> str:
+    if ns is None:
+        return "-"
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.0f} ns"
@@ -0,0 +1,260 @@
+"""Benchmarks of the request hot paths and the evaluation metrics."""
+import json
+from functools import lru_cache
+
+import numpy as np
+
+from benchmarks.harness import Skip, benchmark
+
+CORPUS_SIZES = (1_000, 10_000, 100_000)
+HISTORY_LENGTHS = (10, 100, 1000)
+EMBEDDING_DIM = 384
+
+
+def _history(length: int):
+    return [
+        {"sender": "prospect" if i % 2 else "agent",
+         "content": f"Message {i}: could you tell me more about the enterprise plan and its analytics?",
+         "timestamp": f"2024-01-01T10:{i % 60:02d}:00"}
+        for i in range(length)
+    ]
+
+
+def _request_payload(length: int = 20):
+    return {"conversation_history": _history(length), "current_prospect_message": "How much is the pro plan?", "prospect_id": "123"}
+
+
+def _response_payload():
+    return {
+        "detailed_analysis": {"intent": "inquiry", "entities": ["pro plan", "enterprise plan"], "sentiment": "neutral", "confidence": 0.9},
+        "suggested_response_draft": "Thanks for asking! The pro plan is $49 per seat per month. " * 4,
+        "internal_next_steps": [{"action": "SCHEDULE_FOLLOW_UP", "details": {"when": "next Tuesday"}}] * 2,
+        "tool_usage_log": [{
+            "tool_name": "KnowledgeAugmentationTool",
+            "function": "query_knowledge_base",
+            "input": {"query": "pricing"},
+            "output_summary": "Enterprise plan includes analytics. " * 5,
+        }] * 4,
+        "confidence_score": 0.9,
+        "reasoning_trace": "Prospect asked about pricing.",
+    }
+
+
+@lru_cache(maxsize=None)
+def _embedding_model():
+    from sentence_transformers import SentenceTransformer
+    try:
+        return SentenceTransformer("all-MiniLM-L6-v2")
+    except Exception as e:
+        raise Skip(f"embedding model unavailable ({type(e).__name__})")
+
+
+def _kb_tool(size: int, model=None):
+    # A tool over a synthetic corpus of `size` documents. The index holds random unit vectors of
+    # the model's dimension: search cost depends on corpus size and dimension, not on the content.
+    import faiss
+    from app.core.tools import KnowledgeAugmentationTool
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((size, EMBEDDING_DIM), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    tool = KnowledgeAugmentationTool.__new__(KnowledgeAugmentationTool)
+    tool.kb_docs = [{"id": i, "text": f"Document {i}"} for i in range(size)]
+    tool.crm_data = {}
+    tool.model = model
+    tool.index = faiss.IndexFlatL2(EMBEDDING_DIM)
+    tool.index.add(vectors)
+    return tool, vectors
+
+
+def _register_kb(size: int):
+    @benchmark(f"kb.query_knowledge_base[{size}]")
+    def query():
+        tool, _ = _kb_tool(size, _embedding_model())
+        return lambda: tool.query_knowledge_base("How does the enterprise plan differ from pro?")
+
+    @benchmark(f"kb.faiss_search[{size}]")
+    def search():
+        tool, vectors = _kb_tool(size)
+        query_vector = vectors[:1] + 0.01
+        return lambda: tool.index.search(query_vector, 3)
+
+
+for _size in CORPUS_SIZES:
+    _register_kb(_size)
+
+
+def _crm_tool():
+    from app.core.tools import CRM_FILE, KnowledgeAugmentationTool
+
+    tool = KnowledgeAugmentationTool.__new__(KnowledgeAugmentationTool)
+    with open(CRM_FILE, "r") as f:
+        tool.crm_data = json.load(f)
+    return tool
+
+
+@benchmark("crm.fetch_prospect_details[hit]")
+def crm_hit():
+    tool = _crm_tool()
+    prospect_id = next(iter(tool.crm_data))
+    return lambda: tool.fetch_prospect_details(prospect_id)
+
+
+@benchmark("crm.fetch_prospect_details[miss]")
+def crm_miss():
+    tool = _crm_tool()
+    return lambda: tool.fetch_prospect_details("no-such-prospect")
+
+
+def _register_history(length: int):
+    @benchmark(f"orchestrator.format_history[{length}]")
+    def format_history():
+        from app.core.llm_orchestrator import orchestrator
+        from app.models.schemas import Message
+
+        history = [Message(**message) for message in _history(length)]
+        return lambda: orchestrator._format_history(history)
+
+
+for _length in HISTORY_LENGTHS:
+    _register_history(_length)
+
+
+@benchmark("schemas.request_validate")
+def request_validate():
+    from app.models.schemas import ProcessMessageRequest
+
+    payload = _request_payload()
+    return lambda: ProcessMessageRequest.model_validate(payload)
+
+
+@benchmark("schemas.request_validate_json")
+def request_validate_json():
+    from app.models.schemas import ProcessMessageRequest
+
+    body = json.dumps(_request_payload()).encode()
+    return lambda: ProcessMessageRequest.model_validate_json(body)
+
+
+@benchmark("schemas.response_validate")
+def response_validate():
+    from app.models.schemas import ProcessMessageResponse
+
+    payload = _response_payload()
+    return lambda: ProcessMessageResponse.model_validate(payload)
+
+
+@benchmark("serialization.response_fast")
+def response_fast():
+    from app.api.serialization import model_bytes
+    from app.models.schemas import ProcessMessageResponse
+
+    response = ProcessMessageResponse.model_validate(_response_payload())
+    return lambda: model_bytes(response)
+
+
+@benchmark("serialization.response_default")
+def response_default():
+    from app.api.serialization import _default_path
+    from app.models.schemas import ProcessMessageResponse
+
+    response = ProcessMessageResponse.model_validate(_response_payload())
+    return lambda: _default_path(response)
+
+
+def _eval_dataset(copies: int = 10):
+    from app.evaluation.golden_dataset import GOLDEN_DATASET
+
+    rows = []
+    for i in range(copies):
+        for example in GOLDEN_DATASET:
+            truth = example["ground_truth"]
+            predicted = dict(truth, intent=truth["intent"] if i % 3 else "other", entities=truth["entities"][:1])
+            rows.append({"ground_truth": truth, "predicted": predicted})
+    return rows
+
+
+_REFERENCE = "Sure! The enterprise plan includes advanced analytics, dedicated support, and API access which the pro plan does not."
+_HYPOTHESIS = "The enterprise plan adds advanced analytics, dedicated support and API access compared to the pro plan."
+
+
+@benchmark("evaluation.entity_f1")
+def entity_f1():
+    from app.evaluation.evaluation import entity_f1
+    return lambda: entity_f1(["enterprise plan", "pro plan", "analytics"], ["enterprise plan", "analytics", "api"])
+
+
+@benchmark("evaluation.compute_bleu")
+def compute_bleu():
+    from app.evaluation.evaluation import compute_bleu
+    return lambda: compute_bleu(_REFERENCE, _HYPOTHESIS)
+
+
+@benchmark("evaluation.semantic_similarity")
+def semantic_similarity():
+    from app.evaluation.evaluation import semantic_similarity
+    return lambda: semantic_similarity(_REFERENCE, _HYPOTHESIS)
+
+
+@benchmark("evaluation.metrics.similarity_score")
+def similarity_score():
+    from app.evaluation.metrics import similarity_score
+    return lambda: similarity_score(_REFERENCE, _HYPOTHESIS)
+
+
+@benchmark("evaluation.metrics.compute_entity_overlap")
+def compute_entity_overlap():
+    from app.evaluation.metrics import compute_entity_overlap
+    return lambda: compute_entity_overlap(["enterprise plan", "analytics"], ["enterprise plan", "pro plan", "analytics"])
+
+
+@benchmark("evaluation.evaluate_lite[150]")
+def evaluate_lite():
+    from app.evaluation.evaluation import evaluate_lite
+    dataset = _eval_dataset()
+    return lambda: evaluate_lite(dataset)
+
+
+@benchmark("evaluation.evaluate_full[150]")
+def evaluate_full():
+    from app.evaluation.evaluation import evaluate_full
+    dataset = _eval_dataset()
+    return lambda: evaluate_full(dataset)
+
+
+def _similarity_pairs(count: int = 1_000):
+    words = _REFERENCE.split() + _HYPOTHESIS.split()
+    rng = np.random.default_rng(0)
+    texts = [" ".join(rng.choice(words, size=20)) for _ in range(200)]
+    return [texts[i] for i in rng.integers(0, 200, count)], [texts[i] for i in rng.integers(0, 200, count)]
+
+
+@benchmark("evaluation.similarity.ratio[1000]")
+def similarity_ratio():
+    from app.evaluation.similarity import SimilarityEngine
+    predicted, references = _similarity_pairs()
+    engine = SimilarityEngine("ratio")
+    return lambda: engine.scores(predicted, references)
+
+
+@benchmark("evaluation.similarity.embedding_cached[1000]")
+def similarity_embedding():
+    from app.evaluation.similarity import SimilarityEngine
+    predicted, references = _similarity_pairs()
+    engine = SimilarityEngine("embedding", model=_embedding_model(), model_name="all-MiniLM-L6-v2")
+    engine.scores(predicted, references)
+    return lambda: engine.scores(predicted, references)
+
+
+@benchmark("evaluation.bleu.per_example[1000]")
+def bleu_per_example():
+    from app.evaluation.evaluation import compute_bleu
+    hypotheses, references = _similarity_pairs()
+    return lambda: [compute_bleu(ref, hyp) for ref, hyp in zip(references, hypotheses)]
+
+
+@benchmark("evaluation.bleu.batch[1000]")
+def bleu_batch():
+    from app.evaluation.evaluation import compute_bleu_batch
+    hypotheses, references = _similarity_pairs()
+    return lambda: compute_bleu_batch(references, hypotheses)
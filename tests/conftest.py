@@ -0,0 +1,24 @@
+import random
+import pytest
+
+
+def _records(n, seed=0):
+    rng = random.Random(seed)
+    intents, entities, tools = ["pricing", "demo", "churn", "other"], list("abcdefg"), ["crm", "kb", "calendar"]
+
+    def side():
+        return {
+            "intent": rng.choice(intents),
+            "entities": rng.sample(entities, rng.randint(0, 3)) + rng.choice([[], ["a"]]),
+            "tools_to_call": rng.sample(tools, rng.randint(0, 2)),
+            "internal_next_steps": rng.sample(["follow_up", "log"], rng.randint(0, 2)),
+            "suggested_response_draft": rng.choice(["Sure.", "Thanks!", ""]),
+        }
+
+    return [{"ground_truth": side(), "predicted": side()} for _ in range(n)]
+
+
+@pytest.fixture
+def make_records():
+    """`make_records(n, seed=0)` builds n random evaluation records (some with duplicate entities)."""
+    return _records
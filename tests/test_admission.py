@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from app.core.admission import AdmissionController, Overloaded
+
+
+@pytest.mark.parametrize("crm_data,expected", [
+    ({"lead_score": 87}, "high"),
+    ({"lead_score": 72}, "medium"),
+    ({"lead_score": 10}, "low"),
+    ({"error": "Prospect ID not found"}, "low"),
+    (None, "low"),
+])
+def test_priority_for_lead_score(crm_data, expected):
+    """Priority classes follow the CRM lead score; unknown prospects are low priority."""
+    assert AdmissionController().priority_for(crm_data) == expected
+
+
+def test_queued_requests_are_served_by_priority():
+    """When a slot frees up, the highest-priority waiter is admitted first."""
+    controller = AdmissionController(max_concurrent=1, max_queue=10, max_queue_time_s=1.0)
+    order = []
+
+    async def request(priority, hold=0.01):
+        async with controller.admit(priority):
+            order.append(priority)
+            await asyncio.sleep(hold)
+
+    async def main():
+        first = asyncio.ensure_future(request("low", hold=0.05))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(request("low"), request("medium"), request("high"), first)
+
+    asyncio.run(main())
+    assert order == ["low", "high", "medium", "low"]
+
+
+def test_full_queue_preempts_lower_priority_and_sheds_equal_priority():
+    """A full queue gives its slot to a higher-priority request and rejects same-priority ones."""
+    controller = AdmissionController(max_concurrent=1, max_queue=1, max_queue_time_s=1.0)
+
+    async def hold():
+        async with controller.admit("high"):
+            await asyncio.sleep(0.05)
+
+    async def request(priority):
+        async with controller.admit(priority):
+            return priority
+
+    async def main():
+        running = asyncio.ensure_future(hold())
+        await asyncio.sleep(0.01)
+        low = asyncio.ensure_future(request("low"))
+        await asyncio.sleep(0.01)
+        high = asyncio.ensure_future(request("high"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as shed:
+            await request("high")
+        assert shed.value.reason == "queue_full"
+        results = await asyncio.gather(low, high, running, return_exceptions=True)
+        return results
+
+    low, high, _ = asyncio.run(main())
+    assert isinstance(low, Overloaded) and low.reason == "preempted"
+    assert high == "high"
+
+
+def test_queue_timeout_sheds_with_retry_after():
+    """Requests that wait longer than the queue-time SLO are shed with a Retry-After hint."""
+    controller = AdmissionController(max_concurrent=1, max_queue=10, max_queue_time_s=0.02)
+
+    async def hold():
+        async with controller.admit("high"):
+            await asyncio.sleep(0.1)
+
+    async def main():
+        running = asyncio.ensure_future(hold())
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as shed:
+            async with controller.admit("low"):
+                pass
+        await running
+        return shed.value
+
+    error = asyncio.run(main())
+    assert error.reason == "queue_timeout"
+    assert error.retry_after >= 1
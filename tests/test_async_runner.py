@@ -0,0 +1,68 @@
+import asyncio
+import json
+from app.evaluation.async_runner import AsyncEvaluationRunner
+from app.evaluation.golden_dataset import GOLDEN_DATASET
+from app.evaluation.prompt_testing import run_prompt_variant
+from app.llm.prompts import orchestration_prompt_v1, orchestration_prompt_v2
+
+
+def _echo_truth(conversation_history, current_message, prospect_id):
+    example = next(ex for ex in GOLDEN_DATASET if ex["current_prospect_message"] == current_message)
+    return {**example["ground_truth"], "confidence_score": len(current_message) / 1000}
+
+
+class RateLimitError(Exception):
+    status_code = 429
+    retry_after = 0.01
+
+
+def test_concurrent_scores_match_the_sequential_runner():
+    variants = {"v1": orchestration_prompt_v1, "v2": orchestration_prompt_v2, "truth": _echo_truth}
+    results = asyncio.run(AsyncEvaluationRunner(concurrency=5, progress=False).run(variants))
+    assert results == [run_prompt_variant(fn, name) for name, fn in variants.items()]
+
+
+def test_a_crashed_run_resumes_from_its_checkpoint(tmp_path):
+    """Failures are not checkpointed; the rerun only calls what is missing."""
+    path = str(tmp_path / "eval.jsonl")
+    calls = []
+
+    async def flaky(conversation_history, current_message, prospect_id):
+        calls.append(prospect_id)
+        if len(calls) % 3 == 0:
+            raise RuntimeError("connection reset")
+        return _echo_truth(conversation_history, current_message, prospect_id)
+
+    first = AsyncEvaluationRunner(concurrency=4, max_retries=0, checkpoint_path=path, progress=False)
+    asyncio.run(first.run({"flaky": flaky}))
+    assert first.errors
+    with open(path, "a") as f:
+        f.write('{"variant": "flaky", "exam')  # torn write
+
+    def steady(**kwargs):
+        calls.append(kwargs["prospect_id"])
+        return _echo_truth(**kwargs)
+
+    calls.clear()
+    second = AsyncEvaluationRunner(concurrency=4, max_retries=0, checkpoint_path=path, progress=False)
+    results = asyncio.run(second.run({"flaky": steady}))
+    assert len(calls) == len(first.errors) and not second.errors
+    assert results == [run_prompt_variant(_echo_truth, "flaky")]
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.endswith("}\n")]
+    assert len(records) == len(GOLDEN_DATASET)
+
+
+def test_rate_limits_are_retried():
+    attempts = {"count": 0}
+
+    def limited(**kwargs):
+        attempts["count"] += 1
+        if attempts["count"] <= 2:
+            raise RateLimitError("slow down")
+        return _echo_truth(**kwargs)
+
+    runner = AsyncEvaluationRunner(concurrency=1, requests_per_s=1000, retry_backoff_s=0.001, progress=False)
+    results = asyncio.run(runner.run({"limited": limited}, GOLDEN_DATASET[:2]))
+    assert not runner.errors and attempts["count"] == 4
+    assert results[0]["scores"]["intent_f1"] == 1
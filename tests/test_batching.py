@@ -0,0 +1,121 @@
+import asyncio
+import importlib
+from contextlib import asynccontextmanager
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.models.schemas import AnalysisResult, ProcessMessageRequest, ProcessMessageResponse
+
+
+class CountingTool:
+    """Stands in for KnowledgeAugmentationTool and records how it is called."""
+
+    def __init__(self):
+        self.crm_fetches = []
+        self.kb_batches = []
+
+    def fetch_prospect_details(self, prospect_id):
+        self.crm_fetches.append(prospect_id)
+        return {"prospect_id": prospect_id}
+
+    def query_knowledge_base_batch(self, queries, k=3):
+        self.kb_batches.append(list(queries))
+        return [[{"content": f"answer to {q}"}] for q in queries]
+
+
+def _request(message, prospect_id=None):
+    return ProcessMessageRequest(conversation_history=[], current_prospect_message=message, prospect_id=prospect_id)
+
+
+@pytest.fixture
+def batching(monkeypatch):
+    """The batching module, with a counting tool and a pipeline that uses the batch context."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    module = importlib.import_module("app.core.batching")
+    tool = CountingTool()
+    monkeypatch.setattr(module.orchestrator, "tool", tool)
+
+    async def process(request, batch=None, session=None):
+        if request.prospect_id:
+            batch.fetch_prospect_details(request.prospect_id)
+        knowledge = await batch.query_knowledge_base(request.current_prospect_message)
+        if request.current_prospect_message == "boom":
+            raise RuntimeError("LLM unavailable")
+        return ProcessMessageResponse(
+            detailed_analysis=AnalysisResult(intent="inquiry", sentiment="neutral", entities=[], confidence=0.9),
+            suggested_response_draft=knowledge[0]["content"],
+            internal_next_steps=[],
+            tool_usage_log=[],
+            confidence_score=0.9,
+        )
+
+    monkeypatch.setattr(module.orchestrator, "process", process)
+    module.counting_tool = tool
+    return module
+
+
+def test_crm_lookups_and_kb_queries_are_shared_across_items(batching):
+    requests = [_request(f"question {i}", prospect_id=str(i % 2)) for i in range(6)]
+
+    async def main():
+        return [item async for item in batching.process_batch(requests, max_concurrency=6)]
+
+    results = asyncio.run(main())
+    assert sorted(index for index, _, _ in results) == list(range(6))
+    assert all(error is None for _, _, error in results)
+    assert sorted(batching.counting_tool.crm_fetches) == ["0", "1"]
+    # Every item's query was embedded and searched in a single micro-batch.
+    assert len(batching.counting_tool.kb_batches) == 1 and len(batching.counting_tool.kb_batches[0]) == 6
+    drafts = {index: response.suggested_response_draft for index, response, _ in results}
+    assert drafts[3] == "answer to question 3"
+
+
+def test_a_failing_item_does_not_fail_the_batch(batching):
+    requests = [_request("first"), _request("boom"), _request("third")]
+
+    async def main():
+        return {index: (response, error) async for index, response, error in batching.process_batch(requests)}
+
+    results = asyncio.run(main())
+    assert isinstance(results[1][1], RuntimeError) and results[1][0] is None
+    assert results[0][0].suggested_response_draft == "answer to first" and results[2][1] is None
+
+
+def test_process_messages_streams_results_errors_and_a_summary(batching):
+    client = TestClient(importlib.import_module("app.main").app)
+    items = [{"conversation_history": [], "current_prospect_message": m} for m in ("hello", "boom", "pricing?")]
+    response = client.post("/process_messages", json={"items": items})
+    assert response.status_code == 200 and response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    summary = lines.pop()["summary"]
+    assert summary["items"] == 3 and summary["errors"] == 1
+    by_index = {line["index"]: line for line in lines}
+    assert by_index[1] == {"index": 1, "error": "LLM unavailable"}
+    assert by_index[2]["result"]["suggested_response_draft"] == "answer to pricing?"
+
+
+def test_batch_items_pass_through_admission_at_their_priority(batching, monkeypatch):
+    """A bulk call is admitted item by item, like /process_message, and shed items fail alone."""
+    from app.core.admission import Overloaded
+
+    admitted = []
+
+    @asynccontextmanager
+    async def admit(priority="low"):
+        if len(admitted) == 1:
+            admitted.append(None)
+            raise Overloaded("queue_full", 1)
+        admitted.append(priority)
+        yield
+
+    monkeypatch.setattr(batching.admission, "admit", admit)
+    monkeypatch.setattr(batching.admission, "priority_for", lambda crm: "high" if crm else "low")
+    requests = [_request("first", prospect_id="1"), _request("second"), _request("third")]
+
+    async def main():
+        return {index: error async for index, _, error in batching.process_batch(requests, max_concurrency=1)}
+
+    errors = asyncio.run(main())
+    assert admitted == ["high", None, "low"]
+    assert errors[0] is None and isinstance(errors[1], Overloaded) and errors[2] is None
@@ -0,0 +1,41 @@
+from benchmarks import harness
+
+
+def _report(**medians):
+    return {"meta": {}, "results": {name: {"median_ns": ns} for name, ns in medians.items()}}
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    """Slowdowns within the threshold pass; larger ones, and new or missing benchmarks, are reported."""
+    baseline = _report(a=100.0, b=100.0, c=100.0, gone=50.0)
+    current = _report(a=119.0, b=125.0, c=70.0, added=10.0)
+    status = {row["name"]: row["status"] for row in harness.compare(baseline, current, threshold=0.2)}
+    assert status == {"a": "ok", "b": "regressed", "c": "faster", "gone": "missing", "added": "new"}
+
+
+def test_run_times_registered_benchmarks_and_records_skips(tmp_path):
+    @harness.benchmark("test.sum")
+    def _sum():
+        return lambda: sum(range(100))
+
+    @harness.benchmark("test.skipped")
+    def _skipped():
+        raise harness.Skip("not here")
+
+    try:
+        report = harness.run(["test.*"], rounds=3, min_round_s=0.001, log=lambda _: None)
+    finally:
+        del harness.REGISTRY["test.sum"], harness.REGISTRY["test.skipped"]
+    assert set(report["results"]) == {"test.sum"} and report["skipped"] == {"test.skipped": "not here"}
+    assert report["results"]["test.sum"]["median_ns"] > 0
+
+    harness.save(report, str(tmp_path / "baseline.json"))
+    assert harness.load(str(tmp_path / "baseline.json"))["results"] == report["results"]
+
+
+def test_compare_without_a_baseline_explains_how_to_make_one(tmp_path, capsys):
+    """A missing baseline is reported before any benchmark runs, with a non-zero exit code."""
+    from benchmarks.__main__ import main
+
+    assert main(["compare", "--baseline", str(tmp_path / "missing.json")]) == 2
+    assert "python -m benchmarks run --save" in capsys.readouterr().err
@@ -0,0 +1,49 @@
+import random
+import numpy as np
+import pytest
+from app.evaluation.bleu import BleuScorer, corpus_bleu, sentence_bleu
+
+bleu_score = pytest.importorskip("nltk.translate.bleu_score")
+
+WORDS = "the a plan pro enterprise pricing support api is has and of".split()
+
+
+def _corpus(seed, size=200):
+    rng = random.Random(seed)
+
+    def sentence():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 20)))
+
+    return [[sentence() for _ in range(rng.randint(1, 3))] for _ in range(size)], [sentence() for _ in range(size)]
+
+
+@pytest.mark.parametrize("method", ["method0", "method1", "method2", "method3", "method4", "method5", "method7"])
+def test_scores_match_nltk(method):
+    """Sentence and corpus scores agree with NLTK for every smoothing method, with multiple references."""
+    references, hypotheses = _corpus(0)
+    smoothing = getattr(bleu_score.SmoothingFunction(), method)
+    split_refs = [[r.split() for r in refs] for refs in references]
+    split_hyps = [h.split() for h in hypotheses]
+    expected = [bleu_score.sentence_bleu(r, h, smoothing_function=smoothing) for r, h in zip(split_refs, split_hyps)]
+
+    scores = BleuScorer(smoothing=method).sentence_scores(references, hypotheses)
+    assert np.allclose(scores, expected, rtol=1e-9, atol=1e-12)
+    assert corpus_bleu(references, hypotheses, method) == pytest.approx(
+        bleu_score.corpus_bleu(split_refs, split_hyps, smoothing_function=smoothing), rel=1e-9
+    )
+
+
+def test_edge_cases_and_shared_tokenization():
+    """Empty and disjoint hypotheses score 0, auto_reweigh matches NLTK, and repeated texts are tokenized once."""
+    assert sentence_bleu("the pro plan", "") == 0.0
+    assert sentence_bleu("the pro plan", "an enterprise seat", "method1") == 0.0
+    assert sentence_bleu("the pro plan", "the pro plan", auto_reweigh=True) == pytest.approx(
+        bleu_score.sentence_bleu([["the", "pro", "plan"]], ["the", "pro", "plan"], auto_reweigh=True)
+    )
+
+    scorer = BleuScorer(smoothing="method4")
+    first = scorer.sentence_scores(["the pro plan has analytics"] * 3, ["the pro plan", "pro plan", "the pro plan"])
+    assert len(scorer._tokens) == 3 and len(scorer._vocab) == 5
+    assert first[0] == first[2]
+    with pytest.raises(ValueError):
+        BleuScorer(smoothing="method9")
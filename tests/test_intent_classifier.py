@@ -0,0 +1,90 @@
+import asyncio
+import importlib
+import json
+import zlib
+import numpy as np
+from app.core import intent_classifier
+from app.core.intent_classifier import IntentClassifier, LabeledExample, logged_examples, redact
+from app.core.intent_seeds import SEED_EXAMPLES
+from app.evaluation.golden_dataset import GOLDEN_DATASET
+from app.models.schemas import AnalysisResult, ProcessMessageRequest
+
+
+class BagOfWordsModel:
+    """Stands in for the embedding model: one hashed dimension per word."""
+
+    def encode(self, texts, convert_to_tensor=False):
+        vectors = np.zeros((len(texts), 256), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.strip("?.,!").encode()) % 256] += 1
+        return vectors
+
+
+def test_bootstrap_trains_on_seeds_and_logs_never_on_golden(tmp_path):
+    """The golden dataset measures the classifier, so none of its messages may be trained on."""
+    golden = GOLDEN_DATASET[0]["current_prospect_message"]
+    log = tmp_path / "events.jsonl"
+    log.write_text(json.dumps({
+        "event": "analysis", "source": "llm", "message": golden, "intent": "inquiry", "sentiment": "neutral", "confidence": 0.95,
+    }) + "\n")
+
+    classifier = IntentClassifier.bootstrap(BagOfWordsModel(), log_path=str(log))
+    texts = {e.text for e in classifier.examples}
+    assert len(texts) == len(SEED_EXAMPLES)
+    assert not texts & {entry["current_prospect_message"] for entry in GOLDEN_DATASET}
+
+    prediction = classifier.classify("Send over the contract please")
+    assert prediction.intent == "buying_signal"
+    rows = classifier.report(held_out=intent_classifier.golden_examples())
+    assert [row["threshold"] for row in rows] == [0.5, 0.6, 0.7, 0.8, 0.9]
+
+
+def test_logged_examples_keep_only_confident_valid_llm_labels(tmp_path):
+    log = tmp_path / "events.jsonl"
+    base = {"event": "analysis", "source": "llm", "intent": "objection", "sentiment": "negative", "confidence": 0.95}
+    events = [
+        dict(base, message="Too expensive for us."),
+        dict(base, message="Low confidence.", confidence=0.5),
+        dict(base, message="From the classifier.", source="classifier"),
+        dict(base, message="Unknown intent.", intent="pricing_comparison"),
+        dict(base),  # message logging was off
+        {"event": "process", "intent": "objection"},
+    ]
+    log.write_text("\n".join(json.dumps(e) for e in events) + "\nnot json\n")
+    assert logged_examples(str(log)) == [LabeledExample("Too expensive for us.", "objection", "negative")]
+    assert logged_examples(str(tmp_path / "missing.jsonl")) == []
+
+
+def test_redact_removes_contact_details():
+    redacted = redact("Reach me at jane.doe@acme.com or +1 (555) 123-4567, details on https://acme.com/x")
+    assert "jane" not in redacted and "555" not in redacted and "acme.com/x" not in redacted
+    assert redact("We need 25 seats by Q3") == "We need 25 seats by Q3"
+
+
+def test_low_confidence_predictions_fall_back_to_the_llm(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    module = importlib.import_module("app.core.llm_orchestrator")
+    orchestrator = module.orchestrator
+    monkeypatch.setattr(orchestrator, "intent_classifier", IntentClassifier(BagOfWordsModel(), intent_classifier.seed_examples()))
+    monkeypatch.setattr(module, "intent_classifier_threshold", 0.5)
+    monkeypatch.setattr(module, "intent_classifier_log_messages", False)
+    logged, llm_calls = [], []
+    monkeypatch.setattr(module, "log_event", logged.append)
+
+    async def complete_structured(stage, prompt, schema, route):
+        llm_calls.append(prompt)
+        return AnalysisResult(intent="other", sentiment="neutral", entities=[], confidence=0.9), route
+
+    monkeypatch.setattr(orchestrator, "_complete_structured", complete_structured)
+
+    def analyze(message):
+        request = ProcessMessageRequest(conversation_history=[], current_prospect_message=message)
+        return asyncio.run(orchestrator.analyze_message(request))
+
+    confident = analyze("Send over the contract and we'll get it signed this week.")
+    assert confident.intent == "buying_signal" and not llm_calls
+
+    fallback = analyze("Quantum flux capacitor")
+    assert fallback.intent == "other" and len(llm_calls) == 1
+    assert logged[-1]["event"] == "analysis" and "message" not in logged[-1]
@@ -0,0 +1,160 @@
+import asyncio
+import sqlite3
+import time
+import httpx
+import pytest
+from app.core import jobs
+from app.core.jobs import JobQueue, JobWorkerPool, validate_callback_url
+from app.models.schemas import AnalysisResult, ProcessMessageRequest, ProcessMessageResponse
+
+REQUEST = ProcessMessageRequest(conversation_history=[], current_prospect_message="What does the pro plan cost?")
+
+
+def _response(text="It is $49 per seat."):
+    return ProcessMessageResponse(
+        detailed_analysis=AnalysisResult(intent="pricing", entities=["pro plan"], sentiment="neutral", confidence=0.9),
+        suggested_response_draft=text,
+        internal_next_steps=[],
+        tool_usage_log=[],
+        confidence_score=0.9,
+    )
+
+
+def test_idempotency_keys_deduplicate_and_priority_orders_claims(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db")).open()
+    first = queue.submit(REQUEST, idempotency_key="abc")
+    assert queue.submit(REQUEST, idempotency_key="abc")["id"] == first["id"]
+    urgent = queue.submit(REQUEST, priority=5)
+    assert queue.depth() == 2
+    assert queue.claim()["id"] == urgent["id"]
+    assert queue.claim()["id"] == first["id"]
+    assert queue.claim() is None
+
+
+def test_idempotency_keys_are_scoped_per_tenant(tmp_path):
+    """Another tenant's key never matches, so its job (and stored result) is never handed out."""
+    queue = JobQueue(str(tmp_path / "jobs.db")).open()
+    mine = queue.submit(REQUEST, idempotency_key="abc", tenant="acme")
+    theirs = queue.submit(REQUEST, idempotency_key="abc", tenant="globex")
+    assert theirs["id"] != mine["id"] and theirs["tenant"] == "globex"
+    assert queue.submit(REQUEST, idempotency_key="abc", tenant="globex")["id"] == theirs["id"]
+
+
+def test_globally_unique_idempotency_keys_are_migrated(tmp_path):
+    """Queues created with a global UNIQUE key are rebuilt with per-tenant keys, keeping their jobs."""
+    path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(jobs.SCHEMA.replace("idempotency_key TEXT,", "idempotency_key TEXT UNIQUE,").split("-- ")[0])
+    conn.execute(
+        "INSERT INTO jobs (id, idempotency_key, status, payload, max_attempts, tenant, created_at, available_at)"
+        " VALUES ('old', 'abc', 'queued', ?, 3, 'acme', 0, 0)",
+        (REQUEST.model_dump_json(),),
+    )
+    conn.commit()
+    conn.close()
+
+    queue = JobQueue(path).open()
+    assert queue.submit(REQUEST, idempotency_key="abc", tenant="acme")["id"] == "old"
+    assert queue.submit(REQUEST, idempotency_key="abc", tenant="globex")["id"] != "old"
+    assert queue.claim()["id"] == "old"
+
+
+def test_failures_back_off_then_fail_permanently(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_RETRY_BACKOFF_S", 60)
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_attempts=2).open()
+    job = queue.submit(REQUEST)
+
+    assert queue.fail(queue.claim()["id"], "timeout") is True
+    retried = queue.get(job["id"])
+    assert retried["status"] == "queued" and retried["available_at"] >= time.time() + 59
+    assert queue.claim() is None  # still backing off
+
+    with queue._lock:
+        queue._conn.execute("UPDATE jobs SET available_at = 0")
+    assert queue.fail(queue.claim()["id"], "timeout again") is False
+    assert queue.get(job["id"])["status"] == "failed" and queue.get(job["id"])["error"] == "timeout again"
+
+
+def test_only_jobs_with_expired_leases_are_requeued(tmp_path):
+    """A second process must not re-run jobs a live worker is still executing."""
+    path = str(tmp_path / "jobs.db")
+    live = JobQueue(path, lease_s=60).open()
+    job = live.submit(REQUEST)
+    live.claim()
+
+    other = JobQueue(path, lease_s=60).open()
+    assert other.get(job["id"])["status"] == "running" and other.claim() is None
+    assert live.renew(job["id"]) and not other.renew(job["id"])
+
+    with live._lock:
+        live._conn.execute("UPDATE jobs SET lease_until = ?", (time.time() - 1,))
+    taken = other.claim()
+    assert taken["id"] == job["id"] and taken["attempts"] == 2
+    # The crashed-looking owner can no longer record a result over the new run.
+    assert live.complete(job["id"], _response()) is False
+    assert other.complete(job["id"], _response()) is True
+    assert other.get(job["id"])["result"]["suggested_response_draft"] == "It is $49 per seat."
+
+
+def test_shutdown_requeues_interrupted_jobs(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    queue = JobQueue(path).open()
+    job = queue.submit(REQUEST)
+    queue.claim()
+    queue.close()
+    assert JobQueue(path).open().get(job["id"])["status"] == "queued"
+
+
+@pytest.mark.parametrize("url", [
+    "http://hooks.example.com/done",
+    "https://127.0.0.1/done",
+    "https://10.0.0.5/done",
+    "https://169.254.169.254/latest/meta-data",
+    "https://[::1]/done",
+    "https://localhost/done",
+    "file:///etc/passwd",
+])
+def test_internal_callback_urls_are_rejected(tmp_path, url):
+    queue = JobQueue(str(tmp_path / "jobs.db")).open()
+    with pytest.raises(ValueError):
+        queue.submit(REQUEST, callback_url=url)
+    validate_callback_url("https://hooks.example.com/done")
+
+
+def test_workers_run_jobs_and_deliver_callbacks(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_CALLBACK_ALLOWED_HOSTS", ["hooks.example.com"])
+    monkeypatch.setattr(jobs, "JOB_RETRY_BACKOFF_S", 0)
+    delivered = []
+
+    def deliver(request):
+        delivered.append((str(request.url), request.read()))
+        return httpx.Response(200)
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(jobs.httpx, "AsyncClient", lambda **kwargs: real_client(transport=httpx.MockTransport(deliver), **kwargs))
+    queue = JobQueue(str(tmp_path / "jobs.db")).open()
+    attempts = []
+
+    async def handler(request):
+        attempts.append(request.current_prospect_message)
+        if len(attempts) == 1:
+            raise RuntimeError("LLM timeout")
+        return _response()
+
+    async def main():
+        pool = JobWorkerPool(queue, handler, workers=2)
+        pool.start()
+        job = queue.submit(REQUEST, callback_url="https://hooks.example.com/done")
+        pool.notify()
+        for _ in range(200):
+            if delivered:
+                break
+            await asyncio.sleep(0.02)
+        await pool.stop()
+        return job
+
+    job = asyncio.run(main())
+    finished = queue.get(job["id"])
+    assert finished["status"] == "succeeded" and finished["attempts"] == 2
+    assert len(delivered) == 1 and delivered[0][0] == "https://hooks.example.com/done"
+    assert b'"succeeded"' in delivered[0][1]
@@ -0,0 +1,81 @@
+import json
+import random
+from app.logging.logger import EventLogger
+from app.monitoring.kpis import EventLogReader, KPIAggregator, track_kpis, update_from_log
+from app.monitoring.sketches import QuantileSketch
+
+
+def _event(i, latency_ms):
+    return {
+        "event": "process",
+        "i": i,
+        "latency_ms": latency_ms,
+        "confidence_score": 0.5 + (i % 50) / 100,
+        "tool_error": i % 10 == 0,
+        "action": "FLAG_FOR_HUMAN_REVIEW" if i % 4 == 0 else "NO_ACTION",
+        "timestamp": f"2026-01-01T10:{i % 60:02d}:00",
+    }
+
+
+def test_track_kpis_averages():
+    events = [_event(i, 100.0 * (i + 1)) for i in range(4)]
+    kpis = track_kpis(events)
+    assert kpis["avg_latency"] == 250.0
+    assert kpis["tool_error_rate"] == 0.25 and kpis["flag_rate"] == 0.25
+
+
+def test_sketch_quantiles_are_within_relative_accuracy():
+    """Percentiles from the sketch are within 1% of the exact values."""
+    rng = random.Random(7)
+    values = sorted(rng.lognormvariate(7, 1) for _ in range(20000))
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) / exact <= 0.011
+
+
+def test_merged_aggregates_match_single_pass():
+    """Aggregating two halves and merging gives the same KPIs as one aggregator over everything."""
+    events = [_event(i, 50.0 + i) for i in range(1000)]
+    whole, left, right = KPIAggregator(), KPIAggregator(), KPIAggregator()
+    for event in events:
+        whole.add(event)
+    for event in events[::2]:
+        left.add(event)
+    for event in events[1::2]:
+        right.add(event)
+    left.merge(KPIAggregator.from_dict(json.loads(json.dumps(right.to_dict()))))
+    assert left.summary() == whole.summary()
+    assert whole.summary()["flag_rate"] == 0.25
+
+
+def test_reader_follows_rotations_without_loss_or_duplicates(tmp_path):
+    """Reading in several passes across size rotations sees every event exactly once."""
+    path = str(tmp_path / "events.jsonl")
+    checkpoint = str(tmp_path / "kpis.json")
+    event_logger = EventLogger(path, batch_size=1, max_bytes=2000, rotate_interval_s=0, backup_count=0)
+
+    seen = 0
+    for i in range(300):
+        event_logger.log(_event(i, float(i)))
+        if i % 37 == 0:
+            event_logger.flush()
+            seen = update_from_log(path, checkpoint).events
+    event_logger.close()
+
+    aggregate = update_from_log(path, checkpoint)
+    assert aggregate.events == 300
+    assert aggregate.latency_ms.max == 299.0
+    assert seen < 300
+
+
+def test_reader_skips_partial_trailing_line(tmp_path):
+    path = tmp_path / "events.jsonl"
+    path.write_text('{"event": "process"}\n{"event": "proc')
+    reader = EventLogReader(str(path))
+    assert len(list(reader.read())) == 1
+    with open(path, "a") as f:
+        f.write('ess"}\n')
+    assert list(reader.read()) == [{"event": "process"}]
@@ -0,0 +1,65 @@
+import gzip
+import json
+from app.logging.logger import EventLogger, rotated_files
+
+
+def _read(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_log_does_not_mutate_caller_and_flushes(tmp_path):
+    """Events are timestamped copies and are on disk after flush."""
+    path = str(tmp_path / "events.jsonl")
+    event_logger = EventLogger(path, flush_interval_s=60)
+    event = {"event": "process", "intent": "inquiry"}
+    assert event_logger.log(event)
+    assert event == {"event": "process", "intent": "inquiry"}
+    assert event_logger.flush()
+    records = _read(path)
+    assert records[0]["intent"] == "inquiry" and "timestamp" in records[0]
+    event_logger.close()
+
+
+def test_close_writes_everything_queued(tmp_path):
+    """Shutdown writes every queued event, in order."""
+    path = str(tmp_path / "events.jsonl")
+    event_logger = EventLogger(path, batch_size=7, flush_interval_s=60)
+    for i in range(100):
+        event_logger.log({"i": i})
+    event_logger.close()
+    assert [r["i"] for r in _read(path)] == list(range(100))
+
+
+def test_size_rotation_compresses_archives(tmp_path):
+    """Rotated files are gzip-compressed and only the newest archives are kept."""
+    path = str(tmp_path / "events.jsonl")
+    event_logger = EventLogger(path, batch_size=1, max_bytes=200, rotate_interval_s=0, backup_count=2)
+    for i in range(20):
+        event_logger.log({"i": i, "padding": "x" * 50})
+        event_logger.flush()
+    event_logger.close()
+
+    archives = rotated_files(path)
+    assert len(archives) == 2
+    archived = [json.loads(line) for archive in archives for line in gzip.open(archive, "rt")]
+    indices = [r["i"] for r in archived] + [r["i"] for r in _read(path)]
+    assert indices == sorted(indices) and indices[-1] == 19
+
+
+def test_sampling_marks_kept_records(tmp_path):
+    """With sampling, roughly the sample rate of "process" events is kept and each carries the rate."""
+    path = str(tmp_path / "events.jsonl")
+    event_logger = EventLogger(path, sample_rate=0.25)
+    for i in range(2000):
+        event_logger.log({"event": "process", "i": i})
+    for i in range(100):
+        event_logger.log({"event": "analysis", "i": i})
+    event_logger.close()
+    records = _read(path)
+    processed = [r for r in records if r["event"] == "process"]
+    assert 350 < len(processed) < 650
+    assert all(r["sample_rate"] == 0.25 for r in processed)
+    # Other event types are always kept, unmarked.
+    assert [r["i"] for r in records if r["event"] == "analysis"] == list(range(100))
+    assert not any("sample_rate" in r for r in records if r["event"] == "analysis")
@@ -0,0 +1,76 @@
+import threading
+import numpy as np
+from app.core.sessions import SessionStore
+from app.monitoring.memory import MemoryAccounting, SnapshotStore, deep_sizeof, memory_component_bytes
+
+
+def test_deep_sizeof_counts_shared_objects_once():
+    array = np.zeros(10_000)
+    assert deep_sizeof(array) >= array.nbytes
+    assert deep_sizeof({"a": array, "b": array}) < 2 * array.nbytes
+    assert deep_sizeof(["x" * 1000]) > 1000
+
+
+def test_static_components_are_measured_once_and_dynamic_ones_when_stale():
+    calls = {"static": 0, "dynamic": 0}
+
+    def measure(name):
+        def fn():
+            calls[name] += 1
+            return 100 * calls[name]
+        return fn
+
+    accounting = MemoryAccounting()
+    accounting.register("test_static", measure("static"))
+    accounting.register("test_dynamic", measure("dynamic"), static=False)
+    accounting.refresh()
+    accounting.refresh(max_age_s=3600)
+    assert calls == {"static": 1, "dynamic": 1}
+    sizes = accounting.refresh(max_age_s=0)
+    assert calls == {"static": 1, "dynamic": 2}
+    assert sizes == {"test_static": 100, "test_dynamic": 200}
+    assert memory_component_bytes.value(component="test_dynamic") == 200
+    assert accounting.report()["components"] == sizes
+
+
+def test_snapshot_diff_points_at_the_growing_allocation():
+    """Memory retained between two snapshots is attributed to the line that allocated it."""
+    store = SnapshotStore(max_snapshots=2)
+    store.start()
+    try:
+        before = store.take("before")
+        retained = [bytearray(1024) for _ in range(2000)]
+        after = store.take("after")
+        diff = store.diff(before["id"], after["id"], top=5)
+        assert diff["size_diff_bytes"] >= 2_000_000
+        assert "test_memory.py" in diff["top"][0]["location"]
+        store.take("third")
+        assert [s["label"] for s in store.list()] == ["after", "third"]
+        assert store.diff(before["id"]) is None
+    finally:
+        store.stop()
+    assert len(retained) == 2000
+
+
+def test_sessions_can_be_measured_while_they_change():
+    """Accounting walks a snapshot from its thread while the loop adds and evicts sessions."""
+    store = SessionStore(max_active=50)
+    errors, done = [], threading.Event()
+
+    def measure():
+        while not done.is_set():
+            try:
+                deep_sizeof(store.snapshot())
+            except Exception as e:
+                errors.append(e)
+                return
+
+    thread = threading.Thread(target=measure)
+    thread.start()
+    try:
+        for i in range(5000):
+            store.create(f"p{i}", conversation_id=str(i))
+    finally:
+        done.set()
+        thread.join()
+    assert not errors and len(store.snapshot()) == 50
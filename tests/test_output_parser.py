@@ -0,0 +1,33 @@
+import pytest
+from app.llm.output_parser import parse_llm_json, JSONRepairError
+
+
+@pytest.mark.parametrize("text,expected,repaired", [
+    ('{"intent": "inquiry", "confidence": 0.9}', {"intent": "inquiry", "confidence": 0.9}, False),
+    ('```json\n{"intent": "inquiry"}\n```', {"intent": "inquiry"}, True),
+    ('Sure! Here is the analysis: {"entities": ["pro plan",],} Let me know.', {"entities": ["pro plan"]}, True),
+    ('{"response": "Use {braces}, \\"quotes\\"", "next_steps": []}', {"response": 'Use {braces}, "quotes"', "next_steps": []}, False),
+])
+def test_parse_llm_json_repairs_formatting(text, expected, repaired):
+    """Fenced, prose-wrapped and trailing-comma output is repaired; valid JSON is untouched."""
+    assert parse_llm_json(text) == (expected, repaired)
+
+
+@pytest.mark.parametrize("text,expected", [
+    ('{"response": "Happy to hel', {"response": "Happy to hel"}),
+    ('{"intent": "objection", "entities": ["price", "disc', {"intent": "objection", "entities": ["price", "disc"]}),
+    ('{"intent": "objection", "sentiment":', {"intent": "objection"}),
+    ('{"next_steps": [{"action": "NO_ACTION"}, {"act', {"next_steps": [{"action": "NO_ACTION"}, {}]}),
+])
+def test_parse_llm_json_closes_truncated_output(text, expected):
+    """Truncated completions are closed or cut back to the last complete member."""
+    data, repaired = parse_llm_json(text)
+    assert repaired
+    assert data == expected
+
+
+@pytest.mark.parametrize("text", ["", "   ", "I cannot help with that."])
+def test_parse_llm_json_raises_without_json(text):
+    """Completions without any JSON value raise JSONRepairError."""
+    with pytest.raises(JSONRepairError):
+        parse_llm_json(text)
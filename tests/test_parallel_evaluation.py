@@ -0,0 +1,37 @@
+import json
+import pytest
+from app.evaluation import evaluate_full
+from app.evaluation.evaluation import evaluate
+from app.evaluation.parallel import evaluate_parallel
+from app.evaluation.streaming import evaluate_stream
+
+
+def test_results_do_not_depend_on_workers_or_chunk_size(tmp_path, make_records):
+    """Every worker count and chunk size gives the same result, for JSONL, JSON arrays and records."""
+    records = make_records(3000, seed=2)
+    jsonl_path, array_path = tmp_path / "preds.jsonl", tmp_path / "preds.json"
+    jsonl_path.write_text("\n".join(json.dumps(r) for r in records) + "\n")
+    array_path.write_text(json.dumps(records))
+
+    expected = evaluate_parallel(iter(records), "full", workers=1, chunk_size=3000)
+    assert evaluate_parallel(str(jsonl_path), "full", workers=3, chunk_size=250) == expected
+    assert evaluate_parallel(str(array_path), "full", workers=2, chunk_size=777) == expected
+    assert evaluate_parallel(iter(records), "full", workers=1, chunk_size=1) == expected
+
+
+def test_parallel_matches_the_serial_metrics(make_records):
+    records = make_records(1000, seed=3)
+    result = evaluate_parallel(iter(records), "full", workers=2, chunk_size=128)
+    streamed = evaluate_stream(iter(records), "full")
+    assert result["intent_confusion"] == streamed["intent_confusion"]
+    assert result["tools_accuracy"] == streamed["tools_accuracy"]
+    assert result["num_examples"] == 1000
+    for key, value in evaluate_full(records).items():
+        assert result[key] == pytest.approx(value, rel=1e-12)
+
+
+def test_cli_stream_and_parallel_paths_agree(tmp_path, make_records):
+    """`--stream` and `--workers N` both report the exact averages, so they agree bit for bit."""
+    path = tmp_path / "preds.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in make_records(2000, seed=4)) + "\n")
+    assert evaluate(str(path), "full", stream=True, chunk_size=300) == evaluate(str(path), "full", workers=2)
@@ -0,0 +1,53 @@
+import asyncio
+import os
+import time
+from app.evaluation.async_runner import AsyncEvaluationRunner
+from app.evaluation.prediction_cache import PredictionCache, prediction_key
+from app.evaluation.prompt_testing import run_prompt_variant
+from app.llm.prompts import orchestration_prompt_v1
+
+
+def test_keys_change_with_prompt_inputs_model_and_params():
+    inputs = {"current_message": "hi"}
+    key = prediction_key("template", inputs, "gpt-4", {"temperature": 0})
+    assert key == prediction_key("template", dict(inputs), "gpt-4", {"temperature": 0})
+    assert len({
+        key,
+        prediction_key("template v2", inputs, "gpt-4", {"temperature": 0}),
+        prediction_key("template", {"current_message": "hello"}, "gpt-4", {"temperature": 0}),
+        prediction_key("template", inputs, "gpt-4o-mini", {"temperature": 0}),
+        prediction_key("template", inputs, "gpt-4", {"temperature": 0.7}),
+    }) == 5
+
+
+def test_reruns_only_call_the_model_for_uncached_examples(tmp_path):
+    """A second run, sequential or concurrent, is served from the cache with identical scores."""
+    calls = []
+
+    def prompt(**kwargs):
+        calls.append(kwargs["prospect_id"])
+        return orchestration_prompt_v1(**kwargs)
+
+    cache = PredictionCache(str(tmp_path))
+    first = run_prompt_variant(prompt, "v1", cache)
+    assert cache.stats()["entries"] == len(calls) > 0
+
+    calls.clear()
+    assert run_prompt_variant(prompt, "v1", cache) == first
+    runner = AsyncEvaluationRunner(concurrency=4, requests_per_s=0.001, progress=False, cache=cache)
+    assert asyncio.run(runner.run({"v1": prompt})) == [first]
+    assert calls == []
+
+
+def test_prune_by_age_then_size(tmp_path):
+    cache = PredictionCache(str(tmp_path))
+    for i in range(4):
+        cache.put(f"{i:064x}", {"text": "x" * 100})
+    stale = cache._file(f"{0:064x}")
+    os.utime(stale, (time.time() - 10 * 86400,) * 2)
+
+    assert cache.prune(older_than_days=7) == 1 and cache.get(f"{0:064x}") is None
+    cache.get(f"{3:064x}")  # most recently used survives the size limit
+    size = os.path.getsize(cache._file(f"{3:064x}"))
+    assert cache.prune(max_bytes=size) == 2
+    assert cache.stats()["entries"] == 1 and cache.get(f"{3:064x}") == {"text": "x" * 100}
@@ -0,0 +1,55 @@
+import os
+import pstats
+import time
+import pytest
+import app.monitoring.profiling as profiling
+from app.monitoring.profiling import ProfilerBusy, RequestProfile, StackSampler, profile_path, resolve_profile
+
+
+def _busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+def test_sampler_records_collapsed_stacks_of_busy_code():
+    """The hot function shows up in the collapsed stacks, outermost frame first."""
+    with StackSampler(interval_ms=2) as sampler:
+        _busy_loop(0.3)
+    assert sampler.samples > 0
+    hot = [line for line in sampler.collapsed().splitlines() if "_busy_loop" in line]
+    assert hot and hot[0].startswith("MainThread;")
+    assert int(hot[0].rsplit(" ", 1)[1]) >= 1
+
+
+def test_request_profiles_are_written_one_at_a_time(tmp_path, monkeypatch):
+    """A second profile while one runs is refused; both modes write their file."""
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    cprofile_path = profile_path("cprofile")
+    with RequestProfile("cprofile", cprofile_path):
+        with pytest.raises(ProfilerBusy):
+            RequestProfile("sample", profile_path("sample")).start()
+        _busy_loop(0.05)
+    assert "_busy_loop" in str(pstats.Stats(cprofile_path).stats)
+
+    sample_path = profile_path("sample")
+    with RequestProfile("sample", sample_path):
+        _busy_loop(0.05)
+    assert os.path.exists(sample_path)
+    assert resolve_profile(os.path.basename(sample_path)) == sample_path
+    assert resolve_profile("../" + os.path.basename(sample_path)) is None
+
+
+def test_a_profiler_that_fails_to_start_releases_the_lock(tmp_path, monkeypatch):
+    """Otherwise every later profile would be refused as busy until the worker restarts."""
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+
+    class TakenProfile:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(profiling.cProfile, "Profile", TakenProfile)
+    with pytest.raises(ProfilerBusy, match="Could not start"):
+        RequestProfile("cprofile", profile_path("cprofile")).start()
+    with RequestProfile("sample", profile_path("sample")):
+        pass
@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import pytest
+from app.core.quotas import ANONYMOUS_TENANT, UNKNOWN_TENANT, QuotaExceeded, SQLiteBucketStore, TenantQuotas
+from app.llm.usage import LLMCallUsage, record_usage
+
+
+def test_tenants_come_only_from_configured_credentials():
+    """Unconfigured keys and tenant headers collapse into one tenant instead of a fresh quota each."""
+    quotas = TenantQuotas(api_keys={hashlib.sha256(b"secret").hexdigest(): "acme"}, overrides={"globex": {}})
+    assert quotas.tenant_for({"x-api-key": "secret"}) == "acme"
+    assert quotas.tenant_for({"authorization": "Bearer secret"}) == "acme"
+    assert quotas.tenant_for({"x-api-key": "guessed"}) == UNKNOWN_TENANT
+    assert quotas.tenant_for({}) == ANONYMOUS_TENANT
+    # The header is ignored unless it is trusted, and then only names configured tenants.
+    assert quotas.tenant_for({"x-tenant-id": "globex", "x-api-key": "secret"}) == "acme"
+    quotas.trust_tenant_header = True
+    assert quotas.tenant_for({"x-tenant-id": "globex", "x-api-key": "secret"}) == "globex"
+    assert quotas.tenant_for({"x-tenant-id": "random-123"}) == UNKNOWN_TENANT
+
+
+def test_request_quota_rejects_per_tenant():
+    """Each tenant has its own request bucket; an empty bucket rejects with a retry hint."""
+    quotas = TenantQuotas(requests_per_min=2, tokens_per_min=0, mode="reject")
+
+    async def request(tenant):
+        async with quotas.limit(tenant, 100):
+            pass
+
+    async def main():
+        await request("acme")
+        await request("acme")
+        with pytest.raises(QuotaExceeded) as exceeded:
+            await request("acme")
+        await request("globex")
+        return exceeded.value
+
+    error = asyncio.run(main())
+    assert error.resource == "requests"
+    assert 0 < error.retry_after <= 30
+
+
+def test_token_estimate_is_corrected_with_real_usage():
+    """Overestimates are refunded once the real usage is known, leaving room for more requests."""
+    quotas = TenantQuotas(requests_per_min=0, tokens_per_min=1000, mode="reject")
+
+    async def request():
+        async with quotas.limit("acme", 800):
+            record_usage(LLMCallUsage("analyze", "gpt-4o", "large", "v1", 150, 50, 0, 0.0))
+
+    async def main():
+        # Without the refunds only the first request would fit in the bucket.
+        await request()
+        await request()
+        with pytest.raises(QuotaExceeded) as exceeded:
+            await request()
+        return exceeded.value
+
+    assert asyncio.run(main()).resource == "tokens"
+
+
+def test_request_is_refunded_when_tokens_are_exhausted(tmp_path):
+    """A request rejected for tokens does not also use up the tenant's request quota."""
+    quotas = TenantQuotas(
+        requests_per_min=1, tokens_per_min=100, mode="reject", store=SQLiteBucketStore(str(tmp_path / "q.sqlite3"))
+    )
+
+    async def request(tokens):
+        async with quotas.limit("acme", tokens):
+            pass
+
+    async def main():
+        quotas._take("acme", "tokens", 100, 100)
+        with pytest.raises(QuotaExceeded) as exceeded:
+            await request(50)
+        assert exceeded.value.resource == "tokens"
+        await request(0)
+
+    asyncio.run(main())
+
+
+def test_queue_mode_waits_for_refill():
+    """In queue mode an over-quota request waits for the bucket to refill instead of failing."""
+    quotas = TenantQuotas(requests_per_min=600, tokens_per_min=0, mode="queue", max_wait_s=1.0)
+
+    async def main():
+        for _ in range(600):
+            async with quotas.limit("acme", 0):
+                pass
+        async with quotas.limit("acme", 0):
+            pass
+
+    asyncio.run(main())
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    """Two stores on the same file see each other's consumption, like two worker processes."""
+    path = str(tmp_path / "quotas.sqlite3")
+    first, second = SQLiteBucketStore(path), SQLiteBucketStore(path)
+    assert first.take("acme:requests", 1 / 60, 1, 1) == 0
+    assert second.take("acme:requests", 1 / 60, 1, 1) > 0
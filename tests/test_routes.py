@@ -0,0 +1,60 @@
+import importlib
+import pytest
+from fastapi.testclient import TestClient
+import hashlib
+from app.api import admin
+from app.core.jobs import JobQueue
+from app.core.quotas import quotas
+from app.monitoring.timeseries import TimeSeriesStore
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """A client for the app without its lifespan, so no workers or background tasks start."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    return TestClient(importlib.import_module("app.main").app)
+
+
+def test_kpis_require_the_admin_token(client, monkeypatch):
+    """KPIs span every tenant, so they are admin-only."""
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(importlib.import_module("app.api.routes"), "kpi_store", TimeSeriesStore(":memory:").open())
+    assert client.get("/kpis").status_code == 403
+    assert client.get("/kpis", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    response = client.get("/kpis", headers={"X-Admin-Token": "s3cret"}, params={"resolution": "hour"})
+    assert response.status_code == 200 and response.json()["resolution"] == "hour"
+
+
+def test_jobs_are_only_visible_to_their_tenant(client, monkeypatch, tmp_path):
+    """Another tenant gets a 404 for a job ID, and its own job for a reused idempotency key."""
+    routes = importlib.import_module("app.api.routes")
+    monkeypatch.setattr(routes, "job_queue", JobQueue(str(tmp_path / "jobs.db")).open())
+    monkeypatch.setattr(routes.job_workers, "notify", lambda: None)
+    keys = {"acme-key": "acme", "globex-key": "globex"}
+    monkeypatch.setattr(quotas, "api_keys", {hashlib.sha256(k.encode()).hexdigest(): t for k, t in keys.items()})
+    body = {"request": {"conversation_history": [], "current_prospect_message": "Pricing?"}, "idempotency_key": "abc"}
+
+    job_id = client.post("/jobs", json=body, headers={"X-API-Key": "acme-key"}).json()["job_id"]
+    assert client.get(f"/jobs/{job_id}", headers={"X-API-Key": "acme-key"}).status_code == 200
+    assert client.get(f"/jobs/{job_id}", headers={"X-API-Key": "globex-key"}).status_code == 404
+    assert client.post("/jobs", json=body, headers={"X-API-Key": "globex-key"}).json()["job_id"] != job_id
+
+
+def test_sessions_are_per_tenant_and_ids_are_not_reused(client, monkeypatch):
+    routes = importlib.import_module("app.api.routes")
+    monkeypatch.setattr(routes, "session_store", routes.SessionStore(max_active=10))
+    keys = {"acme-key": "acme", "globex-key": "globex"}
+    monkeypatch.setattr(quotas, "api_keys", {hashlib.sha256(k.encode()).hexdigest(): t for k, t in keys.items()})
+    acme, globex = {"X-API-Key": "acme-key"}, {"X-API-Key": "globex-key"}
+
+    assert client.post("/sessions", json={"conversation_id": "c1"}, headers=acme).status_code == 201
+    assert client.post("/sessions", json={"conversation_id": "c1"}, headers=globex).status_code == 409
+    assert client.get("/sessions/c1", headers=globex).status_code == 404
+    assert client.delete("/sessions/c1", headers=globex).status_code == 404
+    assert client.get("/sessions/c1", headers=acme).json()["conversation_id"] == "c1"
+
+
+def test_importing_the_app_does_not_open_the_kpi_store():
+    """Like the job queue, the KPI store is opened by the lifespan, not at import."""
+    routes = importlib.import_module("app.api.routes")
+    assert routes.kpi_store._conn is None and routes.job_queue._conn is None
@@ -0,0 +1,107 @@
+import asyncio
+import importlib
+import json
+from types import SimpleNamespace
+import pytest
+from app.llm import pricing
+from app.llm.pricing import estimate_cost, load_price_table
+from app.llm.routing import ModelRouter
+from app.llm.usage import track_usage
+from app.models.schemas import AnalysisResult, ProcessMessageRequest
+
+SHORT = ProcessMessageRequest(conversation_history=[], current_prospect_message="What does it cost?")
+
+
+def _analysis(confidence=0.9, intent="inquiry"):
+    return AnalysisResult(intent=intent, sentiment="neutral", entities=[], confidence=confidence)
+
+
+def _router():
+    return ModelRouter("gpt-4o-mini", "gpt-4o", max_small_chars=100, min_confidence=0.7, high_value_lead_score=80)
+
+
+def test_analysis_and_synthesis_tiers():
+    router = _router()
+    assert router.route_analysis(SHORT, 50).model == "gpt-4o-mini"
+    assert router.route_analysis(SHORT, 101).reason == "long_input"
+
+    assert router.route_synthesis(_analysis(), {"lead_score": 10}).tier == "small"
+    assert router.route_synthesis(_analysis(confidence=0.5), None).reason == "low_confidence"
+    assert router.route_synthesis(_analysis(), {"lead_score": 80}).reason == "high_value_lead"
+    assert router.route_synthesis(_analysis(intent="objection"), None).reason == "intent"
+
+
+def test_without_a_small_model_everything_uses_the_large_one():
+    router = ModelRouter(None, "gpt-4o")
+    route = router.route_analysis(SHORT, 10)
+    assert (route.tier, route.model, route.reason) == ("large", "gpt-4o", "single_model")
+    assert router.escalate("analyze", route, "low_confidence") is None
+
+
+def test_escalation_goes_from_small_to_large_once():
+    router = _router()
+    escalated = router.escalate("analyze", router.route_analysis(SHORT, 10), "invalid_output")
+    assert (escalated.tier, escalated.model, escalated.reason) == ("large", "gpt-4o", "escalated_invalid_output")
+    assert router.escalate("analyze", escalated, "invalid_output") is None
+
+
+def test_cost_math(tmp_path):
+    """Cached prompt tokens use the cached price; snapshots match their base model."""
+    # gpt-4o-mini: 0.15 prompt, 0.6 completion, 0.075 cached per 1M tokens.
+    expected = (600_000 * 0.15 + 400_000 * 0.075 + 100_000 * 0.6) / 1_000_000
+    assert estimate_cost("gpt-4o-mini-2024-07-18", 1_000_000, 100_000, cached_tokens=400_000) == pytest.approx(expected)
+    assert estimate_cost("gpt-4o-2024-08-06", 1_000_000, 0) == pytest.approx(2.5)
+
+    table = tmp_path / "prices.json"
+    table.write_text(json.dumps({"house-model": [1.0, 2.0], "gpt-4o": [5.0, 15.0, 1.0]}))
+    prices = load_price_table(str(table))
+    assert prices["house-model"] == (1.0, 2.0, 1.0)  # no cached price: cached tokens cost the prompt price
+    assert prices["gpt-4o"] == (5.0, 15.0, 1.0) and prices["gpt-4o-mini"] == pricing.DEFAULT_PRICES["gpt-4o-mini"]
+
+
+@pytest.fixture
+def orchestrator_module(monkeypatch):
+    """The orchestrator with a routed small/large router and a scripted chat client."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    module = importlib.import_module("app.core.llm_orchestrator")
+    monkeypatch.setattr(module.orchestrator, "router", _router())
+    monkeypatch.setattr(module.orchestrator, "intent_classifier", None)
+    monkeypatch.setattr(module, "log_event", lambda event: None)
+    calls, replies = [], []
+
+    async def create(model, messages, temperature, **kwargs):
+        calls.append(model)
+        usage = SimpleNamespace(prompt_tokens=1000, completion_tokens=100, prompt_tokens_details=SimpleNamespace(cached_tokens=0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=replies.pop(0)))], usage=usage)
+
+    completions = SimpleNamespace(create=create)
+    monkeypatch.setattr(module, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    module.calls, module.replies = calls, replies
+    return module
+
+
+def _reply(confidence):
+    return json.dumps({"intent": "inquiry", "sentiment": "neutral", "entities": [], "confidence": confidence})
+
+
+def test_low_confidence_small_analysis_is_redone_by_the_large_model(orchestrator_module):
+    orchestrator_module.replies.extend([_reply(0.4), _reply(0.95)])
+    with track_usage() as usage:
+        analysis = asyncio.run(orchestrator_module.orchestrator.analyze_message(SHORT))
+    assert analysis.confidence == 0.95
+    assert orchestrator_module.calls == ["gpt-4o-mini", "gpt-4o"]
+    # Both calls are paid for, each at its own model's price.
+    assert usage.cost_usd == pytest.approx(estimate_cost("gpt-4o-mini", 1000, 100) + estimate_cost("gpt-4o", 1000, 100))
+
+
+def test_invalid_small_output_is_reasked_on_the_large_model(orchestrator_module):
+    orchestrator_module.replies.extend(["not json at all", _reply(0.9)])
+    analysis = asyncio.run(orchestrator_module.orchestrator.analyze_message(SHORT))
+    assert analysis.confidence == 0.9
+    assert orchestrator_module.calls == ["gpt-4o-mini", "gpt-4o"]
+
+
+def test_confident_small_analysis_is_not_escalated(orchestrator_module):
+    orchestrator_module.replies.append(_reply(0.9))
+    asyncio.run(orchestrator_module.orchestrator.analyze_message(SHORT))
+    assert orchestrator_module.calls == ["gpt-4o-mini"]
@@ -0,0 +1,50 @@
+import json
+import pytest
+from app.api.serialization import FastJSONResponse, _default_path, dumps, model_bytes
+from app.models.schemas import LLMUsage, ProcessMessageResponse
+
+
+def _response(draft, confidence, details, usage=None, reasoning_trace=None):
+    return ProcessMessageResponse(
+        detailed_analysis={"intent": "inquiry", "entities": ["pro plan", "Zürich office"], "sentiment": "neutral", "confidence": confidence},
+        suggested_response_draft=draft,
+        internal_next_steps=[{"action": "SCHEDULE_FOLLOW_UP", "details": details}, {"action": "NO_ACTION", "details": None}],
+        tool_usage_log=[{
+            "tool_name": "KnowledgeAugmentationTool",
+            "function": "query_knowledge_base",
+            "input": {"query": "pricing", "k": 3, "filters": None},
+            "output_summary": "Enterprise includes analytics.",
+            "usage": usage,
+        }],
+        confidence_score=confidence,
+        reasoning_trace=reasoning_trace,
+    )
+
+
+@pytest.mark.parametrize("response", [
+    _response("Thanks!", 0.9, {"when": "next Tuesday"}),
+    _response("Ünïcödé — “quotes”, emoji 🚀 and a \"quoted\" \\ backslash\nnew line", 0.1, {"nested": {"list": [1, 2.5, True]}}),
+    _response("", 0.0, {}, reasoning_trace="Prospect asked about pricing."),
+])
+def test_fast_path_bytes_match_the_default_path(response):
+    """Switching routes to FastJSONResponse must not change a single byte clients receive."""
+    assert model_bytes(response) == _default_path(response)
+    assert FastJSONResponse(response).body == _default_path(response)
+
+
+def test_tiny_floats_are_formatted_differently_but_parse_the_same():
+    """pydantic-core writes 1e-7 where json.dumps writes 1e-07; clients decode the same value."""
+    response = _response("ok", 1e-7, {"rate": 2.5e-05})
+    fast, default = model_bytes(response), _default_path(response)
+    assert fast != default and json.loads(fast) == json.loads(default)
+
+
+def test_fast_path_matches_with_llm_usage_entries():
+    usage = LLMUsage(prompt_tokens=812, completion_tokens=143, cached_tokens=512, cost_usd=0.0034225)
+    response = _response("ok", 0.5, {"a": 1}, usage=usage)
+    assert model_bytes(response) == _default_path(response)
+
+
+def test_dumps_matches_compact_json():
+    data = {"index": 3, "error": "Tenant 'acme' exceeded — retry", "items": [1.5, None, True]}
+    assert dumps(data) == json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
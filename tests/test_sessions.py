@@ -0,0 +1,143 @@
+import asyncio
+import importlib
+from datetime import datetime
+import pytest
+from app.core.sessions import SessionExists, SessionStore
+from app.models.schemas import Message, SessionMessageRequest
+
+
+def _message(content, sender="agent"):
+    return Message(sender=sender, content=content, timestamp=datetime(2024, 1, 1))
+
+
+@pytest.fixture
+def orchestrator_module(monkeypatch):
+    """The orchestrator module, with its pipeline replaced by `stub` (set by each test)."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    module = importlib.import_module("app.core.llm_orchestrator")
+    calls = []
+
+    async def process(request, batch=None, session=None):
+        calls.append(session.history_text)
+        return await module.stub(request, session)
+
+    monkeypatch.setattr(module.orchestrator, "process", process)
+    module.calls = calls
+    return module
+
+
+def test_sessions_are_evicted_to_the_spill_and_restored(tmp_path):
+    store = SessionStore(max_active=2, spill_path=str(tmp_path / "sessions.db"))
+    first = store.create("p1", [_message("hello")], conversation_id="a")
+    store.create("p2", conversation_id="b")
+    store.create("p3", conversation_id="c")
+    assert len(store) == 2 and "a" not in store._sessions
+
+    restored = store.get("a")
+    assert restored is not first
+    assert restored.history_text == first.history_text and restored.prospect_id == "p1"
+    assert store.get("missing") is None
+    assert store.delete("a") and store.get("a") is None
+
+
+def test_sessions_in_use_are_not_evicted_until_released(tmp_path):
+    """Evicting a held session would let a second copy with its own lock be restored."""
+    store = SessionStore(max_active=1, spill_path=str(tmp_path / "sessions.db"))
+    store.create(conversation_id="a")
+    store.create(conversation_id="b")
+    with store.use("a") as held:
+        with store.use("b"):
+            assert len(store) == 2
+        # "b" was released and is the only candidate, even though "a" is older.
+        assert list(store._sessions) == ["a"] and store.get("a") is held
+    store.get("b")
+    assert list(store._sessions) == ["b"]
+    with store.use("missing") as session:
+        assert session is None
+
+
+def test_existing_ids_are_not_replaced_and_sessions_are_per_tenant(tmp_path):
+    """A reused ID, even of a spilled session, is rejected; other tenants see the session as missing."""
+    store = SessionStore(max_active=1, spill_path=str(tmp_path / "sessions.db"))
+    store.create("p1", conversation_id="a", tenant="acme")
+    store.create("p2", conversation_id="b", tenant="acme")
+    for conversation_id in ("a", "b"):
+        with pytest.raises(SessionExists):
+            store.create(conversation_id=conversation_id, tenant="globex")
+
+    assert store.get("a", "globex") is None and store.get("a", "acme").prospect_id == "p1"
+    with store.use("a", "globex") as session:
+        assert session is None
+    assert not store.delete("a", "globex") and not store.delete("b", "globex")
+    assert store.delete("b", "acme") and store.get("b") is None
+
+
+def test_async_operations_with_a_spill_run_in_a_thread(tmp_path, monkeypatch):
+    """With spilling enabled, store I/O is kept off the event loop."""
+    store = SessionStore(max_active=1, spill_path=str(tmp_path / "sessions.db"))
+    offloaded = []
+
+    async def to_thread(fn, *args):
+        offloaded.append(fn.__name__)
+        return fn(*args)
+
+    monkeypatch.setattr(asyncio, "to_thread", to_thread)
+
+    async def main():
+        await store.create_async("p1", conversation_id="a", tenant="acme")
+        await store.create_async("p2", conversation_id="b", tenant="acme")
+        async with store.use_async("a", "acme") as session:
+            assert session.prospect_id == "p1"
+        return await store.get_async("b", "acme"), await store.delete_async("a", "acme")
+
+    restored, deleted = asyncio.run(main())
+    assert restored.prospect_id == "p2" and deleted
+    assert offloaded == ["create", "create", "_hold", "_release", "get", "delete"]
+
+
+def test_turns_are_serialized(orchestrator_module):
+    async def stub(request, session):
+        await asyncio.sleep(0.01)
+        return request.current_prospect_message
+
+    orchestrator_module.stub = stub
+    store = SessionStore(max_active=10)
+    session = store.create("p1", conversation_id="a")
+
+    async def main():
+        return await asyncio.gather(*(
+            orchestrator_module.process_session_message(
+                session, SessionMessageRequest(new_messages=[_message(f"reply {i}")], current_prospect_message=f"question {i}")
+            )
+            for i in range(3)
+        ))
+
+    assert asyncio.run(main()) == ["question 0", "question 1", "question 2"]
+    assert [m.content for m in session.messages] == [
+        "reply 0", "question 0", "reply 1", "question 1", "reply 2", "question 2"
+    ]
+    # Each turn saw the previous turn's messages.
+    assert "question 0" in orchestrator_module.calls[1] and "question 1" in orchestrator_module.calls[2]
+
+
+def test_a_failed_turn_leaves_the_session_unchanged(orchestrator_module):
+    """A client retrying a failed turn does not get its new messages appended twice."""
+    failures = [RuntimeError("LLM unavailable")]
+
+    async def stub(request, session):
+        if failures:
+            raise failures.pop()
+        return "ok"
+
+    orchestrator_module.stub = stub
+    session = SessionStore(max_active=10).create("p1", [_message("hi", "prospect")], conversation_id="a")
+    before = (list(session.messages), session.history_text)
+    request = SessionMessageRequest(new_messages=[_message("our reply")], current_prospect_message="and pricing?")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(orchestrator_module.process_session_message(session, request))
+    assert (session.messages, session.history_text) == before
+
+    assert asyncio.run(orchestrator_module.process_session_message(session, request)) == "ok"
+    assert [m.content for m in session.messages] == ["hi", "our reply", "and pricing?"]
+    assert session.history_text.count("our reply") == 1
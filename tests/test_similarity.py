@@ -0,0 +1,67 @@
+import zlib
+import numpy as np
+import pytest
+from app.evaluation.metrics import similarity_score
+from app.evaluation.prompt_testing import run_prompt_variant
+from app.evaluation.similarity import EmbeddingCache, SimilarityEngine
+from app.llm.prompts import orchestration_prompt_v1
+
+
+class BagOfWordsModel:
+    """A deterministic stand-in encoder: hashed word counts."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.encoded.extend(texts)
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % 64] += 1
+        return vectors
+
+
+def test_batch_scores_are_cosines_and_each_text_is_encoded_once():
+    model = BagOfWordsModel()
+    engine = SimilarityEngine("embedding", model=model, model_name="bow")
+    predicted = ["the pro plan", "enterprise has analytics", "the pro plan"]
+    references = ["the pro plan", "analytics has enterprise", "something else entirely"]
+    scores = engine.scores(predicted, references)
+
+    assert scores[0] == pytest.approx(1.0) and scores[1] == pytest.approx(1.0)
+    assert scores[2] < 0.5
+    assert np.allclose(np.diag(engine.matrix(predicted, references)), scores)
+    assert sorted(model.encoded) == sorted(set(predicted + references))
+    engine.scores(references, predicted)
+    assert len(model.encoded) == 4
+
+
+def test_embeddings_persist_across_runs(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    first = SimilarityEngine("embedding", model=BagOfWordsModel(), model_name="bow", cache=EmbeddingCache(path))
+    expected = first.scores(["a b c"], ["a b d"])
+    first.cache.close()
+
+    model = BagOfWordsModel()
+    second = SimilarityEngine("embedding", model=model, model_name="bow", cache=EmbeddingCache(path))
+    assert np.array_equal(second.scores(["a b c"], ["a b d"]), expected)
+    assert model.encoded == []
+
+
+def test_cache_keys_are_per_model(tmp_path):
+    """Two models on one cache never share embeddings, so an unnamed model is refused."""
+    with pytest.raises(ValueError):
+        SimilarityEngine("embedding", model=BagOfWordsModel())
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    SimilarityEngine("embedding", model=BagOfWordsModel(), model_name="bow-a", cache=cache).scores(["a b"], ["c d"])
+    other = BagOfWordsModel()
+    SimilarityEngine("embedding", model=other, model_name="bow-b", cache=cache).scores(["a b"], ["c d"])
+    assert sorted(other.encoded) == ["a b", "c d"]
+
+
+def test_ratio_method_keeps_the_existing_scores():
+    pairs = (["Sure, here are the plans.", "Hello"], ["Sure! Here are our plans.", "Goodbye"])
+    assert SimilarityEngine("ratio").scores(*pairs).tolist() == [similarity_score(a, b) for a, b in zip(*pairs)]
+    assert run_prompt_variant(orchestration_prompt_v1, "v1", similarity=SimilarityEngine("ratio")) == \
+        run_prompt_variant(orchestration_prompt_v1, "v1")
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import httpx
+from app.core.intent_classifier import GOLDEN_LABELS
+from app.evaluation.golden_dataset import GOLDEN_DATASET
+from app.monitoring.simulator import (
+    FakeLLMClient, RequestResult, arrival_offsets, build_report, load_workload, request_body, run_closed_loop, run_open_loop
+)
+
+
+async def _echo_app(scope, receive, send):
+    # A minimal ASGI target: fails requests for prospect "fail", answers the rest.
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    status = 500 if json.loads(body).get("prospect_id") == "fail" else 200
+    await send({"type": "http.response.start", "status": status, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def test_arrival_offsets_keep_the_mean_rate():
+    """Every arrival process spreads 100 requests at 50/s over roughly two seconds."""
+    assert arrival_offsets("constant", 50, 100)[-1] == 99 / 50
+    bursts = arrival_offsets("burst", 50, 100, burst_size=10)
+    assert bursts[:10] == [0.0] * 10 and bursts[10] == 0.2
+    poisson = arrival_offsets("poisson", 50, 100, seed=3)
+    assert poisson == sorted(poisson) and 1.0 < poisson[-1] < 3.0
+
+
+def test_fake_llm_answers_with_golden_ground_truth():
+    """Analysis prompts that contain a golden message get that example's intent, as a pipeline label."""
+    example = GOLDEN_DATASET[0]
+    llm = FakeLLMClient(latency_ms=0, jitter=0)
+    prompt = f'Analyze the following message.\nCURRENT MESSAGE:\n"{example["current_prospect_message"]}"'
+    response = asyncio.run(llm.chat.completions.create(model="m", messages=[{"role": "user", "content": prompt}]))
+    intent, sentiment = GOLDEN_LABELS[example["ground_truth"]["intent"]]
+    analysis = json.loads(response.choices[0].message.content)
+    assert (analysis["intent"], analysis["sentiment"]) == (intent.value, sentiment.value) == ("inquiry", "neutral")
+    assert response.usage.prompt_tokens > 0
+
+
+def test_replayed_bodies_are_unique_unless_asked_otherwise():
+    """Cycling 15 golden bodies must not send identical requests that the server would coalesce."""
+    workload = load_workload()
+    bodies = [request_body(workload, i)["current_prospect_message"] for i in range(3 * len(workload))]
+    assert len(set(bodies)) == len(bodies)
+    assert bodies[0].startswith(workload[0]["current_prospect_message"])
+    assert request_body(workload, len(workload), vary=False) is workload[0]
+
+
+def test_open_and_closed_loop_runs_report_errors():
+    """Both load shapes send every request; failures are broken down by status code."""
+    workload = load_workload() + [{"prospect_id": "fail"}]
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=_echo_app), base_url="http://test") as client:
+            open_loop = await run_open_loop(client, workload, arrival_offsets("constant", 1000, len(workload)))
+            closed_loop = await run_closed_loop(client, workload, concurrency=4, count=2 * len(workload))
+        return open_loop, closed_loop
+
+    open_loop, closed_loop = asyncio.run(run())
+    assert len(open_loop) == len(workload) and len(closed_loop) == 2 * len(workload)
+    report = build_report(closed_loop, 1.0)
+    assert report["succeeded"] == 2 * len(GOLDEN_DATASET)
+    assert report["errors"] == {"500": 2}
+
+
+def test_report_collects_stage_timings_of_its_own_requests():
+    results = [RequestResult("a", 10.0, 200), RequestResult("b", 30.0, 200)]
+    events = [
+        {"trace_id": "a", "stages": {"analyze": 4.0}},
+        {"trace_id": "b", "stages": {"analyze": 8.0}},
+        {"trace_id": "other", "stages": {"analyze": 500.0}},
+    ]
+    report = build_report(results, 2.0, events)
+    assert report["throughput_rps"] == 1.0
+    assert report["latency_ms"]["p50"] == 10.0 and report["latency_ms"]["max"] == 30.0
+    assert report["stages_ms"]["analyze"]["max"] == 8.0
@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+from app.core.singleflight import SingleFlight, request_key, coalesced_total
+from app.models.schemas import ProcessMessageRequest
+
+
+def test_request_key_is_canonical():
+    """Requests that parse to the same model hash the same regardless of key order."""
+    a = ProcessMessageRequest(conversation_history=[], current_prospect_message="Pricing?", prospect_id="1")
+    b = ProcessMessageRequest(prospect_id="1", current_prospect_message="Pricing?", conversation_history=[])
+    c = ProcessMessageRequest(conversation_history=[], current_prospect_message="Pricing?", prospect_id="2")
+    assert request_key(a) == request_key(b)
+    assert request_key(a) != request_key(c)
+
+
+def test_concurrent_calls_share_one_execution():
+    """Concurrent callers with the same key get the same result from a single call."""
+    flight = SingleFlight("test_share")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return object()
+
+    async def main():
+        return await asyncio.gather(*[flight.do("k", work) for _ in range(5)])
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert coalesced_total.value(group="test_share") == 4
+    assert flight.in_flight() == 0
+
+
+def test_errors_propagate_and_are_not_cached():
+    """Every waiter sees the error, and the next call runs again."""
+    flight = SingleFlight("test_errors")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        results = await asyncio.gather(flight.do("k", work), flight.do("k", work), return_exceptions=True)
+        with pytest.raises(ValueError):
+            await flight.do("k", work)
+        return results
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert len(calls) == 2
+
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    """Cancelling one waiter leaves the execution running for the others; the last one cancels it."""
+    flight = SingleFlight("test_cancel")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "done"
+
+        lone = asyncio.ensure_future(flight.do("other", work))
+        await asyncio.sleep(0.01)
+        shared = flight._flights["other"].task
+        lone.cancel()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return first.cancelled(), shared.cancelled()
+
+    first_cancelled, shared_cancelled = asyncio.run(main())
+    assert first_cancelled
+    assert shared_cancelled
+
+
+def test_identical_requests_from_different_tenants_are_not_merged(monkeypatch):
+    """Each tenant runs (and is billed for) its own pipeline; the same tenant still shares one."""
+    import importlib
+    from app.llm.usage import current_tenant, track_usage
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    module = importlib.import_module("app.core.llm_orchestrator")
+    runs = []
+
+    async def process(request, batch=None):
+        runs.append(current_tenant())
+        await asyncio.sleep(0.01)
+        return current_tenant()
+
+    monkeypatch.setattr(module.orchestrator, "process", process)
+    request = ProcessMessageRequest(conversation_history=[], current_prospect_message="Pricing?")
+
+    async def call(tenant):
+        with track_usage(tenant):
+            return await module.process_message_pipeline(request)
+
+    async def main():
+        return await asyncio.gather(call("acme"), call("globex"), call("acme"))
+
+    assert asyncio.run(main()) == ["acme", "globex", "acme"]
+    assert sorted(runs) == ["acme", "globex"]
@@ -0,0 +1,30 @@
+import json
+import pytest
+from app.evaluation import evaluate_full, evaluate_lite
+from app.evaluation.streaming import evaluate_stream, iter_records
+
+
+@pytest.mark.parametrize("mode,reference", [("lite", evaluate_lite), ("full", evaluate_full)])
+def test_streaming_matches_the_in_memory_metrics_exactly(mode, reference, make_records):
+    records = make_records(2500)
+    result = evaluate_stream(iter(records), mode, chunk_size=333)
+    expected = reference(records)
+    assert {k: result[k] for k in expected} == expected
+    assert result["num_examples"] == 2500
+    assert sum(map(sum, result["intent_confusion"]["matrix"])) == 2500
+
+
+def test_json_arrays_and_jsonl_are_read_incrementally(tmp_path, make_records):
+    """Records split across read blocks decode the same as a whole-file json.load."""
+    records = make_records(200, seed=1)
+    array_path, jsonl_path = tmp_path / "preds.json", tmp_path / "preds.jsonl"
+    array_path.write_text(" \n" + json.dumps(records, indent=2))
+    jsonl_path.write_text("\n".join(json.dumps(r) for r in records) + "\n\n")
+
+    assert list(iter_records(str(array_path), block_size=64)) == records
+    assert list(iter_records(str(jsonl_path))) == records
+    assert evaluate_stream(str(array_path), "full", chunk_size=50) == evaluate_stream(str(jsonl_path), "full")
+
+    (tmp_path / "cut.json").write_text(json.dumps(records)[:-20])
+    with pytest.raises(ValueError):
+        list(iter_records(str(tmp_path / "cut.json"), block_size=64))
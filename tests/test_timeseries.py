@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from app.logging.logger import EventLogger
+from app.monitoring.timeseries import TimeSeriesStore
+
+
+def _event(when, intent, latency_ms, tenant="acme"):
+    return {
+        "event": "process",
+        "timestamp": when.isoformat(),
+        "intent": intent,
+        "models": ["gpt-4o-mini"],
+        "tenant": tenant,
+        "prompt_version": "v1",
+        "latency_ms": latency_ms,
+        "confidence_score": 0.8,
+        "tool_error": latency_ms > 900,
+        "action": "NO_ACTION",
+        "prompt_tokens": 100,
+        "completion_tokens": 20,
+        "cost_usd": 0.001,
+    }
+
+
+def test_rollups_answer_every_resolution():
+    """The same events are counted identically at minute, hour and day resolution."""
+    store = TimeSeriesStore(":memory:").open()
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    events = [_event(now - timedelta(minutes=i), "inquiry" if i % 2 else "objection", 100.0 * (i + 1)) for i in range(10)]
+    assert store.ingest(events) == 10
+
+    start, end = (now - timedelta(days=2)).timestamp(), (now + timedelta(days=1)).timestamp()
+    for resolution in ("minute", "hour", "day"):
+        points = store.query(start - 86400, end, resolution)["points"]
+        assert sum(p["requests"] for p in points) == 10
+        assert sum(p["prompt_tokens"] for p in points) == 1000
+
+    by_intent = store.query(start - 86400, end, "day", group_by=["intent"])["points"]
+    assert {p["intent"]: p["requests"] for p in by_intent} == {"inquiry": 5, "objection": 5}
+    only_inquiry = store.query(start - 86400, end, "day", filters={"intent": "inquiry"})["points"]
+    assert sum(p["requests"] for p in only_inquiry) == 5
+
+
+def test_latency_percentiles_merge_across_buckets():
+    """Percentiles over several buckets come from merged sketches, within the sketch accuracy."""
+    store = TimeSeriesStore(":memory:").open()
+    now = datetime.utcnow()
+    store.ingest([_event(now - timedelta(minutes=i % 30), "inquiry", float(i + 1)) for i in range(1000)])
+    store.ingest([_event(now, "inquiry", 2000.0)])
+    [point] = store.query((now - timedelta(hours=2)).timestamp(), (now + timedelta(hours=1)).timestamp(), "day")["points"]
+    assert point["requests"] == 1001
+    assert abs(point["p50_latency_ms"] - 501) / 501 <= 0.03
+    assert point["tool_error_rate"] == round(101 / 1001, 4)
+
+
+def test_log_ingestion_resumes_without_double_counting(tmp_path):
+    """Ingesting the log twice only adds events written in between."""
+    path = str(tmp_path / "events.jsonl")
+    store = TimeSeriesStore(str(tmp_path / "kpis.sqlite3")).open()
+    event_logger = EventLogger(path)
+    now = datetime.utcnow()
+    for i in range(5):
+        event_logger.log({k: v for k, v in _event(now, "inquiry", 100.0).items() if k != "timestamp"})
+    event_logger.log({"event": "other"})
+    event_logger.flush()
+    assert store.ingest_log(path) == 5
+    assert store.ingest_log(path) == 0
+
+    event_logger.log({k: v for k, v in _event(now, "inquiry", 100.0).items() if k != "timestamp"})
+    event_logger.close()
+    assert store.ingest_log(path) == 1
+    points = store.query(now.timestamp() - 86400, now.timestamp() + 86400, "hour")["points"]
+    assert sum(p["requests"] for p in points) == 6
@@ -0,0 +1,65 @@
+import asyncio
+import importlib
+import pytest
+from app.monitoring.metrics import MetricsRegistry, Counter, Histogram, render_prometheus
+from app.models.schemas import ProcessMessageRequest
+from app.monitoring.tracing import parse_traceparent, span, current_span
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01", ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True)),
+    ("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-00", ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", False)),
+    ("00-00000000000000000000000000000000-00f067aa0ba902b7-01", None),
+    ("garbage", None),
+    (None, None),
+])
+def test_parse_traceparent(header, expected):
+    """Valid W3C traceparent headers are parsed; invalid or all-zero IDs are ignored."""
+    assert parse_traceparent(header) == expected
+
+
+def test_spans_nest_and_continue_remote_trace():
+    """Child spans share the root's trace ID and report their durations to the parent."""
+    header = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    with span("test_root", header) as root:
+        with span("test_child") as child:
+            assert current_span() is child
+        with pytest.raises(RuntimeError):
+            with span("test_child"):
+                raise RuntimeError("boom")
+    assert current_span() is None
+    assert root.parent_id == "00f067aa0ba902b7"
+    assert child.trace_id == root.trace_id and child.parent_id == root.span_id
+    assert list(root.stage_breakdown()) == ["test_child"]
+    assert root.traceparent().startswith("00-4bf92f3577b34da6a3ce929d0e0e4736-")
+
+
+def test_render_prometheus():
+    """Counters and histograms are rendered in the text exposition format with escaped labels."""
+    registry = MetricsRegistry()
+    registry.get_or_create(Counter, "requests_total", "Requests.", ("path",)).inc(path='a"b')
+    registry.get_or_create(Histogram, "latency_seconds", "Latency.", buckets=(0.1, 1.0)).observe(0.5)
+    text = render_prometheus(registry)
+    assert '# TYPE requests_total counter\nrequests_total{path="a\\"b"} 1\n' in text
+    assert 'latency_seconds_bucket{le="0.1"} 0\nlatency_seconds_bucket{le="1"} 1\nlatency_seconds_bucket{le="+Inf"} 1\n' in text
+    assert "latency_seconds_sum 0.5\nlatency_seconds_count 1\n" in text
+
+
+def test_failed_requests_still_log_a_process_event(monkeypatch):
+    """The process event is logged in `finally`, so failures show up in latency and cost KPIs."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    module = importlib.import_module("app.core.llm_orchestrator")
+    logged = []
+    monkeypatch.setattr(module, "log_event", logged.append)
+
+    async def fail(request, batch=None, session=None):
+        with span("analyze"):
+            raise RuntimeError("LLM unavailable")
+
+    monkeypatch.setattr(module.orchestrator, "_process", fail)
+    request = ProcessMessageRequest(conversation_history=[], current_prospect_message="Hi")
+    with pytest.raises(RuntimeError):
+        asyncio.run(module.orchestrator.process(request))
+    event = logged[-1]
+    assert event["event"] == "process" and event["error"] == "RuntimeError: LLM unavailable"
+    assert "analyze" in event["stages"] and "intent" not in event
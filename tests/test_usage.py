@@ -0,0 +1,54 @@
+import gzip
+import json
+import pytest
+from app.llm.pricing import estimate_cost
+from app.llm.usage import LLMCallUsage, record_usage, track_usage
+from app.monitoring.usage_report import aggregate_usage, read_process_events
+
+
+def test_cached_prompt_tokens_are_billed_at_the_cached_price():
+    """gpt-4o bills cached prompt tokens at half the normal prompt price."""
+    assert estimate_cost("gpt-4o", 1_000_000, 0) == pytest.approx(2.5)
+    assert estimate_cost("gpt-4o", 1_000_000, 0, cached_tokens=1_000_000) == pytest.approx(1.25)
+    assert estimate_cost("gpt-4o-2024-08-06", 0, 1_000_000) == pytest.approx(10.0)
+    assert estimate_cost("unknown-model", 1000, 1000) == 0.0
+
+
+def test_nested_usage_scopes_inherit_tenant_and_see_every_call():
+    """A call is counted in the innermost scope and all enclosing ones."""
+    call = LLMCallUsage("analyze", "gpt-4o", "large", "v1", 100, 20, 40, 0.001)
+    with track_usage("acme") as outer:
+        with track_usage() as inner:
+            record_usage(call)
+        record_usage(call)
+    assert inner.tenant == "acme"
+    assert (inner.prompt_tokens, outer.prompt_tokens) == (100, 200)
+    assert outer.by_stage()["analyze"]["cached_tokens"] == 80
+
+
+def test_aggregate_usage_by_day_and_intent():
+    """The report sums tokens and cost per group and derives per-request averages."""
+    events = [
+        {"timestamp": "2026-01-01T10:00:00", "intent": "inquiry", "prompt_tokens": 100, "completion_tokens": 10, "cached_tokens": 50, "cost_usd": 0.01},
+        {"timestamp": "2026-01-01T11:00:00", "intent": "inquiry", "prompt_tokens": 300, "completion_tokens": 30, "cached_tokens": 0, "cost_usd": 0.03},
+        {"timestamp": "2026-01-02T09:00:00", "intent": "objection", "prompt_tokens": 200, "completion_tokens": 20, "cached_tokens": 0, "cost_usd": 0.02},
+    ]
+    rows = aggregate_usage(events)
+    assert [(r["day"], r["intent"], r["requests"]) for r in rows] == [("2026-01-01", "inquiry", 2), ("2026-01-02", "objection", 1)]
+    assert rows[0]["avg_prompt_tokens"] == 200.0
+    assert rows[0]["cost_usd"] == pytest.approx(0.04)
+    assert rows[0]["cache_hit_rate"] == 0.125
+
+
+def test_usage_report_reads_rotated_days_and_reweights_samples(tmp_path):
+    """Archived days are included, and a sampled event stands for 1 / sample_rate requests."""
+    path = tmp_path / "events.jsonl"
+    old = {"event": "process", "timestamp": "2026-01-01T10:00:00", "intent": "inquiry", "prompt_tokens": 100, "cost_usd": 0.01}
+    with gzip.open(str(path) + ".2026-01-01.gz", "wt") as f:
+        f.write(json.dumps(old) + "\n")
+    sampled = {**old, "timestamp": "2026-01-02T10:00:00", "sample_rate": 0.25}
+    path.write_text(json.dumps(sampled) + "\n" + json.dumps({"event": "llm_call"}) + "\n")
+
+    rows = aggregate_usage(read_process_events(str(path)))
+    assert [(r["day"], r["requests"], r["prompt_tokens"]) for r in rows] == [("2026-01-01", 1, 100), ("2026-01-02", 4, 400)]
+    assert rows[1]["cost_usd"] == pytest.approx(0.04)